@@ -1,8 +1,17 @@
+import argparse
+import json
+from dataclasses import asdict
 from pathlib import Path
 from mattock.account import Account
 import sys
+from urllib.parse import quote
 
-from mattock.files import File1, File19, U2ReadError, U2ReadException
+from mattock.cdc import capture_changes
+from mattock.export import FORMATS, LEVELS, export_records, open_output, record_writer
+from mattock.files import DynamicHashedFile, File1, File19, StaticHashedFile, U2ReadError, U2ReadException
+from mattock.layout import FileLayout, analyze_layout
+from mattock.parallel import ExportFile, FileScan, count_headers, count_records
+from mattock.query import Position, Predicate, parse_condition, parse_position
 
 help_text = """
 Mattock reads Universe and Unidata databases
@@ -10,6 +19,10 @@ Mattock reads Universe and Unidata databases
 Usage:
 
 python -m mattock [--keys|--values] <path>
+python -m mattock summary [options] <path>
+python -m mattock export [options] <path>
+python -m mattock layout [options] <path>
+python -m mattock changes --manifests <dir> [options] <path>
 
     path:
         The path of a U2 database containing a VOC file
@@ -17,50 +30,36 @@ python -m mattock [--keys|--values] <path>
         Print record keys
     --values:
         Print record keys and values
+    summary:
+        Count the records and bytes of every file with a pool of processes. See python -m mattock summary --help
+    export:
+        Stream records to NDJSON, CSV or Arrow. See python -m mattock export --help
+    layout:
+        Report group load, overflow and a suggested modulus for hashed files. See python -m mattock layout --help
+    changes:
+        Stream the records changed since the last run as NDJSON. See python -m mattock changes --help
 
 """
 
-if len(sys.argv) == 2:
-    path = Path(sys.argv[1])
-    print_summary = True
-    print_keys = False
-    print_values = False
-elif len(sys.argv) == 3:
-    path = Path(sys.argv[2])
-    opt = sys.argv[1]
-    if opt == "--keys":
-        print_summary = False
-        print_keys = True
-        print_values = False
-    elif opt == "--values":
-        print_summary = False
-        print_keys = True
-        print_values = False
-    else:
-        print(help_text)
-        exit(1)
-
-else:
-    print(help_text)
-    exit(1)
-if not path.is_dir():
-    raise Exception(f"Not a directory: {path}")
-else:
+def summary(path:Path, print_summary:bool, print_keys:bool, print_values:bool):
     account = Account(path)
     for file_name in account.files():
-        
+
         rec_count = 0
         byte_count = 0
         try:
+            if print_keys and not print_values:
+                with account.open_file(file_name) as f:
+                    for key in f.keys():
+                        print(f"{file_name} has record {key}")
+                continue
+
             with account.open_file(file_name) as f:
                 for r in f.records():
                     rec_count = rec_count + 1
                     byte_count = byte_count + len(r.key) + len(r.raw)
-                    if print_keys:
-                        if print_values:
-                            print(f"{file_name} has record {r.key} with value {r.raw}")
-                        else:
-                            print(f"{file_name} has record {r.key}")
+                    if print_values:
+                        print(f"{file_name} has record {r.key} with value {r.raw}")
 
             if print_summary:
                 if isinstance(f,File1):
@@ -73,3 +72,221 @@ else:
         except U2ReadException as e:
             if e.error_code != U2ReadError.FILE_NOT_FOUND:
                 raise e
+
+def account_records(account:Account, file_names:list[str], where:list[Predicate] | None = None, select:list[Position] | None = None, sweep:bool = False):
+    for file_name in file_names:
+        try:
+            with account.open_file(file_name) as f:
+                if sweep and isinstance(f, DynamicHashedFile):
+                    records = f.records(where=where, select=select, sweep=True)
+                else:
+                    records = f.records(where=where, select=select)
+                for r in records:
+                    yield (file_name, r)
+        except U2ReadException as e:
+            if e.error_code != U2ReadError.FILE_NOT_FOUND:
+                raise e
+
+def export(argv:list[str]):
+    parser = argparse.ArgumentParser(prog="python -m mattock export", description="Stream the records of an account in constant memory")
+    parser.add_argument("path", type=Path, help="The path of a U2 database containing a VOC file")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--flatten", choices=LEVELS, default=None, help="Export each record whole or split into fields, values or subvalues. CSV supports record and field (the default)")
+    parser.add_argument("--file", action="append", dest="files", help="Only export this file. May be repeated")
+    parser.add_argument("--output", type=Path, default=None, help="Write to this file instead of stdout")
+    parser.add_argument("--encoding", default="latin-1", help="Encoding of keys and data for NDJSON and CSV")
+    parser.add_argument("--field-separator", default="^", help="CSV replacement for field marks")
+    parser.add_argument("--value-separator", default="]", help="CSV replacement for value marks")
+    parser.add_argument("--subvalue-separator", default="\\", help="CSV replacement for subvalue marks")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Records per Arrow record batch")
+    parser.add_argument("--batch-bytes", type=int, default=256 * 1024 * 1024, help="Bytes of a column at which an Arrow record batch is written early, at most 2**31 - 1")
+    parser.add_argument("--where", action="append", default=None, help="Only export records where POSITION=VALUE, POSITION^=PREFIX, POSITION>=LOW or POSITION<HIGH. POSITION is @ID, F, F.V or F.V.S counted from 0. May be repeated, all must match")
+    parser.add_argument("--select", default=None, help="Only export these comma separated positions, F, F.V or F.V.S, as the fields of each record")
+    parser.add_argument("--sweep", action="store_true", help="Read dynamic files front to back, DATA.30 then OVER.30, instead of following overflow as it is met. Their records come in no particular order")
+    parser.add_argument("--output-dir", type=Path, default=None, help="Export each file to its own file in this directory, with a pool of processes")
+    parser.add_argument("--jobs", type=int, default=None, help="Processes exporting to --output-dir. Defaults to the number of CPUs")
+    args = parser.parse_args(argv)
+
+    if not args.path.is_dir():
+        raise Exception(f"Not a directory: {args.path}")
+
+    if args.format == "csv":
+        options = {
+            "encoding": args.encoding,
+            "field_separator": args.field_separator,
+            "value_separator": args.value_separator,
+            "subvalue_separator": args.subvalue_separator,
+        }
+    elif args.format == "ndjson":
+        options = {"encoding": args.encoding}
+    else:
+        options = {"batch_size": args.batch_size, "batch_bytes": args.batch_bytes}
+
+    account = Account(args.path)
+    where = [parse_condition(c, args.encoding) for c in args.where] if args.where else None
+    select = [parse_position(p) for p in args.select.split(",")] if args.select else None
+    if args.output_dir != None:
+        args.output_dir.mkdir(parents=True, exist_ok=True)
+        task = ExportFile(args.output_dir, args.format, args.flatten, options, where, select, args.sweep)
+        failed = False
+        for scan in account.scan_files(task, args.files, args.jobs):
+            print_scan(scan, sys.stderr)
+            failed = failed or (scan.error != None and scan.error != U2ReadError.FILE_NOT_FOUND.name)
+        if failed:
+            exit(1)
+        return
+
+    with open_output(args.output) as out:
+        writer = record_writer(out, args.format, args.flatten, **options)
+        export_records(account_records(account, args.files or list(account.files()), where, select, args.sweep), writer)
+
+def print_scan(scan:FileScan, out=sys.stdout):
+    if scan.error != None:
+        print(f"{scan.file_name} failed after {scan.seconds:.2f}s: {scan.error}", file=out)
+    else:
+        about = "about " if scan.estimated else ""
+        print(f"{scan.file_name} ({scan.file_type}) has {scan.records} records and {about}{scan.bytes} bytes, read in {scan.seconds:.2f}s", file=out)
+
+def parallel_summary(argv:list[str]):
+    parser = argparse.ArgumentParser(prog="python -m mattock summary", description="Count the records and bytes of the files of an account with a pool of processes, biggest files first, printing each file as it finishes")
+    parser.add_argument("path", type=Path, help="The path of a U2 database containing a VOC file")
+    parser.add_argument("--file", action="append", dest="files", help="Only count this file. May be repeated")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes. Defaults to the number of CPUs")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per file")
+    parser.add_argument("--headers", action="store_true", help="Count from item headers, leaf pages and directory entries without reading records. Byte totals of files with oversized items or line ends are estimates")
+    args = parser.parse_args(argv)
+
+    if not args.path.is_dir():
+        raise Exception(f"Not a directory: {args.path}")
+
+    account = Account(args.path)
+    task = count_headers if args.headers else count_records
+    for scan in account.scan_files(task, args.files, args.jobs):
+        if args.json:
+            print(json.dumps(asdict(scan)), flush=True)
+        else:
+            print_scan(scan)
+            sys.stdout.flush()
+
+def print_histogram(title:str, counts:dict[int, int], width:int):
+    print(f"  {title}:")
+    for (bucket, groups) in counts.items():
+        label = str(bucket) if width == 1 else f"{bucket}-{bucket + width - 1}"
+        print(f"    {label:>15} {groups}")
+
+def print_layout(file_name:str, l:FileLayout):
+    print(f"{file_name} ({l.file_type}) modulus {l.modulus} separation {l.separation}")
+    print(f"  {l.records} records, {l.bytes} bytes in {l.groups} groups, load {l.load:.0%}, free {l.free_ratio:.0%}")
+    print(f"  {l.overflow_buffers} overflow buffers, longest chain {l.longest_chain}")
+    print(f"  {l.oversized_items} oversized items in {l.oversized_buffers} buffers")
+    print_histogram("bytes per group", l.bytes_per_group, l.bytes_bucket)
+    print_histogram("records per group", l.records_per_group, l.records_bucket)
+    print_histogram("overflow buffers per group", l.chain_lengths, 1)
+    print(f"  suggested modulus {l.suggested_modulus} separation {l.suggested_separation}")
+
+def layout(argv:list[str]):
+    parser = argparse.ArgumentParser(prog="python -m mattock layout", description="Analyze how the records of hashed files are spread over their groups")
+    parser.add_argument("path", type=Path, help="The path of a U2 database containing a VOC file")
+    parser.add_argument("--file", action="append", dest="files", help="Only analyze this file. May be repeated")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per file")
+    args = parser.parse_args(argv)
+
+    if not args.path.is_dir():
+        raise Exception(f"Not a directory: {args.path}")
+
+    account = Account(args.path)
+    for file_name in args.files or list(account.files()):
+        try:
+            with account.open_file(file_name) as f:
+                if not isinstance(f, StaticHashedFile | DynamicHashedFile):
+                    continue
+                l = analyze_layout(f)
+        except U2ReadException as e:
+            if e.error_code != U2ReadError.FILE_NOT_FOUND:
+                raise e
+            continue
+
+        if args.json:
+            print(json.dumps({"file": file_name, **asdict(l), "load": l.load, "free_ratio": l.free_ratio}))
+        else:
+            print_layout(file_name, l)
+
+def changes(argv:list[str]):
+    parser = argparse.ArgumentParser(prog="python -m mattock changes", description="Stream the records inserted, updated or deleted since the last run. Unchanged files, B-tree pages and record files are not read again; hashed files that have changed are read in full")
+    parser.add_argument("path", type=Path, help="The path of a U2 database containing a VOC file")
+    parser.add_argument("--manifests", type=Path, required=True, help="Directory of the manifests of the last run, updated by this one")
+    parser.add_argument("--file", action="append", dest="files", help="Only capture this file. May be repeated")
+    parser.add_argument("--output", type=Path, default=None, help="Write to this file instead of stdout")
+    parser.add_argument("--encoding", default="latin-1", help="Encoding of keys and data")
+    args = parser.parse_args(argv)
+
+    if not args.path.is_dir():
+        raise Exception(f"Not a directory: {args.path}")
+    args.manifests.mkdir(parents=True, exist_ok=True)
+
+    account = Account(args.path)
+    with open_output(args.output) as out:
+        for file_name in args.files or list(account.files()):
+            file_path = account.get_filepath(file_name)
+            if file_path == None:
+                continue
+            manifest = args.manifests.joinpath(quote(file_name, safe="") + ".manifest")
+            try:
+                for (kind, key, raw) in capture_changes(file_path, manifest):
+                    out.write(json.dumps({
+                        "file": file_name,
+                        "change": kind,
+                        "key": key.decode(args.encoding),
+                        "record": None if raw == None else bytes(raw).decode(args.encoding),
+                    }, ensure_ascii=False).encode("utf8") + b"\n")
+            except U2ReadException as e:
+                if e.error_code != U2ReadError.FILE_NOT_FOUND:
+                    raise e
+
+def main(argv:list[str]):
+    if len(argv) >= 1 and argv[0] == "export":
+        export(argv[1:])
+        return
+
+    if len(argv) >= 1 and argv[0] == "summary":
+        parallel_summary(argv[1:])
+        return
+
+    if len(argv) >= 1 and argv[0] == "layout":
+        layout(argv[1:])
+        return
+
+    if len(argv) >= 1 and argv[0] == "changes":
+        changes(argv[1:])
+        return
+
+    if len(argv) == 1:
+        path = Path(argv[0])
+        print_summary = True
+        print_keys = False
+        print_values = False
+    elif len(argv) == 2:
+        path = Path(argv[1])
+        opt = argv[0]
+        if opt == "--keys":
+            print_summary = False
+            print_keys = True
+            print_values = False
+        elif opt == "--values":
+            print_summary = False
+            print_keys = True
+            print_values = True
+        else:
+            print(help_text)
+            exit(1)
+
+    else:
+        print(help_text)
+        exit(1)
+    if not path.is_dir():
+        raise Exception(f"Not a directory: {path}")
+    else:
+        summary(path, print_summary, print_keys, print_values)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
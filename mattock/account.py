@@ -1,41 +1,114 @@
-
 import codecs
 from pathlib import Path
+from typing import Any, Callable, Generator
 
 from mattock.files import open_uv_file
+from mattock.indices import SecondaryIndex, list_indices, open_index
+from mattock.parallel import FileScan, count_records, scan_files
+from mattock.stats import ScanStats
+
 
+class VocEntry:
+    __slots__ = ("type_code", "field0", "field1")
+    type_code: bytes
+    field0: bytes
+    field1: bytes
+
+    def __init__(self, type_code:bytes, field0:bytes, field1:bytes):
+        self.type_code = type_code
+        self.field0 = field0
+        self.field1 = field1
 
 class Account:
     path: Path
 
     def __init__(self,path:Path):
         self.path = path
-        pass
+        self.voc_index: dict[bytes, VocEntry] | None = None
+        self.voc_signature: tuple | None = None
+
+    def voc_stat_signature(self) -> tuple:
+        voc_path = self.path.joinpath("VOC")
+        if voc_path.is_dir():
+            paths = [voc_path.joinpath("DATA.30"), voc_path.joinpath("OVER.30")]
+        else:
+            paths = [voc_path]
+        signature = []
+        for p in paths:
+            try:
+                st = p.stat()
+                signature.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def get_voc_index(self) -> dict[bytes, VocEntry]:
+        """
+        VOC entries by name, read from VOC once and read again only when VOC
+        has been modified since
+        """
+        signature = self.voc_stat_signature()
+        if self.voc_index == None or signature != self.voc_signature:
+            index: dict[bytes, VocEntry] = {}
+            with self.open_voc() as f:
+                for r in f.records():
+                    fields = bytes(r.raw).split(b"\xfe", 2)
+                    index[r.key] = VocEntry(
+                        r.get(0,0,0) or b"",
+                        fields[0],
+                        fields[1] if len(fields) > 1 else b"",
+                    )
+            self.voc_index = index
+            self.voc_signature = signature
+        return self.voc_index
 
     def get_filepath(self,filename:str) -> Path | None:
-        with self.open_voc() as f:
-            for r in f.records():
-                if r.key == codecs.encode(filename):
-                    fields = r.raw.split(b"\xfe")
-                    if not fields[0].decode("utf8").strip().startswith("F"):
-                        print(r)
-                        raise Exception("Tried to get file location of a non-FILE")
-                    filepath = fields[1]
-                    return self.path.joinpath(codecs.decode(filepath,"utf8"))
-        return None
+        entry = self.get_voc_index().get(codecs.encode(filename))
+        if entry == None:
+            return None
+        if not entry.field0.decode("utf8").strip().startswith("F"):
+            raise Exception(f"Tried to get file location of a non-FILE: {entry.field0!r}")
+        return self.path.joinpath(codecs.decode(entry.field1,"utf8"))
 
     def open_voc(self):
         return open_uv_file(self.path.joinpath("VOC"))
 
-    def open_file(self,filename:str):
+    def open_file(self,filename:str,stats:ScanStats | None = None):
         path = self.get_filepath(filename)
         if path == None:
             raise Exception("File does not exist")
-        return open_uv_file(path)
-    
+        return open_uv_file(path, stats=stats)
+
+    def indices(self,filename:str) -> list[str]:
+        path = self.get_filepath(filename)
+        if path == None:
+            raise Exception("File does not exist")
+        return list_indices(path)
+
+    def open_index(self,filename:str,index_name:str,stats:ScanStats | None = None) -> SecondaryIndex:
+        path = self.get_filepath(filename)
+        if path == None:
+            raise Exception("File does not exist")
+        return open_index(path, index_name, stats)
+
+    def scan_files(
+            self,
+            task:Callable[[Any, FileScan], None] = count_records,
+            file_names:list[str] | None = None,
+            processes:int | None = None,
+    ) -> Generator[FileScan, Any, None]:
+        """
+        Run task, by default counting records and bytes, on the files of the
+        account in parallel, see mattock.parallel.scan_files. Files missing
+        from VOC are reported as FILE_NOT_FOUND.
+        """
+        files = []
+        for file_name in file_names or list(self.files()):
+            path = self.get_filepath(file_name)
+            files.append((file_name, path if path != None else self.path.joinpath(file_name)))
+        return scan_files(files, task, processes)
+
     def files(self):
-        with self.open_voc() as voc:
-            for record in voc.records():
-                f0 = record.get(0,0,0)
-                if f0 and f0.startswith(b"F"):
-                    yield codecs.decode(record.key)
+        for (name, entry) in self.get_voc_index().items():
+            if entry.type_code.startswith(b"F"):
+                yield codecs.decode(name)
@@ -0,0 +1,295 @@
+import struct
+import sys
+from array import array
+from typing import Any, BinaryIO
+
+# Just enough of the Arrow IPC streaming format to write record batches of
+# binary and nested list-of-binary columns with the standard library.
+# https://arrow.apache.org/docs/format/Columnar.html#serialization-and-interprocess-communication-ipc
+
+METADATA_VERSION_V5 = 4
+HEADER_SCHEMA = 1
+HEADER_RECORD_BATCH = 3
+TYPE_BINARY = 4
+TYPE_LIST = 12
+CONTINUATION = b"\xff\xff\xff\xff"
+# the largest int32 offset, and so the most bytes or list items a column of
+# one record batch can hold
+MAX_OFFSET = 2**31 - 1
+
+class Table:
+    """
+    A flatbuffer table. fields are (slot, format, value) where format is a
+    struct format for scalars or "offset" for a child Table, Vector or String.
+    """
+    def __init__(self, fields:list[tuple[int, str, Any]]):
+        self.fields = fields
+
+class Vector:
+    """
+    A flatbuffer vector of tables, or of structs packed with struct_format
+    """
+    def __init__(self, items:list[Any], struct_format:str | None = None, struct_align:int = 8):
+        self.items = items
+        self.struct_format = struct_format
+        self.struct_align = struct_align
+
+class String:
+    def __init__(self, value:str):
+        self.value = value
+
+class FlatBufferWriter:
+    """
+    Lays a flatbuffer out front to back. Every table is preceded by its vtable
+    and followed by the objects it refers to, so all offsets point forwards.
+    """
+    def __init__(self):
+        self.buf = bytearray()
+
+    def align(self, alignment:int, offset:int = 0):
+        while (len(self.buf) + offset) % alignment:
+            self.buf.append(0)
+
+    def patch_offset(self, at:int, target:int):
+        struct.pack_into("<I", self.buf, at, target - at)
+
+    def write_root(self, root:Table) -> bytes:
+        self.buf += b"\x00" * 4
+        self.patch_offset(0, self.write(root))
+        self.align(8)
+        return bytes(self.buf)
+
+    def write(self, obj:Table | Vector | String) -> int:
+        if isinstance(obj, Table):
+            return self.write_table(obj)
+        if isinstance(obj, Vector):
+            return self.write_vector(obj)
+        return self.write_string(obj)
+
+    def write_table(self, table:Table) -> int:
+        # place the widest fields first so each is aligned to its own size
+        fields = sorted(table.fields, key=lambda f: -self.field_size(f[1]))
+        layout = []
+        position = 4
+        for (slot, fmt, value) in fields:
+            size = self.field_size(fmt)
+            while position % size:
+                position = position + 1
+            layout.append((slot, fmt, value, position))
+            position = position + size
+        table_size = position
+        table_align = max([4] + [self.field_size(f[1]) for f in fields])
+
+        slots = max([f[0] for f in fields], default=-1) + 1
+        vtable = [0] * slots
+        for (slot, _, _, field_offset) in layout:
+            vtable[slot] = field_offset
+
+        self.align(2)
+        vtable_position = len(self.buf)
+        self.buf += struct.pack(f"<HH{slots}H", 4 + 2 * slots, table_size, *vtable)
+
+        self.align(table_align)
+        table_position = len(self.buf)
+        self.buf += struct.pack("<i", table_position - vtable_position)
+        self.buf += b"\x00" * (table_size - 4)
+        children = []
+        for (_, fmt, value, field_offset) in layout:
+            if fmt == "offset":
+                children.append((table_position + field_offset, value))
+            else:
+                struct.pack_into("<" + fmt, self.buf, table_position + field_offset, value)
+
+        for (at, child) in children:
+            self.patch_offset(at, self.write(child))
+        return table_position
+
+    def write_vector(self, vector:Vector) -> int:
+        if vector.struct_format != None:
+            # the elements, not the length, are aligned
+            self.align(vector.struct_align, 4)
+            position = len(self.buf)
+            self.buf += struct.pack("<I", len(vector.items))
+            for item in vector.items:
+                self.buf += struct.pack("<" + vector.struct_format, *item)
+            return position
+
+        self.align(4)
+        position = len(self.buf)
+        self.buf += struct.pack("<I", len(vector.items))
+        self.buf += b"\x00" * (4 * len(vector.items))
+        for (i, item) in enumerate(vector.items):
+            self.patch_offset(position + 4 + 4 * i, self.write(item))
+        return position
+
+    def write_string(self, string:String) -> int:
+        self.align(4)
+        position = len(self.buf)
+        encoded = string.value.encode("utf8")
+        self.buf += struct.pack("<I", len(encoded)) + encoded + b"\x00"
+        return position
+
+    def field_size(self, fmt:str) -> int:
+        return 4 if fmt == "offset" else struct.calcsize("<" + fmt)
+
+def little_endian(values:array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+class BinaryColumn:
+    """
+    A variable length binary column: int32 offsets and a data buffer
+    """
+    def __init__(self):
+        self.offsets = array("i", [0])
+        self.data = bytearray()
+
+    def append(self, value:bytes):
+        if len(self.data) + len(value) > MAX_OFFSET:
+            raise Exception("Too much data for the int32 offsets of one Arrow record batch")
+        self.data += value
+        self.offsets.append(len(self.data))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def data_size(self) -> int:
+        return len(self.data)
+
+    def field_type(self) -> Table:
+        return Table([])
+
+    def type_id(self) -> int:
+        return TYPE_BINARY
+
+    def children(self) -> list["BinaryColumn | ListColumn"]:
+        return []
+
+    def buffers(self) -> list[bytes]:
+        return [b"", little_endian(self.offsets), bytes(self.data)]
+
+class ListColumn:
+    """
+    A list column: int32 offsets into a child column
+    """
+    def __init__(self, child:"BinaryColumn | ListColumn"):
+        self.offsets = array("i", [0])
+        self.child = child
+
+    def append(self, values:list[Any]):
+        if len(self.child) + len(values) > MAX_OFFSET:
+            raise Exception("Too many items for the int32 offsets of one Arrow record batch")
+        for value in values:
+            self.child.append(value)
+        self.offsets.append(len(self.child))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def data_size(self) -> int:
+        """
+        The bytes of the binary column at the bottom
+        """
+        return self.child.data_size()
+
+    def field_type(self) -> Table:
+        return Table([])
+
+    def type_id(self) -> int:
+        return TYPE_LIST
+
+    def children(self) -> list["BinaryColumn | ListColumn"]:
+        return [self.child]
+
+    def buffers(self) -> list[bytes]:
+        return [b"", little_endian(self.offsets)]
+
+def nested_column(depth:int) -> BinaryColumn | ListColumn:
+    """
+    binary for depth 0, list<binary> for 1, list<list<binary>> for 2...
+    """
+    if depth == 0:
+        return BinaryColumn()
+    return ListColumn(nested_column(depth - 1))
+
+def field_table(name:str, column:BinaryColumn | ListColumn) -> Table:
+    return Table([
+        (0, "offset", String(name)),
+        (1, "?", False),
+        (2, "B", column.type_id()),
+        (3, "offset", column.field_type()),
+        (5, "offset", Vector([field_table("item", c) for c in column.children()])),
+    ])
+
+def message(header_type:int, header:Table, body_length:int) -> bytes:
+    metadata = FlatBufferWriter().write_root(Table([
+        (0, "h", METADATA_VERSION_V5),
+        (1, "B", header_type),
+        (2, "offset", header),
+        (3, "q", body_length),
+    ]))
+    return CONTINUATION + struct.pack("<i", len(metadata)) + metadata
+
+def pad8(data:bytes) -> bytes:
+    return data + b"\x00" * (-len(data) % 8)
+
+class ArrowStreamWriter:
+    """
+    Writes named columns to a binary stream in the Arrow IPC streaming format,
+    one record batch per write_batch
+    """
+    def __init__(self, out:BinaryIO, names:list[str], depths:list[int]):
+        self.out = out
+        self.names = names
+        self.depths = depths
+        self.schema_written = False
+
+    def new_columns(self) -> list[BinaryColumn | ListColumn]:
+        return [nested_column(d) for d in self.depths]
+
+    def write_schema(self):
+        schema = Table([
+            (0, "h", 0),
+            (1, "offset", Vector([field_table(n, c) for (n, c) in zip(self.names, self.new_columns())])),
+        ])
+        self.out.write(message(HEADER_SCHEMA, schema, 0))
+        self.schema_written = True
+
+    def write_batch(self, columns:list[BinaryColumn | ListColumn]):
+        if not self.schema_written:
+            self.write_schema()
+
+        nodes = []
+        buffers = []
+        body = []
+        body_length = 0
+
+        def add(column:BinaryColumn | ListColumn):
+            nonlocal body_length
+            nodes.append((len(column), 0))
+            for data in column.buffers():
+                buffers.append((body_length, len(data)))
+                padded = pad8(data)
+                body.append(padded)
+                body_length = body_length + len(padded)
+            for child in column.children():
+                add(child)
+
+        for column in columns:
+            add(column)
+
+        batch = Table([
+            (0, "q", len(columns[0]) if columns else 0),
+            (1, "offset", Vector(nodes, "qq")),
+            (2, "offset", Vector(buffers, "qq")),
+        ])
+        self.out.write(message(HEADER_RECORD_BATCH, batch, body_length))
+        for data in body:
+            self.out.write(data)
+
+    def close(self):
+        if not self.schema_written:
+            self.write_schema()
+        self.out.write(CONTINUATION + b"\x00\x00\x00\x00")
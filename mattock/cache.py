@@ -0,0 +1,65 @@
+from collections import OrderedDict
+
+from mattock.mapped import ReadableFile
+
+# a size for lookups, e.g. open_uv_file(path, cache_bytes=DEFAULT_CACHE_BYTES).
+# Files are opened without a cache unless asked for one.
+DEFAULT_CACHE_BYTES = 8 * 1024 * 1024
+
+class PageCache:
+    """
+    A least recently used cache of the group buffers and B-tree pages of one
+    open file, bounded by the total size of the pages it holds
+    """
+    max_bytes: int
+    size: int
+    hits: int
+    misses: int
+    evictions: int
+
+    def __init__(self, max_bytes:int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.pages: OrderedDict[tuple[ReadableFile,int], bytes] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def read(self, fd:ReadableFile, offset:int, length:int) -> bytes:
+        key = (fd, offset)
+        page = self.pages.get(key)
+        if page != None and len(page) >= length:
+            self.pages.move_to_end(key)
+            self.hits = self.hits + 1
+            return page[:length] if len(page) > length else page
+
+        self.misses = self.misses + 1
+        fd.seek(offset)
+        page = fd.read(length)
+        self.put(key, page)
+        return page
+
+    def put(self, key:tuple[ReadableFile,int], page:bytes):
+        if len(page) > self.max_bytes:
+            return
+        previous = self.pages.pop(key, None)
+        if previous != None:
+            self.size = self.size - len(previous)
+        self.pages[key] = page
+        self.size = self.size + len(page)
+        while self.size > self.max_bytes:
+            (_, evicted) = self.pages.popitem(last=False)
+            self.size = self.size - len(evicted)
+            self.evictions = self.evictions + 1
+
+    def clear(self):
+        self.pages.clear()
+        self.size = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __repr__(self) -> str:
+        return f"PageCache(size={self.size}, max_bytes={self.max_bytes}, hits={self.hits}, misses={self.misses}, evictions={self.evictions})"
@@ -0,0 +1,201 @@
+import json
+import os
+from hashlib import blake2b
+from pathlib import Path
+from typing import Any, Callable, Generator, Iterable, Literal
+
+from mattock.files import BtreeFile, DynamicHashedFile, File1, StaticHashedFile, open_uv_file, read_record_file, scan_directory
+from mattock.keyindex import key_index_sources, stamp
+from mattock.record import Record
+
+# Change data capture. A manifest lists the units of a file (the groups of a
+# hashed file, the leaf pages of a B-tree, the record files of a type 1 or
+# type 19 file) with the parts each unit was stored in and a digest of each
+# of its records. A unit is only read again when one of its parts has changed
+# since the manifest was written. A B-tree leaf's parts are digests of the
+# leaf, which the walk of the tree reads anyway, and of its oversize pages. A
+# record file's part is its size and mtime. A hashed group has nothing that
+# tells it changed short of reading all of it, so it has no parts and is read
+# again whenever the file has changed.
+
+MANIFEST_VERSION = 1
+
+ChangeKind = Literal["insert", "update", "delete"]
+Change = tuple[ChangeKind, bytes, bytes | memoryview | None]
+Part = list
+# name, unchanged(parts), parts(), records()
+Unit = tuple[str, Callable[[list[Part]], bool], Callable[[], list[Part]], Callable[[], Iterable[Record]]]
+
+def digest(buffer:bytes | memoryview) -> str:
+    return blake2b(buffer, digest_size=16).hexdigest()
+
+def record_digest(raw:bytes | memoryview) -> str:
+    return blake2b(raw, digest_size=8).hexdigest()
+
+def hashed_units(f:StaticHashedFile | DynamicHashedFile) -> Generator[Unit, Any, None]:
+    """
+    The groups of a hashed file. Checking a group's buffers would cost as
+    much as reading its records, so groups have no parts and each is read
+    once, comparing only its records.
+    """
+    for group in f.groups():
+        yield (f"group {group.groupIndex}", lambda parts: False, lambda: [], group.records)
+
+def btree_units(f:BtreeFile) -> Generator[Unit, Any, None]:
+    """
+    The leaf pages of a B-tree. The parts of a leaf are the page and the
+    oversize pages of its items.
+    """
+    def read_page(offset:int) -> bytes | memoryview:
+        f.fd.seek(offset)
+        return f.fd.read(f.info.group_length)
+
+    for (group_index, leaf) in f.leaves():
+        def unchanged(parts:list[Part], leaf=leaf) -> bool:
+            if digest(leaf.buf) != parts[0][1]:
+                return False
+            return all([digest(read_page(offset)) == d for (offset, d) in parts[1:]])
+
+        def parts(group_index=group_index, leaf=leaf) -> list[Part]:
+            offset = f.info.header_length + group_index * f.info.group_length
+            result = [[offset, digest(leaf.buf)]]
+            for i in range(leaf.item_count()):
+                (_, _, next_offset) = leaf.item_parts(i)
+                for (page_offset, page) in leaf.oversize_pages(next_offset):
+                    result.append([page_offset, digest(page)])
+            return result
+
+        yield (f"page {group_index}", unchanged, parts, leaf.records)
+
+def directory_units(f) -> Generator[Unit, Any, None]:
+    """
+    The record files of a type 1 or type 19 file, each its own part, compared
+    by size and mtime
+    """
+    for (key, path) in scan_directory(str(f.path), isinstance(f, File1)):
+        def parts(path=path) -> list[Part]:
+            st = os.stat(path)
+            return [[st.st_size, st.st_mtime_ns]]
+
+        def unchanged(old:list[Part], parts=parts) -> bool:
+            return parts() == old
+
+        records = lambda key=key, path=path: [read_record_file(key, path)]
+        yield (f"record {key.decode('latin-1')}", unchanged, parts, records)
+
+def file_units(f) -> Generator[Unit, Any, None]:
+    if isinstance(f, StaticHashedFile | DynamicHashedFile):
+        return hashed_units(f)
+    if isinstance(f, BtreeFile):
+        return btree_units(f)
+    return directory_units(f)
+
+def file_sources(path:Path) -> list[Path]:
+    """
+    The files whose size and mtime tell if anything in the file at path can
+    have changed. A type 1 or type 19 directory can't tell.
+    """
+    if path.is_dir() and not path.joinpath(".Type30").is_file():
+        return []
+    return key_index_sources(path)
+
+def read_manifest_sources(path:Path) -> list[list[int]]:
+    with path.open("r", encoding="utf8") as f:
+        header = json.loads(f.readline())
+    if header.get("version") != MANIFEST_VERSION:
+        raise Exception(f"Unsupported manifest version in {path}")
+    return header["sources"]
+
+def read_manifest(path:Path) -> dict[str, tuple[list[Part], dict[bytes, str]]]:
+    units = {}
+    with path.open("r", encoding="utf8") as f:
+        f.readline()
+        for line in f:
+            unit = json.loads(line)
+            records = dict([(k.encode("latin-1"), d) for (k, d) in unit["records"].items()])
+            units[unit["unit"]] = (unit["parts"], records)
+    return units
+
+def manifest_line(unit:str, parts:list[Part], records:dict[bytes, str]) -> str:
+    return json.dumps({
+        "unit": unit,
+        "parts": parts,
+        "records": dict([(k.decode("latin-1"), d) for (k, d) in records.items()]),
+    }) + "\n"
+
+def capture_changes(path:Path, manifest:Path) -> Generator[Change, Any, None]:
+    """
+    The records of the file at path inserted, updated or deleted since
+    manifest was written, as (kind, key, record) with no record for deletes.
+    Without a manifest every record is an insert.
+
+    Once the last change has been yielded manifest is replaced with one of the
+    file as it is now. If the changes aren't all consumed it is left as it was.
+    """
+    sources = [list(s) for s in stamp(file_sources(path))]
+    if sources and manifest.exists() and read_manifest_sources(manifest) == sources:
+        # not a byte of the file has been written since
+        return
+    has_manifest = manifest.exists()
+    previous = read_manifest(manifest) if has_manifest else {}
+
+    # records missing from their unit's previous digests, by the unit they
+    # are in now. Each is an insert unless it moved from another unit.
+    unmatched: dict[str, set[bytes]] = {}
+    unit_records: dict[str, Callable[[], Iterable[Record]]] = {}
+    # digests of the records no longer in their previous unit. Each is a
+    # delete unless it moved to another unit.
+    vanished: dict[bytes, str] = {}
+
+    temp_path = manifest.with_name(manifest.name + ".tmp")
+    try:
+        with open_uv_file(path, use_key_index=False) as f, temp_path.open("w", encoding="utf8") as out:
+            out.write(json.dumps({"version": MANIFEST_VERSION, "sources": sources}) + "\n")
+            for (unit, unchanged, read_parts, read_records) in file_units(f):
+                old = previous.pop(unit, None)
+                if old != None and unchanged(old[0]):
+                    out.write(manifest_line(unit, old[0], old[1]))
+                    continue
+                previous_digests = old[1] if old != None else {}
+
+                parts = read_parts()
+                digests = {}
+                for record in read_records():
+                    record_hash = record_digest(record.raw)
+                    digests[record.key] = record_hash
+                    previous_hash = previous_digests.get(record.key)
+                    if previous_hash == None:
+                        if has_manifest:
+                            unmatched.setdefault(unit, set()).add(record.key)
+                            unit_records[unit] = read_records
+                        else:
+                            # without a manifest nothing can have moved
+                            yield ("insert", record.key, record.raw)
+                    elif previous_hash != record_hash:
+                        yield ("update", record.key, record.raw)
+                for (key, previous_hash) in previous_digests.items():
+                    if key not in digests:
+                        vanished[key] = previous_hash
+                out.write(manifest_line(unit, parts, digests))
+
+            # units that are no longer in the file
+            for (_, records) in previous.values():
+                vanished.update(records)
+
+            # the units holding unmatched records are read again for them
+            for (unit, keys) in unmatched.items():
+                for record in unit_records[unit]():
+                    if record.key not in keys:
+                        continue
+                    previous_hash = vanished.pop(record.key, None)
+                    if previous_hash == None:
+                        yield ("insert", record.key, record.raw)
+                    elif previous_hash != record_digest(record.raw):
+                        yield ("update", record.key, record.raw)
+            for key in sorted(vanished):
+                yield ("delete", key, None)
+
+        os.replace(temp_path, manifest)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
@@ -0,0 +1,122 @@
+import os
+from dataclasses import dataclass
+from typing import Any, Generator
+
+from mattock.decode import decoder
+from mattock.files import BtreeFile, BTreeLeaf, DynamicHashedFile, File1, StaticHashedFile, scan_directory
+from mattock.layout import group_layout
+
+# Record counts and byte totals without reading any record. Hashed files are
+# counted from their item headers, B-trees from the item tables of their leaf
+# pages and the headers of oversize pages, type 1 and type 19 files from
+# their directory entries.
+
+
+@dataclass()
+class FileCount:
+    """
+    The records of a file and the bytes of their keys and records, as
+    records() would return them. With estimated the bytes are an estimate:
+    oversized items of hashed files are taken to fill their last buffer, and
+    the line ends of type 1 and type 19 records are counted as two bytes
+    rather than one field mark.
+    """
+    records: int = 0
+    bytes: int = 0
+    estimated: bool = False
+
+
+# bytes of primary groups read at once when looking for empty ones
+PRIMARY_READ_SIZE = 1024 * 1024
+
+def empty_groups(f:StaticHashedFile | DynamicHashedFile) -> Generator[bool, Any, None]:
+    """
+    Whether each primary group is empty, a single free item, from the first
+    item header of each. The primary groups are read in large blocks
+    rather than a buffer at a time.
+    """
+    info = f.info
+    item_header = decoder(info.arch, info.byteorder).item_header
+    item_flags = decoder(info.arch, info.byteorder).item_flags
+    groups_per_read = max(1, PRIMARY_READ_SIZE // info.group_length)
+    for first in range(0, f.group_count(), groups_per_read):
+        count = min(groups_per_read, f.group_count() - first)
+        f.fd.seek(info.header_length + first * info.group_length)
+        block = f.fd.read(count * info.group_length)
+        for i in range(count):
+            offset = i * info.group_length
+            if len(block) < offset + item_header.size:
+                # past the end of the file
+                return
+            (forward_pointer, _, flags) = item_header.unpack_from(block, offset)
+            yield forward_pointer == 0 and item_flags(flags)[0]
+
+def count_hashed(f:StaticHashedFile | DynamicHashedFile) -> FileCount:
+    count = FileCount()
+    for (group_index, empty) in enumerate(empty_groups(f)):
+        if empty:
+            continue
+        layout = group_layout(f.group(group_index))
+        count.records = count.records + layout.records
+        count.bytes = count.bytes + layout.record_bytes
+        count.estimated = count.estimated or layout.oversized_buffers > 0
+    return count
+
+def oversize_length(leaf:BTreeLeaf, next_offset:int) -> int:
+    """
+    The length of the data in a chain of oversize pages, from the page
+    headers alone
+    """
+    oversize_page = leaf.decoder.oversize_page
+    length = 0
+    while next_offset > 0:
+        leaf.fd.seek(next_offset)
+        header = leaf.fd.read(oversize_page.size)
+        if leaf.info.arch == "32":
+            (page_type, next_offset, page_length) = oversize_page.unpack_from(header)
+        else:
+            (page_type, page_length, next_offset) = oversize_page.unpack_from(header)
+        if page_type != 8:
+            raise Exception(f"Expected oversize page_type to be 8 but was {page_type}")
+        length = length + page_length
+    return length
+
+def count_leaf(leaf:BTreeLeaf) -> int:
+    """
+    The bytes of the keys and records of the items of a leaf
+    """
+    word_size = leaf.decoder.word.size
+    total = 0
+    for i in range(leaf.item_count()):
+        (_, item_flags, item_bytes) = leaf.read_item(i)
+        # less the mark between the key and the record
+        length = len(item_bytes) - 1
+        if item_flags & (1 << 6):
+            (next_offset,) = leaf.decoder.word.unpack_from(item_bytes)
+            length = length - word_size + oversize_length(leaf, next_offset)
+        total = total + length
+    return total
+
+def count_btree(f:BtreeFile) -> FileCount:
+    count = FileCount()
+    for (_, leaf) in f.leaves():
+        count.records = count.records + leaf.item_count()
+        count.bytes = count.bytes + count_leaf(leaf)
+    return count
+
+def count_directory(f) -> FileCount:
+    count = FileCount(estimated=True)
+    for (key, path) in scan_directory(str(f.path), isinstance(f, File1), f.stats):
+        count.records = count.records + 1
+        count.bytes = count.bytes + len(key) + os.stat(path).st_size
+    return count
+
+def count_file(f) -> FileCount:
+    """
+    Count the records of an open file of any type without reading them
+    """
+    if isinstance(f, StaticHashedFile | DynamicHashedFile):
+        return count_hashed(f)
+    if isinstance(f, BtreeFile):
+        return count_btree(f)
+    return count_directory(f)
@@ -0,0 +1,77 @@
+import sys
+from array import array
+from struct import Struct
+from typing import Literal
+
+ItemFlags = tuple[bool, bool, bool, bool, bool, bool]
+
+# bit of each item flag in the order of ItemFlags: free item, record padded,
+# new style padding, forward to OVER.30, oversized item, oversized buffer
+ITEM_FLAG_BITS = {
+    "little": (1, 5, 4, 13, 7, 6),
+    "big": (14, 10, 11, 2, 8, 9),
+}
+
+
+class Decoder:
+    """
+    The struct formats of the headers of one (arch, byteorder) layout,
+    compiled once. Fields are unpacked in place from the buffers they are in
+    rather than from slices of them.
+    """
+    def __init__(self, arch: Literal["32", "64"], byteorder: Literal["little", "big"]):
+        self.arch = arch
+        self.byteorder = byteorder
+        order = "<" if byteorder == "little" else ">"
+        # the file, group and offset words
+        self.word_code = "I" if arch == "32" else "Q"
+
+        # forward pointer, back pointer, flags
+        self.item_header = Struct(order + ("II2xH" if arch == "32" else "QQ2xH4x"))
+        # first oversized buffer, number of them
+        self.oversized_stub = Struct(order + self.word_code + "I")
+        # page type, next page, length of the data / page type, length, next page
+        self.oversize_page = Struct(order + ("H2xII" if arch == "32" else "H2xIQ"))
+        # file type, modulus, separation, dynamic modulus, dynamic hash algorithm
+        if arch == "32":
+            self.file_header = Struct(order + "4xI4xII16xI32xI")
+        else:
+            self.file_header = Struct(order + "4xIQI12xQ32xI")
+        self.u16 = Struct(order + "H")
+        self.word = Struct(order + self.word_code)
+
+        self.swap = byteorder != sys.byteorder
+        self.flag_bits = ITEM_FLAG_BITS[byteorder]
+        self.flags: dict[int, ItemFlags] = {}
+
+    def item_flags(self, flags: int) -> ItemFlags:
+        """
+        The flags of an item header. Files use only a few combinations, so
+        each is decoded once.
+        """
+        decoded = self.flags.get(flags)
+        if decoded == None:
+            decoded = tuple([bool(flags & (1 << bit)) for bit in self.flag_bits])
+            self.flags[flags] = decoded
+        return decoded
+
+    def table(self, buf: bytes | memoryview, offset: int, count: int, typecode: str) -> memoryview | array:
+        """
+        count unsigned integers of typecode starting at offset, read in one
+        step. When the file has the byte order of this machine the table is a
+        view of buf, otherwise a byteswapped copy.
+        """
+        end = offset + count * array(typecode).itemsize
+        if not self.swap:
+            return memoryview(buf)[offset:end].cast(typecode)
+        table = array(typecode)
+        table.frombytes(buf[offset:end])
+        table.byteswap()
+        return table
+
+
+DECODERS = dict([((arch, byteorder), Decoder(arch, byteorder)) for arch in ["32", "64"] for byteorder in ["little", "big"]])
+
+
+def decoder(arch: Literal["32", "64"], byteorder: Literal["little", "big"]) -> Decoder:
+    return DECODERS[(arch, byteorder)]
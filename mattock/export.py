@@ -0,0 +1,163 @@
+import csv
+import io
+import json
+import sys
+from pathlib import Path
+from typing import BinaryIO, Iterable, Literal
+
+from mattock.arrow import MAX_OFFSET, ArrowStreamWriter
+from mattock.record import FIELD_MARK, SUBVALUE_MARK, VALUE_MARK, Record
+
+Level = Literal["record", "field", "value", "subvalue"]
+LEVELS: list[Level] = ["record", "field", "value", "subvalue"]
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+def flatten(raw:bytes, level:Level):
+    """
+    A record as its raw bytes, a list of fields, a list of fields of values or
+    a list of fields of values of subvalues
+    """
+    if level == "record":
+        return raw
+    fields = raw.split(FIELD_MARK)
+    if level == "field":
+        return fields
+    if level == "value":
+        return [f.split(VALUE_MARK) for f in fields]
+    return [[v.split(SUBVALUE_MARK) for v in f.split(VALUE_MARK)] for f in fields]
+
+def decode_nested(value, encoding:str):
+    if isinstance(value, bytes):
+        return value.decode(encoding)
+    return [decode_nested(v, encoding) for v in value]
+
+def open_output(path:Path | None, buffer_size:int = DEFAULT_BUFFER_SIZE) -> BinaryIO:
+    """
+    A binary stream to path, or stdout, that only writes in buffer_size chunks
+    """
+    if path != None:
+        return open(path, "wb", buffering=buffer_size)
+    return io.BufferedWriter(io.FileIO(sys.stdout.fileno(), "wb", closefd=False), buffer_size)
+
+class NdjsonWriter:
+    """
+    One JSON object per record with the file name, key and flattened record
+    """
+    def __init__(self, out:BinaryIO, level:Level = "record", encoding:str = "latin-1"):
+        self.out = io.TextIOWrapper(out, encoding="utf8", newline="\n", write_through=True)
+        self.level = level
+        self.encoding = encoding
+
+    def write(self, file_name:str, record:Record):
+        self.out.write(json.dumps({
+            "file": file_name,
+            "key": record.key.decode(self.encoding),
+            "record": decode_nested(flatten(bytes(record.raw), self.level), self.encoding),
+        }, ensure_ascii=False))
+        self.out.write("\n")
+
+    def close(self):
+        self.out.flush()
+        self.out.detach()
+
+class CsvWriter:
+    """
+    One row per record: the file name, the key and either the whole record or
+    one column per field. The marks left within a column are replaced with
+    field_separator, value_separator and subvalue_separator.
+    """
+    def __init__(
+            self,
+            out:BinaryIO,
+            level:Level = "field",
+            encoding:str = "latin-1",
+            field_separator:str = "^",
+            value_separator:str = "]",
+            subvalue_separator:str = "\\",
+    ):
+        if level not in ["record", "field"]:
+            raise Exception("CSV rows can only be flattened to a record or fields")
+        self.text = io.TextIOWrapper(out, encoding="utf8", newline="", write_through=True)
+        self.writer = csv.writer(self.text)
+        self.level = level
+        self.encoding = encoding
+        self.separators = (field_separator, value_separator, subvalue_separator)
+
+    def text_of(self, raw:bytes) -> str:
+        (field_separator, value_separator, subvalue_separator) = self.separators
+        return field_separator.join([
+            value_separator.join([
+                subvalue_separator.join([s.decode(self.encoding) for s in v.split(SUBVALUE_MARK)])
+                for v in f.split(VALUE_MARK)
+            ])
+            for f in raw.split(FIELD_MARK)
+        ])
+
+    def write(self, file_name:str, record:Record):
+        raw = bytes(record.raw)
+        if self.level == "record":
+            columns = [raw]
+        else:
+            columns = raw.split(FIELD_MARK)
+        self.writer.writerow([file_name, record.key.decode(self.encoding)] + [self.text_of(c) for c in columns])
+
+    def close(self):
+        self.text.flush()
+        self.text.detach()
+
+class ArrowWriter:
+    """
+    Arrow IPC stream with binary file and key columns and a record column of
+    binary, list<binary>, list<list<binary>> or list<list<list<binary>>>
+    depending on level. Records are written in batches of batch_size, and a
+    batch is written early rather than let a column grow past batch_bytes.
+    Offsets are int32, so batch_bytes is at most 2**31 - 1.
+    """
+    def __init__(self, out:BinaryIO, level:Level = "record", batch_size:int = 10000, batch_bytes:int = 256 * 1024 * 1024):
+        self.stream = ArrowStreamWriter(out, ["file", "key", "record"], [0, 0, LEVELS.index(level)])
+        self.level = level
+        self.batch_size = batch_size
+        self.batch_bytes = min(batch_bytes, MAX_OFFSET)
+        self.columns = self.stream.new_columns()
+
+    def write(self, file_name:str, record:Record):
+        name = file_name.encode("utf8")
+        raw = bytes(record.raw)
+        # flattening only drops marks, so raw bounds the record's data
+        sizes = [len(name), len(record.key), len(raw)]
+        if any([column.data_size() + size > self.batch_bytes for (column, size) in zip(self.columns, sizes)]):
+            self.flush()
+        (file_column, key_column, record_column) = self.columns
+        file_column.append(name)
+        key_column.append(record.key)
+        record_column.append(flatten(raw, self.level))
+        if len(file_column) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if len(self.columns[0]):
+            self.stream.write_batch(self.columns)
+            self.columns = self.stream.new_columns()
+
+    def close(self):
+        self.flush()
+        self.stream.close()
+
+Format = Literal["ndjson", "csv", "arrow"]
+FORMATS: list[Format] = ["ndjson", "csv", "arrow"]
+
+def record_writer(out:BinaryIO, format:Format, level:Level | None = None, **options) -> NdjsonWriter | CsvWriter | ArrowWriter:
+    if format == "ndjson":
+        return NdjsonWriter(out, level or "record", **options)
+    if format == "csv":
+        return CsvWriter(out, level or "field", **options)
+    return ArrowWriter(out, level or "record", **options)
+
+def export_records(records:Iterable[tuple[str, Record]], writer:NdjsonWriter | CsvWriter | ArrowWriter) -> int:
+    count = 0
+    for (file_name, record) in records:
+        writer.write(file_name, record)
+        count = count + 1
+    writer.close()
+    return count
@@ -1,15 +1,31 @@
 import codecs
+import io
+import os
+from bisect import bisect_left
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from io import BufferedReader
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
 from stat import S_ISREG
-from typing import Any, Generator
-
-from mattock.group import Group
+from typing import Any, Callable, Generator, Iterable
+
+from mattock.cache import PageCache
+from mattock.decode import decoder
+from mattock.group import Group, ReadItemResult
+from mattock.keyindex import KeyIndex, key_index_path, key_index_sources, stamp, write_key_index
+from mattock.mapped import ReadableFile, find_byte, open_readable
+from mattock.pool import map_bounded
+from mattock.query import Position, Predicate, matcher, query_records
 from mattock.record import Record
+from mattock.stats import ScanStats
+from mattock.stream import DEFAULT_CHUNK_SIZE, Chunk, crlf_to_field_marks, file_chunks, open_chunks
+from mattock.sweep import SWEEP_MEMORY_BYTES, SWEEP_READ_SIZE, Sweep
 from mattock.uv_file_info import UvFileInfo
 
+DIRECTORY_READ_BATCH = 64
+
 def type1_escape_unix(s:bytes):
     if len(s) == 0:
         return b"?"
@@ -37,6 +53,7 @@ def type1_unescape_unix(s:str):
 
     return s
 
+@lru_cache(maxsize=4096)
 def key_to_type1_path(key:bytes):
     parts = [key]
     last = parts[-1]
@@ -69,6 +86,7 @@ def key_to_type1_path(key:bytes):
   
     return Path(*[codecs.decode(p) for p in parts])
 
+@lru_cache(maxsize=4096)
 def key_to_type19_path(key:bytes):  
     return Path(codecs.decode(type1_escape_unix(key)))
 
@@ -76,10 +94,163 @@ def key_to_type19_path(key:bytes):
 def type1_path_to_key(path:Path)->bytes:
     return b"".join([codecs.encode(type1_unescape_unix(p)) for p in path.parts])
 
+def scan_directory(root:str, recursive:bool, stats:ScanStats | None = None) -> Generator[tuple[bytes, str], Any, None]:
+    """
+    The keys and paths of the record files of a type 1 or type 19 file. The
+    type of each entry comes from os.scandir, so files are not stat'ed one by
+    one, and keys are built up a directory at a time.
+    """
+    stack: list[tuple[str, bytes]] = [(root, b"")]
+    while stack:
+        (directory, prefix) = stack.pop()
+        subdirectories: list[tuple[str, bytes]] = []
+        if stats != None:
+            stats.directories = stats.directories + 1
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name == ".Type1":
+                    continue
+                if entry.is_dir():
+                    if recursive and not entry.is_symlink():
+                        subdirectories.append((entry.path, prefix + codecs.encode(type1_unescape_unix(entry.name))))
+                elif entry.is_file():
+                    yield (prefix + codecs.encode(type1_unescape_unix(entry.name)), entry.path)
+        stack.extend(reversed(subdirectories))
+
+def read_record_file(key:bytes, path:str) -> Record:
+    with open(path, "rb") as f:
+        return Record(key, f.read().replace(b"\r\n",b"\xfe"))
+
+def read_record_files(batch:list[tuple[bytes, str]]) -> list[Record]:
+    return [read_record_file(key, path) for (key, path) in batch]
+
+def read_directory_records(
+        entries:Iterable[tuple[bytes, str]],
+        threads:int,
+        ordered:bool,
+        batch_size:int = DIRECTORY_READ_BATCH,
+        stats:ScanStats | None = None,
+) -> Generator[Record, Any, None]:
+    """
+    Read the record files of a type 1 or type 19 file. With more than one
+    thread, batches of batch_size files are read by a pool of threads so their
+    opens and reads overlap, with at most threads * 2 batches in memory.
+    Records come back in the order of entries if ordered, otherwise a batch
+    at a time as soon as each is read.
+    """
+    if stats != None:
+        for record in read_directory_records(entries, threads, ordered, batch_size):
+            stats.record_files = stats.record_files + 1
+            stats.bytes_read = stats.bytes_read + len(record.raw)
+            yield record
+        return
+
+    if threads <= 1:
+        for (key, path) in entries:
+            yield read_record_file(key, path)
+        return
+
+    def batches():
+        it = iter(entries)
+        while batch := list(islice(it, batch_size)):
+            yield (batch,)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for batch in map_bounded(executor, read_record_files, batches(), threads * 2, ordered):
+            for record in batch:
+                yield record
+
+def get_many_from_directory(root:Path, keys:Iterable[bytes], key_to_path:Callable[[bytes], Path]):
+    """
+    Look up keys of a type 1 or type 19 file directory by directory. Each
+    directory is listed once so missing keys cost no failed opens.
+    """
+    by_directory: dict[Path, list[tuple[bytes, Path]]] = {}
+    for key in dict.fromkeys(keys):
+        path = root.joinpath(key_to_path(key))
+        by_directory.setdefault(path.parent, []).append((key, path))
+
+    for directory in sorted(by_directory):
+        try:
+            with os.scandir(directory) as entries:
+                names = set([e.name for e in entries if e.is_file()])
+        except (FileNotFoundError, NotADirectoryError):
+            names = set()
+
+        for (key, path) in sorted(by_directory[directory], key=lambda kp: kp[1].name):
+            if path.name in names and path.name != ".Type1":
+                yield (key, path.read_bytes().replace(b"\r\n",b"\xfe"))
+            else:
+                yield (key, None)
+
+def require_key_index(f:"StaticHashedFile | DynamicHashedFile") -> KeyIndex:
+    """
+    The key index of a hashed file, for key lookups. Keys aren't hashed to
+    their group until mattock.hashing has been checked against hash vectors
+    from files UniVerse wrote, so a file without an index can't be looked up.
+    """
+    if f.key_index == None:
+        raise U2ReadException(U2ReadError.UNSUPPORTED_HASH)
+    return f.key_index
+
+def find_indexed_item(key:bytes, key_index:KeyIndex, group:Callable[[int], Group]) -> tuple[Group, ReadItemResult] | None:
+    location = key_index.find(key)
+    if location == None:
+        return None
+    (group_index, item_offset, in_over_30) = location
+    g = group(group_index)
+    item = g.read_item(item_offset, in_over_30, assemble=False)
+    if item == None or not item.record_buffer or g.item_key(item) != key:
+        raise Exception("The key index is out of date")
+    return (g, item)
+
+def get_many_from_index(keys:Iterable[bytes], key_index:KeyIndex, group:Callable[[int], Group]):
+    """
+    Look up keys of a hashed file through its key index, reading the items
+    in file order. Missing keys come last.
+    """
+    located = []
+    missing = []
+    for key in dict.fromkeys(keys):
+        location = key_index.find(key)
+        if location == None:
+            missing.append(key)
+        else:
+            located.append((location, key))
+    located.sort()
+
+    g = None
+    for ((group_index, item_offset, in_over_30), key) in located:
+        if g == None or g.groupIndex != group_index:
+            # consecutive items of a group share its buffers
+            g = group(group_index)
+        item = g.read_item(item_offset, in_over_30, assemble=False)
+        if item == None or not item.record_buffer:
+            raise Exception("The key index is out of date")
+        yield (key, g.item_content(item)[len(key) + 1:])
+
+    for key in missing:
+        yield (key, None)
+
+def records_with_prefix(f:"StaticHashedFile | DynamicHashedFile", prefix:bytes) -> Generator[Record, Any, None]:
+    if f.key_index == None:
+        for record in f.records():
+            if record.key.startswith(prefix):
+                yield record
+        return
+
+    for (key, (group_index, item_offset, in_over_30)) in f.key_index.items(prefix, prefix_end(prefix)):
+        g = f.group(group_index)
+        item = g.read_item(item_offset, in_over_30, assemble=False)
+        if item == None or not item.record_buffer:
+            raise Exception("The key index is out of date")
+        yield Record(key, g.item_content(item)[len(key) + 1:])
+
 class File1:
 
-    def __init__(self,path:Path) -> None:
+    def __init__(self,path:Path,stats:ScanStats | None = None) -> None:
         self.path = path
+        self.stats = stats
         self.is_valid = S_ISREG(self.path.joinpath(".Type1").lstat().st_mode)
         pass
 
@@ -92,24 +263,40 @@ class File1:
     def get_record(self,key:bytes) -> bytes:
         path = self.path.joinpath(key_to_type1_path(key))
         return path.read_bytes().replace(b"\r\n",b"\xfe")   
-    
-    def records(self):
-        for file in self.path.rglob("*"):
-            if (file.is_dir()):
-                continue
 
-            if file.name == ".Type1":
-                continue
+    def get_many(self,keys:Iterable[bytes]) -> Generator[tuple[bytes, bytes | None], Any, None]:
+        return get_many_from_directory(self.path, keys, key_to_type1_path)
 
-            if (file.is_file()):
-                relative_path = file.relative_to(self.path)
-                key = type1_path_to_key(relative_path)
-                yield Record(key,file.read_bytes().replace(b"\r\n",b"\xfe"))
+    def record_chunks(self,key:bytes,chunk_size:int = DEFAULT_CHUNK_SIZE) -> Generator[bytes, Any, None] | None:
+        path = self.path.joinpath(key_to_type1_path(key))
+        if not path.is_file():
+            return None
+        return crlf_to_field_marks(file_chunks(path, chunk_size))
+
+    def open_record(self,key:bytes) -> io.BufferedReader | None:
+        chunks = self.record_chunks(key)
+        return None if chunks == None else open_chunks(chunks)
+    
+    def records(self, threads:int = 1, ordered:bool = True, where:Predicate | Iterable[Predicate] | None = None, select:Iterable[Position] | None = None) -> Iterable[Record]:
+        """
+        Every record, read with up to threads threads. See query_records for
+        where and select.
+        """
+        records = read_directory_records(scan_directory(str(self.path), True, self.stats), threads, ordered, stats=self.stats)
+        return query_records(records, where, select)
+
+    def keys(self) -> Generator[bytes, Any, None]:
+        """
+        Keys in the same order as records, from the directory listing alone
+        """
+        for (key, _) in scan_directory(str(self.path), True, self.stats):
+            yield key
 
 class File19:
 
-    def __init__(self,path:Path) -> None:
+    def __init__(self,path:Path,stats:ScanStats | None = None) -> None:
         self.path = path
+        self.stats = stats
         pass
 
     def __enter__(self):
@@ -121,22 +308,37 @@ class File19:
     def get_record(self,key:bytes) -> bytes:
         path = self.path.joinpath(key_to_type19_path(key))
         return path.read_bytes().replace(b"\r\n",b"\xfe")   
-    
-    def records(self):
-        for file in self.path.iterdir():
-            if (file.is_dir()):
-                continue
 
-            if file.name == ".Type1":
-                continue
-
-            if (file.is_file()):
-                relative_path = file.relative_to(self.path)
-                key = type1_path_to_key(relative_path)
-                yield Record(key,file.read_bytes().replace(b"\r\n",b"\xfe"))
+    def get_many(self,keys:Iterable[bytes]) -> Generator[tuple[bytes, bytes | None], Any, None]:
+        return get_many_from_directory(self.path, keys, key_to_type19_path)
 
+    def record_chunks(self,key:bytes,chunk_size:int = DEFAULT_CHUNK_SIZE) -> Generator[bytes, Any, None] | None:
+        path = self.path.joinpath(key_to_type19_path(key))
+        if not path.is_file():
+            return None
+        return crlf_to_field_marks(file_chunks(path, chunk_size))
 
-def read_file_header(fd:BufferedReader):
+    def open_record(self,key:bytes) -> io.BufferedReader | None:
+        chunks = self.record_chunks(key)
+        return None if chunks == None else open_chunks(chunks)
+    
+    def records(self, threads:int = 1, ordered:bool = True, where:Predicate | Iterable[Predicate] | None = None, select:Iterable[Position] | None = None) -> Iterable[Record]:
+        """
+        Every record, read with up to threads threads. See query_records for
+        where and select.
+        """
+        records = read_directory_records(scan_directory(str(self.path), False, self.stats), threads, ordered, stats=self.stats)
+        return query_records(records, where, select)
+
+    def keys(self) -> Generator[bytes, Any, None]:
+        """
+        Keys in the same order as records, from the directory listing alone
+        """
+        for (key, _) in scan_directory(str(self.path), False, self.stats):
+            yield key
+
+
+def read_file_header(fd:ReadableFile):
     headerBuf = fd.read(1024)
 
     is_machine_class_le = headerBuf[2:4] == b'\xef\xac'
@@ -149,27 +351,14 @@ def read_file_header(fd:BufferedReader):
         arch_byte = headerBuf[1]
         revision = headerBuf[0]
 
-    if (arch_byte == 1):
-        arch = '32'
-        file_type = int.from_bytes(headerBuf[4:8],byteorder)
-        modulus = int.from_bytes(headerBuf[12:16],byteorder)
-        if (file_type == 30):
-            modulus = int.from_bytes(headerBuf[0x24:0x28],byteorder)
-        separation = int.from_bytes(headerBuf[16:20],byteorder)
-
-    else:
-        arch = '64'
-        file_type = int.from_bytes(headerBuf[4:8],byteorder)
-        modulus = int.from_bytes(headerBuf[8:16],byteorder)
-        if (file_type == 30):
-            modulus= int.from_bytes(headerBuf[0x20:0x28],byteorder)
-        separation = int.from_bytes(headerBuf[16:20],byteorder)
-
-    dyn_hash_alg = int.from_bytes(headerBuf[0x48:0x4c],byteorder)
-
     if not revision == 0x0c:
         raise U2ReadException(U2ReadError.UNSUPPORTED_REVISION)
 
+    arch = '32' if arch_byte == 1 else '64'
+    (file_type, modulus, separation, dyn_modulus, dyn_hash_alg) = decoder(arch, byteorder).file_header.unpack_from(headerBuf)
+    if (file_type == 30):
+        modulus = dyn_modulus
+
     group_length = separation * 512
     even_separation = (separation % 2) == 0
     header_length = separation * 512 if even_separation else 1024
@@ -186,39 +375,103 @@ def read_file_header(fd:BufferedReader):
     )
 
 class StaticHashedFile:
-    fd: BufferedReader
+    fd: ReadableFile
     info: UvFileInfo
 
-    def __init__(self,fd:BufferedReader,info:UvFileInfo):
+    def __init__(self,fd:ReadableFile,info:UvFileInfo,cache:PageCache | None = None,stats:ScanStats | None = None,key_index:KeyIndex | None = None):
         self.fd = fd
         self.info = info
+        self.cache = cache
+        self.stats = stats
+        self.key_index = key_index
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
         self.fd.close()
-
-    def groups(self):
-        for group_index in range(self.info.modulus):
-            group = Group(group_index, self.info, self.fd, None)
-            yield group
-
-    def records(self):
+        if self.key_index != None:
+            self.key_index.close()
+
+    def group_count(self) -> int:
+        return self.info.modulus
+
+    def groups(self, start:int = 0, stop:int | None = None):
+        for group_index in range(start, self.group_count() if stop == None else stop):
+            yield self.group(group_index)
+
+    def group(self, group_index:int) -> Group:
+        return Group(group_index, self.info, self.fd, None, self.cache, self.stats)
+
+    def find_item(self,key:bytes) -> tuple[Group, ReadItemResult] | None:
+        """
+        The group and item holding key, through the key index, see
+        require_key_index
+        """
+        return find_indexed_item(key, require_key_index(self), self.group)
+
+    def get_record(self,key:bytes) -> bytes | memoryview | None:
+        found = self.find_item(key)
+        if found == None:
+            return None
+        (group, item) = found
+        return group.item_content(item)[len(key) + 1:]
+
+    def record_chunks(self,key:bytes) -> Generator[Chunk, Any, None] | None:
+        """
+        The record with key as the chunks it is stored in, for records too
+        large to hold in memory at once
+        """
+        found = self.find_item(key)
+        if found == None:
+            return None
+        (group, item) = found
+        return group.record_chunks(item)
+
+    def open_record(self,key:bytes) -> io.BufferedReader | None:
+        chunks = self.record_chunks(key)
+        return None if chunks == None else open_chunks(chunks)
+
+    def get_many(self,keys:Iterable[bytes]) -> Generator[tuple[bytes, bytes | memoryview | None], Any, None]:
+        return get_many_from_index(keys, require_key_index(self), self.group)
+
+    def records_with_prefix(self, prefix:bytes) -> Generator[Record, Any, None]:
+        """
+        The records whose keys start with prefix. In key order through the key
+        index when the file has one, otherwise by a scan in file order
+        """
+        return records_with_prefix(self, prefix)
+
+    def records(self, where:Predicate | Iterable[Predicate] | None = None, select:Iterable[Position] | None = None) -> Iterable[Record]:
+        """
+        Every record, in file order. See query_records for where and select.
+        """
+        match = matcher(where)
+        records = (record for group in self.groups() for record in group.records(match))
+        return query_records(records, None, select)
+
+    def keys(self) -> Generator[bytes, Any, None]:
+        """
+        Keys in the same order as records, without reading past the key of
+        any item or following oversized chains
+        """
         for group in self.groups():
-            for record in group.records():
-                yield record
+            for key in group.keys():
+                yield key
 
 
 class DynamicHashedFile:
-    fd: BufferedReader
+    fd: ReadableFile
     info: UvFileInfo
     dyn_hash_alg: int
 
-    def __init__(self,fd:BufferedReader,over_30_fd:BufferedReader,info:UvFileInfo):
+    def __init__(self,fd:ReadableFile,over_30_fd:ReadableFile,info:UvFileInfo,cache:PageCache | None = None,stats:ScanStats | None = None,key_index:KeyIndex | None = None):
         self.fd = fd
         self.over_30_fd = over_30_fd
         self.info = info
+        self.cache = cache
+        self.stats = stats
+        self.key_index = key_index
         if info.dyn_hash_alg == None:
             raise Exception("info.dyn_hash_alg == None")
         self.dyn_hash_alg = info.dyn_hash_alg
@@ -229,226 +482,464 @@ class DynamicHashedFile:
     def __exit__(self, exc_type, exc_value, traceback):
         self.fd.close()
         self.over_30_fd.close()
-
-    def groups(self):
-        for group_index in range(self.info.modulus + 1):
-            group = Group(group_index, self.info, self.fd, self.over_30_fd)
-            yield group
-
-    def records(self):
+        if self.key_index != None:
+            self.key_index.close()
+
+    def group_count(self) -> int:
+        return self.info.modulus + 1
+
+    def groups(self, start:int = 0, stop:int | None = None):
+        for group_index in range(start, self.group_count() if stop == None else stop):
+            yield self.group(group_index)
+
+    def group(self, group_index:int) -> Group:
+        return Group(group_index, self.info, self.fd, self.over_30_fd, self.cache, self.stats)
+
+    def find_item(self,key:bytes) -> tuple[Group, ReadItemResult] | None:
+        """
+        The group and item holding key, through the key index, see
+        require_key_index
+        """
+        return find_indexed_item(key, require_key_index(self), self.group)
+
+    def get_record(self,key:bytes) -> bytes | memoryview | None:
+        found = self.find_item(key)
+        if found == None:
+            return None
+        (group, item) = found
+        return group.item_content(item)[len(key) + 1:]
+
+    def record_chunks(self,key:bytes) -> Generator[Chunk, Any, None] | None:
+        """
+        The record with key as the chunks it is stored in, for records too
+        large to hold in memory at once
+        """
+        found = self.find_item(key)
+        if found == None:
+            return None
+        (group, item) = found
+        return group.record_chunks(item)
+
+    def open_record(self,key:bytes) -> io.BufferedReader | None:
+        chunks = self.record_chunks(key)
+        return None if chunks == None else open_chunks(chunks)
+
+    def get_many(self,keys:Iterable[bytes]) -> Generator[tuple[bytes, bytes | memoryview | None], Any, None]:
+        return get_many_from_index(keys, require_key_index(self), self.group)
+
+    def records_with_prefix(self, prefix:bytes) -> Generator[Record, Any, None]:
+        """
+        The records whose keys start with prefix. In key order through the key
+        index when the file has one, otherwise by a scan in file order
+        """
+        return records_with_prefix(self, prefix)
+
+    def records(
+            self,
+            where:Predicate | Iterable[Predicate] | None = None,
+            select:Iterable[Position] | None = None,
+            sweep:bool = False,
+    ) -> Iterable[Record]:
+        """
+        Every record, in file order. See query_records for where and select.
+
+        With sweep DATA.30 and then OVER.30 are read front to back in large
+        reads instead of following each overflow and oversized chain as it
+        is met, and records come in no particular order, see swept_records.
+        """
+        match = matcher(where)
+        if sweep:
+            return query_records(Sweep(self, match=match).records(), None, select)
+        records = (record for group in self.groups() for record in group.records(match))
+        return query_records(records, None, select)
+
+    def swept_records(self, read_size:int = SWEEP_READ_SIZE, memory_bytes:int = SWEEP_MEMORY_BYTES) -> Generator[Record, Any, None]:
+        """
+        Every record, from sweeps of DATA.30 and OVER.30 in reads of
+        read_size. Oversized items are held until their last chunk is read,
+        up to memory_bytes of them; those that don't fit are read straight
+        away.
+        """
+        return Sweep(self, read_size, memory_bytes).records()
+
+    def keys(self) -> Generator[bytes, Any, None]:
+        """
+        Keys in the same order as records, without reading past the key of
+        any item or following oversized chains
+        """
         for group in self.groups():
-            for record in group.records():
-                yield record
+            for key in group.keys():
+                yield key
+
+def prefix_end(prefix:bytes) -> bytes | None:
+    """
+    The smallest key greater than every key that starts with prefix
+    """
+    stripped = prefix.rstrip(b"\xff")
+    if not stripped:
+        return None
+    return stripped[:-1] + bytes([stripped[-1] + 1])
 
 class BTreeLeaf:
-    def __init__(self,buf:bytes, info: UvFileInfo, fd: BufferedReader):
+    def __init__(self,buf:bytes, info: UvFileInfo, fd: ReadableFile, cache: PageCache | None = None, stats: ScanStats | None = None):
         self.buf = buf
         self.info = info
         self.fd = fd
+        self.cache = cache
+        self.stats = stats
+        self.decoder = decoder(info.arch, info.byteorder)
+        # the offset and length tables are decoded once for all the items
+        (data_list_offset, lengths_offset, self.data_offset, self.count) = self.layout()
+        self.item_offsets = self.decoder.table(buf, data_list_offset, self.count, "H")
+        self.item_lengths = self.decoder.table(buf, lengths_offset, self.count, "H")
 
     def read_oversize(self,offset:int):
         self.fd.seek(offset)
-        page = self.fd.read(self.info.group_length)
-        page_type = int.from_bytes(page[0:2],self.info.byteorder)
-        if page_type != 8:
-            raise Exception("Expected oversize page_type to be 8 but was ${page_type}")
-        
+        return self.parse_oversize(self.fd.read(self.info.group_length))
+
+    def oversize_pages(self, next_offset:int) -> Generator[tuple[int, bytes | memoryview], Any, None]:
+        """
+        The offset and whole page of each oversize page of a chain
+        """
+        while next_offset > 0:
+            self.fd.seek(next_offset)
+            page = self.fd.read(self.info.group_length)
+            yield (next_offset, page)
+            (next_offset, _) = self.parse_oversize(page)
+
+    def parse_oversize(self, page:bytes | memoryview):
+        oversize_page = self.decoder.oversize_page
         if self.info.arch == "32":
-            next_offset = int.from_bytes(page[4:8],self.info.byteorder)
-            length = int.from_bytes(page[8:12],self.info.byteorder)
-            buf = page[12:12+length]
+            (page_type, next_offset, length) = oversize_page.unpack_from(page)
         else:
-            length = int.from_bytes(page[4:8],self.info.byteorder)
-            next_offset = int.from_bytes(page[8:16],self.info.byteorder)
-            buf = page[16:16+length]
+            (page_type, length, next_offset) = oversize_page.unpack_from(page)
+        if page_type != 8:
+            raise Exception(f"Expected oversize page_type to be 8 but was {page_type}")
 
+        buf = page[oversize_page.size:oversize_page.size + length]
         return (next_offset,buf)
     
-    def get_record(self,key:bytes) -> bytes | None:
-        for r in self.records():
-            if r.key == key:
-                return r.raw
+    def get_record(self,key:bytes) -> bytes | memoryview | None:
+        i = self.key_index(key)
+        if i < self.item_count() and self.item_key(i) == key:
+            return self.item_record(i).raw
         return None
 
-    def records(self) -> Generator[Record, Any, None]:
-        page = self.buf
+    def get_many(self,keys:list[bytes]):
+        for key in keys:
+            yield (key, self.get_record(key))
 
+    def record_chunks(self,key:bytes) -> Generator[Chunk, Any, None] | None:
+        i = self.key_index(key)
+        if i < self.item_count() and self.item_key(i) == key:
+            return self.item_chunks(i)
+        return None
+
+    def key_index(self, key:bytes) -> int:
+        """
+        Binary search for the first item with a key >= key. Only key bytes are
+        sliced out of the items it visits.
+        """
+        return bisect_left(range(self.item_count()), key, key=self.item_key)
+
+    def layout(self):
+        page = self.buf
         if self.info.arch == "32":
             data_list_offset = 0x0e
             lengths_offset = 0x0e + 0x100
             data_offset = 0x0e + 0x200
-            data_size = int.from_bytes(page[2:4],self.info.byteorder)
-            data_items = int.from_bytes(page[0x0c:0x0e],self.info.byteorder)
+            (data_items,) = self.decoder.u16.unpack_from(page, 0x0c)
         else:
             data_list_offset = 0x1a
             lengths_offset = 0x11a
             data_offset = 0x21a
-            data_size = int.from_bytes(page[2:4],self.info.byteorder)
-            data_items = int.from_bytes(page[0x18:0x1a],self.info.byteorder)
-
-        item_order = 0
-
-        for i in range(data_items):
-            item_offset = int.from_bytes(page[data_list_offset + i  * 2:data_list_offset + (i + 1) * 2],self.info.byteorder)
-            item_length = int.from_bytes(page[lengths_offset + i  * 2:lengths_offset + (i + 1) * 2],self.info.byteorder)
-            item_bytes = page[data_offset + item_offset:data_offset + item_offset + item_length]
-            padding = item_bytes[-1]
-
-            if self.info.byteorder == 'little':
-                if item_bytes[0] < item_order:
-                    raise Exception("Btree leaf records are out of order")
-                item_order = item_bytes[0]
-                item_flags = item_bytes[1]
-
-            else:
-                if item_bytes[1] < item_order:
-                    raise Exception("Btree leaf records are out of order")
-                item_order = item_bytes[1]
-                item_flags = item_bytes[0]
-
-            if not(item_flags & (1 << 5)):
-                padding = 0
-            oversize = item_flags & (1 << 6)
-
-
-            item_bytes = item_bytes[2:len(item_bytes)-padding]
-
-            oversize_buf = b""
-
-            if oversize:
-                if self.info.arch == "32":
-                    next_offset = int.from_bytes(item_bytes[:4],self.info.byteorder)
-                    item_bytes = item_bytes[4:]
-                else:
-                    next_offset = int.from_bytes(item_bytes[:8],self.info.byteorder)
-                    item_bytes = item_bytes[8:]
-                while next_offset > 0:
-                    (next_offset,buf) = self.read_oversize(next_offset)
-                    oversize_buf = oversize_buf + buf
-
-            keylen = item_bytes.find(b'\xff')
-            (key, value) = (item_bytes[:keylen],item_bytes[keylen+1:])
-            value = value + oversize_buf
-            yield Record(key,value)
+            (data_items,) = self.decoder.u16.unpack_from(page, 0x18)
+        return (data_list_offset, lengths_offset, data_offset, data_items)
+
+    def item_count(self) -> int:
+        return self.count
+
+    def read_item(self, i:int):
+        """
+        The order, flags and unpadded content of the ith item of the leaf
+        """
+        start = self.data_offset + self.item_offsets[i]
+        item_bytes = self.buf[start:start + self.item_lengths[i]]
+        padding = item_bytes[-1]
+
+        if self.info.byteorder == 'little':
+            item_order = item_bytes[0]
+            item_flags = item_bytes[1]
+        else:
+            item_order = item_bytes[1]
+            item_flags = item_bytes[0]
+
+        if not(item_flags & (1 << 5)):
+            padding = 0
+
+        return (item_order, item_flags, item_bytes[2:len(item_bytes)-padding])
+
+    def item_key(self, i:int) -> bytes:
+        (_, item_flags, item_bytes) = self.read_item(i)
+        if item_flags & (1 << 6):
+            item_bytes = item_bytes[4:] if self.info.arch == "32" else item_bytes[8:]
+        return bytes(item_bytes[:find_byte(item_bytes, b'\xff')])
+
+    def item_parts(self, i:int) -> tuple[bytes, bytes | memoryview, int]:
+        """
+        The key of the ith item, the part of its value in the leaf and the
+        offset of its first oversize page, or 0
+        """
+        (_, item_flags, item_bytes) = self.read_item(i)
+        next_offset = 0
+
+        if item_flags & (1 << 6):
+            (next_offset,) = self.decoder.word.unpack_from(item_bytes)
+            item_bytes = item_bytes[self.decoder.word.size:]
+
+        keylen = find_byte(item_bytes, b'\xff')
+        return (bytes(item_bytes[:keylen]), item_bytes[keylen+1:], next_offset)
+
+    def oversize_chunks(self, next_offset:int) -> Generator[Chunk, Any, None]:
+        if self.stats != None and next_offset > 0:
+            self.stats.oversized_chains = self.stats.oversized_chains + 1
+        while next_offset > 0:
+            if self.stats != None:
+                self.stats.oversized_buffers = self.stats.oversized_buffers + 1
+                if self.stats.on_page_read != None:
+                    self.stats.on_page_read(next_offset, 8)
+            (next_offset,buf) = self.read_oversize(next_offset)
+            yield buf
+
+    def item_chunks(self, i:int) -> Generator[Chunk, Any, None]:
+        (_, value, next_offset) = self.item_parts(i)
+        if len(value):
+            yield value
+        for chunk in self.oversize_chunks(next_offset):
+            yield chunk
+
+    def item_record(self, i:int) -> Record:
+        (key, value, next_offset) = self.item_parts(i)
+        if next_offset > 0:
+            # joined in one allocation of the total size
+            value = b"".join([value, *self.oversize_chunks(next_offset)])
+        return Record(key,value)
+
+    def indices(self, start:bytes | None = None, end:bytes | None = None, reverse:bool = False) -> Generator[int, Any, None]:
+        """
+        The indices of the items of the leaf with start <= key < end
+        """
+        first = self.key_index(start) if start != None else 0
+        last = self.key_index(end) if end != None else self.item_count()
+        indices = reversed(range(first, last)) if reverse else range(first, last)
+
+        item_order = None
+
+        for i in indices:
+            (order, _, _) = self.read_item(i)
+            if item_order != None and (order > item_order if reverse else order < item_order):
+                raise Exception("Btree leaf records are out of order")
+            item_order = order
+
+            yield i
+
+    def records(self, start:bytes | None = None, end:bytes | None = None, reverse:bool = False) -> Generator[Record, Any, None]:
+        for i in self.indices(start, end, reverse):
+            yield self.item_record(i)
+
+    def keys(self, start:bytes | None = None, end:bytes | None = None, reverse:bool = False) -> Generator[bytes, Any, None]:
+        for i in self.indices(start, end, reverse):
+            yield self.item_key(i)
 
 class BTreeParent:
-    def __init__(self,buf:bytes,info: UvFileInfo, fd: BufferedReader):
+    def __init__(self,buf:bytes,info: UvFileInfo, fd: ReadableFile, cache: PageCache | None = None, stats: ScanStats | None = None):
         self.buf = buf
         self.info = info
         self.fd = fd
-
-    def child_group_indices(self):
-        page = self.buf 
-        
+        self.cache = cache
+        self.stats = stats
+        self.decoder = decoder(info.arch, info.byteorder)
+        (child_offset_size, key_offset_list_offset, key_length_list_offset, self.key_data_offset, key_count) = self.layout()
+        self.child_offsets = self.decoder.table(buf, child_offset_size, key_count + 1, self.decoder.word_code)
+        self.key_offsets = self.decoder.table(buf, key_offset_list_offset, key_count, "H")
+        self.key_lengths = self.decoder.table(buf, key_length_list_offset, key_count, "H")
+
+    def layout(self):
+        page = self.buf
         if self.info.arch == "32":
-
+            child_offset_size = 4
             key_offset_list_offset = 0x6 + 0x600
             key_length_list_offset = 0x6 + 0x600 + 0x300
             key_data_offset = 0x6 + 0x600 + 0x300 + 0x300
-            key_offset_list_length = int.from_bytes(page[2:4],self.info.byteorder)
-            key_offset_list_count = int.from_bytes(page[key_offset_list_offset-2:key_offset_list_offset],self.info.byteorder)
-
-            item_order = 0
-
-            for i in range(key_offset_list_count + 1):
-                child_offset = int.from_bytes(page[4 + i*4:4 + (i+1)*4],self.info.byteorder)
-                group_index = (child_offset - self.info.header_length) // self.info.group_length
-
-                key_offset = int.from_bytes(page[key_offset_list_offset + 2*i:key_offset_list_offset+2*(i+1)],self.info.byteorder)
-                key_length = int.from_bytes(page[key_length_list_offset + i*2:key_length_list_offset + (i + 1)*2],self.info.byteorder)
-                key_data = page[key_data_offset + key_offset:key_data_offset + key_offset + key_length]
-                
-                if not len(key_data):
-                    yield (group_index,None)
-                else:
-                    if key_data[0] < item_order:
-                        raise Exception("Btree index entries are out of order")
-                    item_order = key_data[0]
-                    key_data = key_data[2:]
-
-                    yield (group_index,key_data)
-
         else:
-
+            child_offset_size = 8
             key_offset_list_offset = 0xa + 0xc00
             key_length_list_offset = 0xa + 0xc00 + 0x300
             key_data_offset = 0xa + 0xc00 + 0x300 + 0x300
-            key_offset_list_length = int.from_bytes(page[2:4],self.info.byteorder)
-            key_offset_list_count = int.from_bytes(page[key_offset_list_offset-2:key_offset_list_offset],self.info.byteorder)
-
-            item_order = 0
+        (key_offset_list_count,) = self.decoder.u16.unpack_from(page, key_offset_list_offset - 2)
+        return (child_offset_size, key_offset_list_offset, key_length_list_offset, key_data_offset, key_offset_list_count)
+
+    def child_count(self) -> int:
+        return len(self.child_offsets)
+
+    def child_group_index(self, i:int) -> int:
+        return (self.child_offsets[i] - self.info.header_length) // self.info.group_length
+
+    def child_key_data(self, i:int):
+        if i >= len(self.key_offsets):
+            # the last child has no separator
+            return b""
+        start = self.key_data_offset + self.key_offsets[i]
+        return self.buf[start:start + self.key_lengths[i]]
+
+    def child_key(self, i:int) -> bytes | None:
+        """
+        The separator of the ith child: the largest key it can hold. The last
+        child has no separator.
+        """
+        key_data = self.child_key_data(i)
+        if not len(key_data):
+            return None
+        return bytes(key_data[2:])
+
+    def child_index(self, key:bytes) -> int:
+        """
+        Binary search for the child that would hold key
+        """
+        return bisect_left(range(self.child_count() - 1), key, key=self.child_key)
 
-            for i in range(key_offset_list_count + 1):
-                child_offset = int.from_bytes(page[8 + i*8:8 + (i+1)*8],self.info.byteorder)
-                group_index = (child_offset - self.info.header_length) // self.info.group_length
-
-                key_offset = int.from_bytes(page[key_offset_list_offset + 2*i:key_offset_list_offset+2*(i+1)],self.info.byteorder)
-                key_length = int.from_bytes(page[key_length_list_offset + i*2:key_length_list_offset + (i + 1)*2],self.info.byteorder)
-                key_data = page[key_data_offset + key_offset:key_data_offset + key_offset + key_length]
+    def child_group_indices(self):
+        item_order = 0
 
-                if not len(key_data):
-                    yield (group_index,None)
-                else:
-                    if key_data[0] < item_order:
-                        raise Exception("Btree index entries are out of order")
-                    item_order = key_data[0]
-                    key_data = key_data[2:]
+        for i in range(self.child_count()):
+            group_index = self.child_group_index(i)
+            key_data = self.child_key_data(i)
 
-                    yield (group_index,key_data)
+            if not len(key_data):
+                yield (group_index,None)
+            else:
+                if key_data[0] < item_order:
+                    raise Exception("Btree index entries are out of order")
+                item_order = key_data[0]
+                key_data = bytes(key_data[2:])
 
+                yield (group_index,key_data)
 
     def get_record(self,key:bytes) -> bytes | None:
-        for (i,i_key) in self.child_group_indices():
-            if i_key == None or key <= i_key:
-                buffer = BtreeBuffer(i, self.info, self.fd)
-                child = buffer.read_buffer()
-                return child.get_record(key)
-        return None
-
-    def records(self)-> Generator[Record, Any, None]:
-        for (i,_) in self.child_group_indices():
-            buffer = BtreeBuffer(i, self.info, self.fd)
-            child = buffer.read_buffer()
-            for record in child.records():
+        buffer = BtreeBuffer(self.child_group_index(self.child_index(key)), self.info, self.fd, self.cache, self.stats)
+        child = buffer.read_buffer()
+        return child.get_record(key)
+
+    def record_chunks(self,key:bytes) -> Generator[Chunk, Any, None] | None:
+        buffer = BtreeBuffer(self.child_group_index(self.child_index(key)), self.info, self.fd, self.cache, self.stats)
+        return buffer.read_buffer().record_chunks(key)
+
+    def get_many(self,keys:list[bytes]):
+        """
+        Look up sorted keys, descending into each child once for all of the
+        keys it would hold
+        """
+        last_child = self.child_count() - 1
+        i = 0
+        while i < len(keys):
+            n = self.child_index(keys[i])
+            separator = self.child_key(n) if n < last_child else None
+            j = i + 1
+            while j < len(keys) and (separator == None or keys[j] <= separator):
+                j = j + 1
+            buffer = BtreeBuffer(self.child_group_index(n), self.info, self.fd, self.cache, self.stats)
+            for result in buffer.read_buffer().get_many(keys[i:j]):
+                yield result
+            i = j
+
+    def children(self, start:bytes | None = None, end:bytes | None = None, reverse:bool = False) -> Generator["BTreeLeaf | BTreeParent", Any, None]:
+        """
+        The children of this page that can hold keys with start <= key < end
+        """
+        if start == None and end == None:
+            # the full scan checks the separators are in order on the way
+            selected = [i for (i,_) in self.child_group_indices()]
+        else:
+            first = self.child_index(start) if start != None else 0
+            last = self.child_index(end) if end != None else self.child_count() - 1
+            selected = [self.child_group_index(n) for n in range(first, last + 1)]
+
+        if reverse:
+            selected.reverse()
+
+        for i in selected:
+            buffer = BtreeBuffer(i, self.info, self.fd, self.cache, self.stats)
+            yield buffer.read_buffer()
+
+    def records(self, start:bytes | None = None, end:bytes | None = None, reverse:bool = False)-> Generator[Record, Any, None]:
+        """
+        The records below this page with start <= key < end. Only the children
+        that can hold keys in the range are read.
+        """
+        for child in self.children(start, end, reverse):
+            for record in child.records(start, end, reverse):
                 yield record
 
+    def keys(self, start:bytes | None = None, end:bytes | None = None, reverse:bool = False) -> Generator[bytes, Any, None]:
+        for child in self.children(start, end, reverse):
+            for key in child.keys(start, end, reverse):
+                yield key
+
 class BtreeBuffer:
     group_index: int
     info: UvFileInfo
-    fd: BufferedReader
+    fd: ReadableFile
 
-    def __init__(self, group_index:int, info: UvFileInfo, fd: BufferedReader):
+    def __init__(self, group_index:int, info: UvFileInfo, fd: ReadableFile, cache: PageCache | None = None, stats: ScanStats | None = None):
         self.group_index = group_index
         self.info = info
         self.fd = fd
+        self.cache = cache
+        self.stats = stats
   
     def read_buffer(self):
         group_offset = self.info.header_length + self.info.group_length * self.group_index
-        self.fd.seek(group_offset)
-        page = self.fd.read(self.info.group_length)
-        page_type = int.from_bytes(page[0:2],self.info.byteorder)
+        if self.cache != None:
+            page = self.cache.read(self.fd, group_offset, self.info.group_length)
+        else:
+            self.fd.seek(group_offset)
+            page = self.fd.read(self.info.group_length)
+        (page_type,) = decoder(self.info.arch, self.info.byteorder).u16.unpack_from(page)
+        if self.stats != None:
+            if page_type == 2:
+                self.stats.leaf_pages = self.stats.leaf_pages + 1
+            elif page_type == 1:
+                self.stats.parent_pages = self.stats.parent_pages + 1
+            if self.stats.on_page_read != None:
+                self.stats.on_page_read(group_offset, page_type)
         if page_type == 2:
-            return BTreeLeaf(page, self.info, self.fd)
+            return BTreeLeaf(page, self.info, self.fd, self.cache, self.stats)
         elif page_type == 1:
-            return BTreeParent(page, self.info, self.fd)
+            return BTreeParent(page, self.info, self.fd, self.cache, self.stats)
         else:
             raise Exception(f"Not implemented page type {page[0]}")
 
 
-    def records(self):
+    def records(self, start:bytes | None = None, end:bytes | None = None, reverse:bool = False):
         buffer = self.read_buffer()
         if not (isinstance(buffer, BTreeLeaf) or isinstance(buffer, BTreeParent)):
             raise Exception("Btree root should be either a leaf or a tree")
-        for record in buffer.records():
+        for record in buffer.records(start, end, reverse):
             yield record
 
+    def keys(self, start:bytes | None = None, end:bytes | None = None, reverse:bool = False):
+        for key in self.read_buffer().keys(start, end, reverse):
+            yield key
+
 class BtreeFile:
-    fd: BufferedReader
+    fd: ReadableFile
     info: UvFileInfo
 
-    def __init__(self,fd:BufferedReader, info:UvFileInfo):
+    def __init__(self,fd:ReadableFile, info:UvFileInfo, cache:PageCache | None = None, stats:ScanStats | None = None):
         self.fd = fd
         self.info = info
+        self.cache = cache
+        self.stats = stats
 
     def __enter__(self):
         return self
@@ -456,29 +947,144 @@ class BtreeFile:
     def __exit__(self, exc_type, exc_value, traceback):
         self.fd.close()
 
-    def records(self):
-        root = BtreeBuffer(0, self.info, self.fd)
-        for record in root.records():
+    def records(
+            self,
+            start:bytes | None = None,
+            end:bytes | None = None,
+            reverse:bool = False,
+            where:Predicate | Iterable[Predicate] | None = None,
+            select:Iterable[Position] | None = None,
+    ) -> Iterable[Record]:
+        """
+        Records in key order, or reverse key order, with start <= key < end.
+        The tree is descended once to the first leaf in range and only the
+        leaves in range are read. See query_records for where and select.
+        """
+        root = BtreeBuffer(0, self.info, self.fd, self.cache, self.stats)
+        return query_records(root.records(start, end, reverse), where, select)
+
+    def records_with_prefix(self, prefix:bytes, reverse:bool = False):
+        for record in self.records(prefix, prefix_end(prefix), reverse):
             yield record
 
+    def keys(self, start:bytes | None = None, end:bytes | None = None, reverse:bool = False) -> Generator[bytes, Any, None]:
+        """
+        Keys in the same order as records, read from the leaves without
+        following oversize pages
+        """
+        root = BtreeBuffer(0, self.info, self.fd, self.cache, self.stats)
+        for key in root.keys(start, end, reverse):
+            yield key
+
+    def leaves(self) -> Generator[tuple[int, BTreeLeaf], Any, None]:
+        """
+        The leaf pages with their group indices, in key order
+        """
+        stack = [0]
+        while stack:
+            group_index = stack.pop()
+            page = BtreeBuffer(group_index, self.info, self.fd, self.cache, self.stats).read_buffer()
+            if isinstance(page, BTreeParent):
+                stack.extend(reversed([i for (i, _) in page.child_group_indices()]))
+            else:
+                yield (group_index, page)
+
     def get_record(self,key:bytes) -> bytes | None:
-        root = BtreeBuffer(0, self.info, self.fd)
+        root = BtreeBuffer(0, self.info, self.fd, self.cache, self.stats)
         return root.read_buffer().get_record(key)
+
+    def record_chunks(self,key:bytes) -> Generator[Chunk, Any, None] | None:
+        """
+        The record with key as the chunks it is stored in, for records too
+        large to hold in memory at once
+        """
+        root = BtreeBuffer(0, self.info, self.fd, self.cache, self.stats)
+        return root.read_buffer().record_chunks(key)
+
+    def open_record(self,key:bytes) -> io.BufferedReader | None:
+        chunks = self.record_chunks(key)
+        return None if chunks == None else open_chunks(chunks)
+
+    def get_many(self,keys:Iterable[bytes]) -> Generator[tuple[bytes, bytes | memoryview | None], Any, None]:
+        """
+        Look up many keys in key order. Sorted keys share the descent from the
+        root, so each page is read at most once.
+        """
+        root = BtreeBuffer(0, self.info, self.fd, self.cache, self.stats)
+        for result in root.read_buffer().get_many(sorted(set(keys))):
+            yield result
     
-def open_uv_file(path:Path):
+def open_key_index(path:Path) -> KeyIndex | None:
+    """
+    The key index beside the hashed file at path, if there is one and the
+    file hasn't changed since it was built
+    """
+    index_path = key_index_path(path)
+    if not index_path.is_file():
+        return None
+    key_index = KeyIndex(index_path)
+    if not key_index.matches(key_index_sources(path)):
+        key_index.close()
+        return None
+    return key_index
+
+def build_key_index(path:Path, index_path:Path | None = None) -> Path:
+    """
+    Scan the static or dynamic hashed file at path and write an index of its
+    keys, by default beside it where open_uv_file finds it
+    """
+    index_path = index_path or key_index_path(path)
+    stamps = stamp(key_index_sources(path))
+    with open_uv_file(path, use_key_index=False) as f:
+        if not isinstance(f, StaticHashedFile | DynamicHashedFile):
+            raise Exception("Key indexes can only be built for hashed files")
+        entries = []
+        for group in f.groups():
+            for (item_offset, in_over_30, item) in group.located_items():
+                entries.append((group.item_key(item), group.groupIndex, item_offset, in_over_30))
+    write_key_index(index_path, stamps, entries)
+    return index_path
+
+def open_uv_file(path:Path, use_mmap:bool = False, cache_bytes:int = 0, stats:ScanStats | None = None, use_key_index:bool = True):
+    """
+    Open a Universe file of any type.
+
+    With use_mmap the hashed and B-tree files are memory mapped and records are
+    memoryview slices of the mapping rather than copies. The slices stay valid
+    after the file is closed; the mapping is released along with the last one.
+
+    Otherwise, with a cache_bytes of more than 0, the group buffers and B-tree
+    pages read from hashed and B-tree files are kept in a PageCache of up to
+    cache_bytes, shared by every lookup on the open file. It helps repeated
+    lookups and B-tree descents; full scans read each page once and only
+    churn it, so it is off by default.
+
+    With stats the reads and parsing of the file are counted into it, see
+    ScanStats.
+
+    Hashed files with an up to date key index beside them, see
+    build_key_index, look keys up through it unless use_key_index is False.
+    """
+    if stats == None:
+        return open_file_of_type(path, use_mmap, cache_bytes, None, use_key_index)
+    with stats.phase("open"):
+        return open_file_of_type(path, use_mmap, cache_bytes, stats, use_key_index)
+
+def open_file_of_type(path:Path, use_mmap:bool, cache_bytes:int, stats:ScanStats | None, use_key_index:bool):
     if not path.exists():
         raise U2ReadException(U2ReadError.FILE_NOT_FOUND)
 
     if path.is_file():
         # if the path is a file then it's probably a static hashed file. Try to read it.
 
-        fd = path.open("rb")
+        fd = open_readable(path, use_mmap, stats)
         info = read_file_header(fd)
         if isinstance(info,UvFileInfo):
+            cache = PageCache(cache_bytes) if cache_bytes and not use_mmap else None
             if info.file_type != 25:
-                return StaticHashedFile(fd,info)
+                return StaticHashedFile(fd,info,cache,stats,open_key_index(path) if use_key_index else None)
             else:
-                return BtreeFile(fd,info)
+                return BtreeFile(fd,info,cache,stats)
         else:
             fd.close()
         
@@ -486,22 +1092,25 @@ def open_uv_file(path:Path):
 
     if path.is_dir():
         if path.joinpath(".Type1").is_file():
-            return File1(path)
+            return File1(path, stats)
 
         if path.joinpath(".Type30").is_file():
-            fd = path.joinpath("DATA.30").open("rb")
+            fd = open_readable(path.joinpath("DATA.30"), use_mmap, stats)
             info = read_file_header(fd)
             if isinstance(info,UvFileInfo):
                 return DynamicHashedFile(
                     fd,
-                    path.joinpath("OVER.30").open("rb"),
-                    info
+                    open_readable(path.joinpath("OVER.30"), use_mmap, stats),
+                    info,
+                    PageCache(cache_bytes) if cache_bytes and not use_mmap else None,
+                    stats,
+                    open_key_index(path) if use_key_index else None
                 )
             else:
                 fd.close()
 
         # if neither of the above then treat it as a type 19
-        return File19(path)
+        return File19(path, stats)
 
     raise Exception("I don't know what to do")
 
@@ -509,7 +1118,8 @@ class U2ReadError(Enum):
     MACHINE_CLASS_BE_UNSUPPORTED = 1
     UNSUPPORTED_REVISION = 2
     UNSUPPORTED_ARCH = 3
-    FILE_NOT_FOUND = 3
+    UNSUPPORTED_HASH = 4
+    FILE_NOT_FOUND = 5
 
 @dataclass
 class U2ReadException(Exception):
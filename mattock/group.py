@@ -1,71 +1,125 @@
-from io import BufferedReader
+from itertools import chain
+from typing import Any, Generator
+
+from mattock.cache import PageCache
+from mattock.decode import decoder
+from mattock.mapped import ReadableFile, find_byte
+from mattock.query import Predicate, match_head
 from mattock.record import Record
+from mattock.stats import ScanStats
+from mattock.stream import Chunk, strip_key, strip_padding
 from mattock.uv_file_info import UvFileInfo
 
 
 class ReadItemResult:
     next_item_offset: int | None
     next_item_in_over30: bool
-    record_buffer: bytes | None
+    record_buffer: bytes | memoryview | None
+    oversized: bool
+    padded: bool
 
-    def __init__(self, next_item_offset: int | None, next_item_in_over30:bool, record_buffer: bytes | None) -> None:
+    def __init__(self, next_item_offset: int | None, next_item_in_over30:bool, record_buffer: bytes | memoryview | None, oversized:bool = False, padded:bool = False) -> None:
         self.next_item_offset = next_item_offset
         self.next_item_in_over30 = next_item_in_over30
         self.record_buffer = record_buffer
+        # only set when the item was read without assembling it
+        self.oversized = oversized
+        self.padded = padded
         pass
 
 class Group:
     groupIndex: int
 
-    def __init__(self, groupIndex: int, info:UvFileInfo, fd: BufferedReader, over_30_fd: BufferedReader | None):
+    def __init__(self, groupIndex: int, info:UvFileInfo, fd: ReadableFile, over_30_fd: ReadableFile | None, cache: PageCache | None = None, stats: ScanStats | None = None):
         self.groupIndex = groupIndex
         self.info = info
         self.fd = fd
         self.over_30_fd = over_30_fd
-        
-    def read_item_header(self, offset: int, in_over_30: bool = False):
+        self.cache = cache
+        self.stats = stats
+        self.decoder = decoder(info.arch, info.byteorder)
+        # the last buffer read from the primary and from the overflow/oversized buffers
+        self.buffers: dict[bool, tuple[int, bytes | memoryview]] = {}
+
+    def read_buffer(self, buffer_offset: int, in_over_30: bool = False) -> bytes | memoryview:
         fd = self.fd
 
         if self.over_30_fd and in_over_30:
             fd = self.over_30_fd
 
-        fd.seek(offset)
-        if self.info.arch == '32':
-            itemHeaderSize = 4*3
-            itemHeader = fd.read(itemHeaderSize)
-            forwardPointer = int.from_bytes(itemHeader[0:4],self.info.byteorder)
-            blink = int.from_bytes(itemHeader[4:8],self.info.byteorder)
-            flags = int.from_bytes(itemHeader[10:12],self.info.byteorder)
+        if self.cache != None:
+            return self.cache.read(fd, buffer_offset, self.info.group_length)
+
+        fd.seek(buffer_offset)
+        return fd.read(self.info.group_length)
+
+    def read_at(self, offset: int, length: int, in_over_30: bool = False) -> bytes | memoryview:
+        """
+        Items never span buffers, so the whole buffer holding an item is read
+        in one go and the rest of the chain in it is parsed from memory
+        """
+        (buffer, start) = self.buffer_at(offset, in_over_30)
+        return buffer[start:start + length]
+
+    def buffer_at(self, offset: int, in_over_30: bool = False) -> tuple[bytes | memoryview, int]:
+        """
+        The buffer holding offset and where offset is in it
+        """
+        buffer_index = (offset - self.info.header_length) // self.info.group_length
+        buffer_offset = self.info.header_length + buffer_index * self.info.group_length
+
+        current = self.buffers.get(in_over_30)
+        if current != None and current[0] == buffer_offset:
+            buffer = current[1]
         else:
-            itemHeaderSize = 8*3
-            itemHeader = fd.read(itemHeaderSize)
-            forwardPointer = int.from_bytes(itemHeader[0:8],self.info.byteorder)
-            blink = int.from_bytes(itemHeader[8:16],self.info.byteorder)
-            flags = int.from_bytes(itemHeader[18:20],self.info.byteorder)
-
-        if (self.info.byteorder == 'little'):
-            free_item = bool(flags & (1 << 1))
-            record_padded = bool(flags & (1 << 5))
-            new_style_padding = bool(flags & (1 << 4))
-            forward_to_over30 = bool(flags & (1 << 13))
-            oversized_item = bool(flags & (1 << 7))
-            oversized_item_buffer = bool(flags & (1 << 6))
+            buffer = self.read_buffer(buffer_offset, in_over_30)
+            self.buffers[in_over_30] = (buffer_offset, buffer)
+
+        return (buffer, offset - buffer_offset)
+
+    def read_item_header(self, offset: int, in_over_30: bool = False):
+        """
+        The forward pointer, back pointer, flags and size of the header of the
+        item at offset, or None past the end of the file. The flags are
+        (free_item, record_padded, new_style_padding, forward_to_over30,
+        oversized_item, oversized_item_buffer).
+        """
+        item_header = self.decoder.item_header
+        itemHeaderSize = item_header.size
+        (buffer, start) = self.buffer_at(offset, in_over_30)
+        if len(buffer) < start + itemHeaderSize:
+            return None
+
+        (forwardPointer, blink, flags) = item_header.unpack_from(buffer, start)
+        return (forwardPointer, blink, self.decoder.item_flags(flags), itemHeaderSize)
+
+    def item_length(self, offset: int, forwardPointer: int, itemHeaderSize: int) -> int:
+        """
+        The length of the item at offset after its header. An item runs up to
+        the next one or, if that is in another buffer, to the end of its own
+        """
+        current_buffer_index = (offset - self.info.header_length) // self.info.group_length
+        current_buffer_offset = self.info.header_length + current_buffer_index * self.info.group_length
+        next_buffer_offset = current_buffer_offset + self.info.group_length
+
+        if forwardPointer:
+            itemLength = forwardPointer - offset - itemHeaderSize
+
+            if (forwardPointer <= current_buffer_offset) or (forwardPointer >= next_buffer_offset):
+                itemLength = next_buffer_offset - offset - itemHeaderSize
+
         else:
-            free_item = bool(flags & (1 << 14))
-            record_padded = bool(flags & (1 << 10))
-            new_style_padding = bool(flags & (1 << 11))
-            forward_to_over30 = bool(flags & (1 << 2))
-            oversized_item = bool(flags & (1 << 8))
-            oversized_item_buffer = bool(flags & (1 << 9))
+            itemLength = next_buffer_offset - offset - itemHeaderSize
 
-        flags = (free_item, record_padded, new_style_padding, forward_to_over30, oversized_item, oversized_item_buffer)
-            
-        return (itemHeader, forwardPointer, blink, flags, itemHeaderSize)
+        return itemLength
 
-    def read_item(self, offset:int, in_over_30:bool):
+    def read_item(self, offset:int, in_over_30:bool, assemble:bool = True):
+
+        header = self.read_item_header(offset, in_over_30=in_over_30)
+        if header == None:
+            return None
 
         (
-            itemHeader,
             forwardPointer,
             blink,
             (
@@ -77,11 +131,8 @@ class Group:
                 oversized_item_buffer
             ),
             itemHeaderSize
-        ) = self.read_item_header(offset, in_over_30=in_over_30)
+        ) = header
 
-        if (itemHeader == b""):
-            return None
-        
         is_last = not forwardPointer
         next_item_offset = forwardPointer or None
         next_item_in_over30 = forward_to_over30 or in_over_30
@@ -95,95 +146,247 @@ class Group:
                 record_buffer=None
             )
 
-        current_buffer_index = (offset - self.info.header_length) // self.info.group_length
-        current_buffer_offset = self.info.header_length + current_buffer_index * self.info.group_length
-        next_buffer_offset = current_buffer_offset + self.info.group_length
-
-        if forwardPointer:
-            itemLength = forwardPointer - offset - itemHeaderSize
-
-            if (forwardPointer <= current_buffer_offset) or (forwardPointer >= next_buffer_offset):
-                itemLength = next_buffer_offset - offset - itemHeaderSize
-
-        else:
-            itemLength = next_buffer_offset - offset - itemHeaderSize
+        itemLength = self.item_length(offset, forwardPointer, itemHeaderSize)
 
         # read record content
-        fd = self.fd
-        if self.over_30_fd and in_over_30:
-            fd = self.over_30_fd
-
         record_buffer = b""
-        if itemLength > 0:                
-            record_buffer = fd.read(itemLength)
+        if itemLength > 0:
+            record_buffer = self.read_at(offset + itemHeaderSize, itemLength, in_over_30)
         
 
-        # concat oversized data
-        if oversized_item:
+        if not assemble:
+            return ReadItemResult(
+                next_item_offset = next_item_offset,
+                next_item_in_over30 = next_item_in_over30,
+                record_buffer = record_buffer,
+                oversized = oversized_item,
+                padded = record_padded
+            )
+
+        return ReadItemResult(
+            next_item_offset = next_item_offset,
+            next_item_in_over30 = next_item_in_over30,
+            record_buffer = self.assemble(record_buffer, oversized_item, record_padded)
+        )
 
-            if (self.info.arch == '32'):
-                os_offset = int.from_bytes(record_buffer[0:4],self.info.byteorder)
-                os_count = int.from_bytes(record_buffer[4:8],self.info.byteorder)
-                record_buffer = record_buffer[8:]
+    def oversized_chunks(self, record_buffer: bytes | memoryview) -> Generator[Chunk, Any, None]:
+        """
+        The part of an oversized item in its own buffer, then each of the
+        oversized buffers it points to, without copying any of them
+        """
+        oversized_stub = self.decoder.oversized_stub
+        (os_offset, os_count) = oversized_stub.unpack_from(record_buffer)
+        yield record_buffer[oversized_stub.size:]
+
+        if self.stats != None:
+            self.stats.oversized_chains = self.stats.oversized_chains + 1
+
+        for i in range(os_count):
+            os_item:ReadItemResult|None = self.read_item(os_offset,True)
+            if self.stats != None:
+                self.stats.oversized_buffers = self.stats.oversized_buffers + 1
+            if (os_item):
+                if (os_item.record_buffer):
+                    yield os_item.record_buffer
+                if not os_item.next_item_offset:
+                    break
+                os_offset = os_item.next_item_offset
             else:
-                os_offset = int.from_bytes(record_buffer[0:8],self.info.byteorder)
-                os_count = int.from_bytes(record_buffer[8:12],self.info.byteorder)
-                record_buffer = record_buffer[12:]
-
-            for i in range(os_count):
-                os_item:ReadItemResult|None = self.read_item(os_offset,True)
-                if (os_item):
-                    if (os_item.record_buffer):
-                        record_buffer = record_buffer + os_item.record_buffer
-                    else:
-                        pass
-                    if not os_item.next_item_offset:
-                        break
-                    os_offset = os_item.next_item_offset
-                else:
-                    raise Exception("Expected os_item for oversized item")
-
-            pass
-
-        if (record_padded):
+                raise Exception("Expected os_item for oversized item")
+
+    def assemble(self, record_buffer: bytes | memoryview, oversized: bool, padded: bool) -> bytes | memoryview:
+        """
+        The whole item. The chunks of an oversized item are joined in one
+        allocation of their total size.
+        """
+        if oversized:
+            record_buffer = b"".join(self.oversized_chunks(record_buffer))
+
+        if (padded):
             padding_digits = record_buffer[-1]
             if padding_digits == 0:
                 padding_digits = int.from_bytes(record_buffer[-8:],self.info.byteorder)
             record_buffer = record_buffer[:len(record_buffer) - padding_digits]
 
-        return ReadItemResult(
-            next_item_offset = next_item_offset,
-            next_item_in_over30 = next_item_in_over30,
-            record_buffer = record_buffer
-        )
+        return record_buffer
 
-
-    def records(self):
-        # yield next non-free item
+    def items(self) -> Generator[ReadItemResult, Any, None]:
+        """
+        The non-free items of the group as read from their own buffers, with
+        oversized items not yet assembled
+        """
         groupFileOffset = self.info.header_length + self.info.group_length * self.groupIndex
-        
+
         state = ReadItemResult(
             next_item_offset = groupFileOffset,
             next_item_in_over30=False,
             record_buffer=None
         )
 
+        stats = self.stats
+        if stats != None:
+            return self.counted_items(state, stats)
+        return self.walk_items(state)
+
+    def walk_items(self, state: ReadItemResult) -> Generator[ReadItemResult, Any, None]:
         while True:
             if state.next_item_offset == None:
                 break
 
-            state = self.read_item(state.next_item_offset,state.next_item_in_over30)
-            
+            state = self.read_item(state.next_item_offset,state.next_item_in_over30,assemble=False)
+
             if state == None:
                 break
 
             if state.record_buffer:
-                try:
-                    keyMarkIndex = state.record_buffer.index(b"\xff")
-                except ValueError as v:
-                    raise v
-
-                key = state.record_buffer[0:keyMarkIndex]
-                content = state.record_buffer[keyMarkIndex + 1:]
-
+                yield state
+
+    def located_items(self) -> Generator[tuple[int, bool, ReadItemResult], Any, None]:
+        """
+        items() with the offset of each item header and whether it is in
+        OVER.30, to read the item again later with read_item
+        """
+        offset = self.info.header_length + self.info.group_length * self.groupIndex
+        in_over_30 = False
+        while offset != None:
+            item = self.read_item(offset, in_over_30, assemble=False)
+            if item == None:
+                break
+            if item.record_buffer:
+                yield (offset, in_over_30, item)
+            (offset, in_over_30) = (item.next_item_offset, item.next_item_in_over30)
+
+    def counted_items(self, state: ReadItemResult, stats: ScanStats) -> Generator[ReadItemResult, Any, None]:
+        """
+        walk_items, counting the items, free items and hops to another buffer
+        of the group into stats
+        """
+        stats.groups = stats.groups + 1
+        if stats.on_group_start != None:
+            stats.on_group_start(self.groupIndex)
+
+        last_buffer = None
+        try:
+            while True:
+                if state.next_item_offset == None:
+                    break
+
+                buffer = (state.next_item_in_over30, (state.next_item_offset - self.info.header_length) // self.info.group_length)
+                if buffer != last_buffer:
+                    if last_buffer != None:
+                        stats.overflow_hops = stats.overflow_hops + 1
+                    last_buffer = buffer
+
+                state = self.read_item(state.next_item_offset,state.next_item_in_over30,assemble=False)
+
+                if state == None:
+                    break
+
+                stats.items = stats.items + 1
+                if state.record_buffer == None:
+                    stats.free_items = stats.free_items + 1
+                elif state.padded:
+                    stats.padded_items = stats.padded_items + 1
+
+                if state.record_buffer:
+                    yield state
+        finally:
+            if stats.on_group_end != None:
+                stats.on_group_end(self.groupIndex)
+
+    def item_key(self, item: ReadItemResult) -> bytes:
+        buffer = item.record_buffer or b""
+        if item.oversized:
+            buffer = buffer[self.decoder.oversized_stub.size:]
+        keyMarkIndex = find_byte(buffer, b"\xff")
+        if keyMarkIndex < 0:
+            # a key longer than the first buffer of an oversized item
+            buffer = self.item_content(item)
+            keyMarkIndex = find_byte(buffer, b"\xff")
+            if keyMarkIndex < 0:
+                raise ValueError("subsection not found")
+        return bytes(buffer[0:keyMarkIndex])
+
+    def keys(self) -> Generator[bytes, Any, None]:
+        for item in self.items():
+            yield self.item_key(item)
+
+    def item_content(self, item: ReadItemResult) -> bytes | memoryview:
+        return self.assemble(item.record_buffer or b"", item.oversized, item.padded)
+
+    def find_item(self, key: bytes) -> ReadItemResult | None:
+        """
+        The item with key, found without assembling the oversized items
+        before it
+        """
+        for item in self.items():
+            if self.item_key(item) == key:
+                return item
+        return None
+
+    def record_chunks(self, item: ReadItemResult) -> Generator[Chunk, Any, None]:
+        """
+        The record of an item after its key, in the chunks it is stored in.
+        Only the chunk being read and the last buffer's worth before the
+        padding are held in memory.
+        """
+        if item.oversized:
+            chunks = self.oversized_chunks(item.record_buffer or b"")
+        else:
+            chunks = iter([item.record_buffer or b""])
+        if item.padded:
+            chunks = strip_padding(chunks, self.info.byteorder, self.info.group_length + 8)
+        return strip_key(chunks)
+
+    def head_excluded(self, head: bytes | memoryview, match: Predicate) -> bool:
+        """
+        Whether match rules out an item from head, the start of its key and
+        record
+        """
+        keyMarkIndex = find_byte(head, b"\xff")
+        if keyMarkIndex < 0:
+            return False
+        return match_head(match, bytes(head[0:keyMarkIndex]), head[keyMarkIndex + 1:]) == False
+
+    def matching_content(self, item: ReadItemResult, match: Predicate) -> bytes | memoryview | None:
+        """
+        item_content, or None if match rules out an oversized item before its
+        whole chain is read. It is tested on the part in its own buffer and
+        then with its first oversized buffer. The last buffer, which may end
+        in padding, is never tested this way.
+        """
+        if not item.oversized:
+            return self.item_content(item)
+        record_buffer = item.record_buffer or b""
+        (_, os_count) = self.decoder.oversized_stub.unpack_from(record_buffer)
+        chunks = self.oversized_chunks(record_buffer)
+        head = [next(chunks)]
+        checks = min(os_count, 2)
+        for i in range(checks):
+            if self.head_excluded(b"".join(head), match):
+                chunks.close()
+                return None
+            if i + 1 < checks:
+                head.append(next(chunks, b""))
+        return self.assemble(b"".join(chain(head, chunks)), False, item.padded)
+
+    def records(self, match: Predicate | None = None):
+        """
+        The records of the group, or with match only those it matches. Each
+        is tested before a Record is made of it, and oversized items as far
+        as matching_content reads them.
+        """
+        # yield next non-free item
+        for item in self.items():
+            record_buffer = self.item_content(item) if match == None else self.matching_content(item, match)
+            if record_buffer:
+                keyMarkIndex = find_byte(record_buffer, b"\xff")
+                if keyMarkIndex < 0:
+                    raise ValueError("subsection not found")
+
+                key = bytes(record_buffer[0:keyMarkIndex])
+                content = record_buffer[keyMarkIndex + 1:]
+
+                if match != None and not match(key, content):
+                    continue
                 yield Record(key,content)
@@ -0,0 +1,107 @@
+from enum import Enum
+from typing import Callable
+
+MASK_32 = 0xffffffff
+
+class DynamicHashAlgorithm(Enum):
+    GENERAL = 0
+    SEQ_NUM = 1
+
+def numeric_hash(key:bytes) -> int:
+    h = 0
+    for c in key:
+        h = (h * 10 + (c & 0x0f)) & MASK_32
+    return h
+
+def delimited_numeric_hash(key:bytes) -> int:
+    # delimiters between the digits don't contribute
+    h = 0
+    for c in key:
+        if 0x30 <= c <= 0x39:
+            h = (h * 10 + c - 0x30) & MASK_32
+    return h
+
+def alphabetic_hash(key:bytes) -> int:
+    h = 0
+    for c in key:
+        h = (h * 32 + (c & 0x1f)) & MASK_32
+    return h
+
+def ascii_hash(key:bytes) -> int:
+    # sum of the key as big endian 32 bit words, the last word zero filled
+    h = 0
+    for i in range(0, len(key), 4):
+        h = h + int.from_bytes(key[i:i + 4].ljust(4, b"\x00"), "big")
+    return h & MASK_32
+
+def arbitrary_hash(key:bytes) -> int:
+    h = 0
+    for c in key:
+        h = (((h << 5) | (h >> 27)) ^ c) & MASK_32
+    return h
+
+# file type -> (hash function, significant characters, significant end)
+STATIC_HASH_TYPES: dict[int, tuple[Callable[[bytes], int], int | None, str]] = {
+    2: (numeric_hash, 8, "right"),
+    3: (delimited_numeric_hash, 8, "right"),
+    4: (alphabetic_hash, 5, "right"),
+    5: (ascii_hash, 4, "right"),
+    6: (numeric_hash, 8, "left"),
+    7: (delimited_numeric_hash, 8, "left"),
+    8: (alphabetic_hash, 5, "left"),
+    9: (ascii_hash, 4, "left"),
+    10: (numeric_hash, 20, "right"),
+    11: (delimited_numeric_hash, 20, "right"),
+    12: (alphabetic_hash, 16, "right"),
+    13: (ascii_hash, 16, "right"),
+    14: (numeric_hash, None, "left"),
+    15: (delimited_numeric_hash, None, "left"),
+    16: (alphabetic_hash, None, "left"),
+    17: (ascii_hash, None, "left"),
+    18: (arbitrary_hash, None, "left"),
+}
+
+def static_hash(file_type:int, key:bytes) -> int:
+    """
+    Hash value of a key in a static hashed file of type 2 to 18. Each type only
+    looks at the characters it considers significant.
+    """
+    if file_type not in STATIC_HASH_TYPES:
+        raise ValueError(f"Not a static hashed file type {file_type}")
+    (hash_function, significant, end) = STATIC_HASH_TYPES[file_type]
+    if significant != None:
+        key = key[-significant:] if end == "right" else key[:significant]
+    return hash_function(key)
+
+def static_group(file_type:int, key:bytes, modulus:int) -> int:
+    return static_hash(file_type, key) % modulus
+
+def general_hash(key:bytes) -> int:
+    return ascii_hash(key)
+
+def seq_num_hash(key:bytes) -> int:
+    # sequential numbers map to consecutive groups. Anything else hashes as GENERAL
+    if key.isdigit():
+        return int(key) & MASK_32
+    return general_hash(key)
+
+def dynamic_hash(dyn_hash_alg:int, key:bytes) -> int:
+    alg = DynamicHashAlgorithm(dyn_hash_alg)
+    if alg == DynamicHashAlgorithm.SEQ_NUM:
+        return seq_num_hash(key)
+    return general_hash(key)
+
+def dynamic_group_of_hash(hash_value:int, modulus:int) -> int:
+    """
+    Dynamic files split and merge groups one at a time (linear hashing). With a
+    current modulus between base and 2 * base, groups below modulus - base have
+    already split into their buddy base groups above them.
+    """
+    base = 1 << (modulus.bit_length() - 1)
+    group = hash_value % (base * 2)
+    if group >= modulus:
+        group = group - base
+    return group
+
+def dynamic_group(dyn_hash_alg:int, key:bytes, modulus:int) -> int:
+    return dynamic_group_of_hash(dynamic_hash(dyn_hash_alg, key), modulus)
@@ -0,0 +1,143 @@
+import re
+from pathlib import Path
+from typing import Any, Generator, Iterable
+
+from mattock.files import BtreeFile, open_uv_file, prefix_end
+from mattock.record import VALUE_MARK, Record
+from mattock.stats import ScanStats
+
+# The secondary indices of a file are type 25 B-trees, INDEX.000, INDEX.001
+# and so on, in the I_<file> directory beside it. INDEX.MAP names them. Each
+# entry of an index is keyed by an indexed value and holds the keys of the
+# records with that value, separated by value marks.
+
+INDEX_MAP = "INDEX.MAP"
+INDEX_FILE = re.compile(r"INDEX\.\d+")
+
+IndexEntry = tuple[bytes, list[bytes]]
+
+def index_directory(path:Path) -> Path:
+    """
+    The directory the indices of the file at path are kept in
+    """
+    return path.with_name("I_" + path.name)
+
+def read_index_map(directory:Path) -> dict[str, Path]:
+    """
+    The index files in directory by index name. Each line of INDEX.MAP names
+    an index and its INDEX.nnn file. Without a map the indices are named by
+    their files.
+    """
+    indices = {}
+    map_path = directory.joinpath(INDEX_MAP)
+    if map_path.is_file():
+        for line in map_path.read_bytes().decode("latin-1").splitlines():
+            tokens = line.split()
+            files = [t for t in tokens if INDEX_FILE.fullmatch(t)]
+            names = [t for t in tokens if not INDEX_FILE.fullmatch(t)]
+            if files and names:
+                indices[names[0]] = directory.joinpath(files[0])
+    for index_path in sorted(directory.iterdir()):
+        if INDEX_FILE.fullmatch(index_path.name) and index_path not in indices.values():
+            indices[index_path.name] = index_path
+    return indices
+
+def list_indices(path:Path) -> list[str]:
+    """
+    The names of the indices of the file at path
+    """
+    directory = index_directory(path)
+    if not directory.is_dir():
+        return []
+    return list(read_index_map(directory))
+
+def open_index(path:Path, name:str, stats:ScanStats | None = None) -> "SecondaryIndex":
+    """
+    Open the index called name of the file at path
+    """
+    directory = index_directory(path)
+    indices = read_index_map(directory) if directory.is_dir() else {}
+    index_path = indices.get(name)
+    if index_path == None:
+        raise Exception(f"No index {name} on {path}")
+    f = open_uv_file(index_path, stats=stats)
+    if not isinstance(f, BtreeFile):
+        f.__exit__(None, None, None)
+        raise Exception(f"Index {name} is not a B-tree: {index_path}")
+    return SecondaryIndex(name, f)
+
+def split_keys(raw:bytes | memoryview) -> list[bytes]:
+    data = bytes(raw)
+    return data.split(VALUE_MARK) if data else []
+
+
+class SecondaryIndex:
+    """
+    A secondary index read through its B-tree. Values are compared as bytes,
+    in the order the B-tree keeps them.
+    """
+    def __init__(self, name:str, btree:BtreeFile):
+        self.name = name
+        self.btree = btree
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.btree.__exit__(exc_type, exc_value, traceback)
+
+    def entries(self, start:bytes | None = None, end:bytes | None = None, reverse:bool = False) -> Generator[IndexEntry, Any, None]:
+        """
+        (value, record keys) for each value with start <= value < end, in
+        value order. Only the pages in range are read.
+        """
+        for r in self.btree.records(start, end, reverse):
+            yield (r.key, split_keys(r.raw))
+
+    def entries_with_prefix(self, prefix:bytes, reverse:bool = False) -> Generator[IndexEntry, Any, None]:
+        return self.entries(prefix, prefix_end(prefix), reverse)
+
+    def values(self, start:bytes | None = None, end:bytes | None = None, reverse:bool = False) -> Generator[bytes, Any, None]:
+        """
+        The indexed values, read from the leaves without the keys
+        """
+        return self.btree.keys(start, end, reverse)
+
+    def keys_for(self, value:bytes) -> list[bytes]:
+        """
+        The keys of the records with value, or [] if there are none
+        """
+        raw = self.btree.get_record(value)
+        return [] if raw == None else split_keys(raw)
+
+    def keys_between(self, start:bytes | None = None, end:bytes | None = None) -> Generator[bytes, Any, None]:
+        """
+        The keys of the records with start <= value < end, in value order
+        """
+        for (_, keys) in self.entries(start, end):
+            for key in keys:
+                yield key
+
+    def lookup(self, data_file, value:bytes) -> Generator[Record, Any, None]:
+        """
+        The records of data_file with value, each read through get_record
+        """
+        return join_records(data_file, self.keys_for(value))
+
+    def lookup_range(self, data_file, start:bytes | None = None, end:bytes | None = None) -> Generator[Record, Any, None]:
+        """
+        The records of data_file with start <= value < end, in value order
+        """
+        return join_records(data_file, self.keys_between(start, end))
+
+
+def join_records(data_file, keys:Iterable[bytes]) -> Generator[Record, Any, None]:
+    """
+    The records of data_file with keys, in the order of keys. Keys no longer
+    in the file are skipped. A hashed data_file needs a key index, see
+    build_key_index.
+    """
+    for key in keys:
+        raw = data_file.get_record(key)
+        if raw != None:
+            yield Record(key, raw)
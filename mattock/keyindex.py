@@ -0,0 +1,141 @@
+import mmap
+import os
+from bisect import bisect_left
+from pathlib import Path
+from struct import Struct
+from typing import Any, Generator
+
+# A sidecar index of the keys of a hashed file, sorted so lookups and prefix
+# searches go straight to the item without hashing or walking a group.
+#
+#   header    magic, version, number of sources, number of entries
+#   sources   size and mtime of each file the index was built from
+#   entries   key offset, group index, item offset, key length, in OVER.30
+#   keys      the keys, in entry order
+
+MAGIC = b"MTKX"
+VERSION = 2
+HEADER = Struct("<4sIIQ")
+SOURCE = Struct("<QQ")
+ENTRY = Struct("<QIQHBx")
+
+KEY_INDEX_SUFFIX = ".mattock-keys"
+
+Location = tuple[int, int, bool]
+
+def key_index_path(path:Path) -> Path:
+    """
+    Where the key index of the file at path is kept by default, beside it
+    """
+    return path.with_name(path.name + KEY_INDEX_SUFFIX)
+
+def key_index_sources(path:Path) -> list[Path]:
+    """
+    The files whose size and mtime an index of the file at path is checked
+    against
+    """
+    if path.is_dir():
+        return [path.joinpath("DATA.30"), path.joinpath("OVER.30")]
+    return [path]
+
+def stamp(paths:list[Path]) -> list[tuple[int, int]]:
+    stamps = []
+    for p in paths:
+        st = os.stat(p)
+        stamps.append((st.st_size, st.st_mtime_ns))
+    return stamps
+
+def write_key_index(index_path:Path, stamps:list[tuple[int, int]], entries:list[tuple[bytes, int, int, bool]]):
+    """
+    Write (key, group index, item offset, in OVER.30) entries. The index is
+    written beside index_path and moved over it, so readers never see a part
+    written one.
+    """
+    entries.sort(key=lambda e: e[0])
+    temp_path = index_path.with_name(index_path.name + ".tmp")
+    with temp_path.open("wb") as out:
+        out.write(HEADER.pack(MAGIC, VERSION, len(stamps), len(entries)))
+        for (size, mtime_ns) in stamps:
+            out.write(SOURCE.pack(size, mtime_ns))
+        key_offset = 0
+        for (key, group_index, item_offset, in_over_30) in entries:
+            out.write(ENTRY.pack(key_offset, group_index, item_offset, len(key), in_over_30))
+            key_offset = key_offset + len(key)
+        for (key, _, _, _) in entries:
+            out.write(key)
+    os.replace(temp_path, index_path)
+
+
+class KeyIndex:
+    """
+    A memory mapped key index. Keys and locations are read from the mapping
+    as they are needed.
+    """
+    def __init__(self, path:Path):
+        self.path = path
+        with path.open("rb") as fd:
+            self.mmap = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mmap)
+
+        (magic, self.version, source_count, self.count) = HEADER.unpack_from(self.view)
+        if magic != MAGIC:
+            self.close()
+            raise Exception(f"Not a key index: {path}")
+        self.stamps = [SOURCE.unpack_from(self.view, HEADER.size + i * SOURCE.size) for i in range(source_count)]
+        self.entries_offset = HEADER.size + source_count * SOURCE.size
+        self.keys_offset = self.entries_offset + self.count * ENTRY.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self):
+        self.view.release()
+        self.mmap.close()
+
+    def matches(self, sources:list[Path]) -> bool:
+        """
+        Whether the sources are the size and age they were when the index was
+        built. An index written by another version of mattock never matches.
+        """
+        if self.version != VERSION:
+            return False
+        try:
+            return [tuple(s) for s in self.stamps] == stamp(sources)
+        except OSError:
+            return False
+
+    def key(self, i:int) -> bytes:
+        (key_offset, _, _, key_length, _) = ENTRY.unpack_from(self.view, self.entries_offset + i * ENTRY.size)
+        start = self.keys_offset + key_offset
+        return bytes(self.view[start:start + key_length])
+
+    def location(self, i:int) -> Location:
+        """
+        The group index, item header offset and whether the item is in OVER.30
+        """
+        (_, group_index, item_offset, _, in_over_30) = ENTRY.unpack_from(self.view, self.entries_offset + i * ENTRY.size)
+        return (group_index, item_offset, bool(in_over_30))
+
+    def find(self, key:bytes) -> Location | None:
+        i = bisect_left(range(self.count), key, key=self.key)
+        if i < self.count and self.key(i) == key:
+            return self.location(i)
+        return None
+
+    def indices(self, start:bytes | None = None, end:bytes | None = None) -> range:
+        """
+        The entries with start <= key < end, in key order
+        """
+        first = bisect_left(range(self.count), start, key=self.key) if start != None else 0
+        last = bisect_left(range(self.count), end, key=self.key) if end != None else self.count
+        return range(first, max(first, last))
+
+    def items(self, start:bytes | None = None, end:bytes | None = None) -> Generator[tuple[bytes, Location], Any, None]:
+        for i in self.indices(start, end):
+            yield (self.key(i), self.location(i))
@@ -0,0 +1,209 @@
+from dataclasses import dataclass, field
+from math import ceil
+
+from mattock.files import DynamicHashedFile, StaticHashedFile
+from mattock.group import Group
+
+# Fill of a group that the suggested modulus aims for, leaving room to grow
+TARGET_LOAD = 0.8
+# Average items a group of the suggested separation should hold
+ITEMS_PER_GROUP = 8
+STATIC_SEPARATIONS = [1, 2, 4, 8, 16, 32]
+# group sizes 1 and 2
+DYNAMIC_SEPARATIONS = [4, 8]
+
+
+@dataclass()
+class GroupLayout:
+    """
+    Where the items of one group are, read from the item headers alone.
+    bytes and free_bytes include the item headers, oversized items count
+    only the part held in the group.
+
+    record_bytes is the length of the keys and records as records() returns
+    them. Oversized items are taken to fill all of their oversized buffers,
+    which makes it an estimate when there are any.
+    """
+    group_index: int
+    records: int = 0
+    bytes: int = 0
+    free_bytes: int = 0
+    buffers: int = 0
+    oversized_items: int = 0
+    oversized_buffers: int = 0
+    record_bytes: int = 0
+
+    @property
+    def overflow_buffers(self) -> int:
+        return max(0, self.buffers - 1)
+
+
+@dataclass()
+class FileLayout:
+    file_type: int
+    modulus: int
+    separation: int
+    group_length: int
+    groups: int = 0
+    records: int = 0
+    bytes: int = 0
+    free_bytes: int = 0
+    buffers: int = 0
+    overflow_buffers: int = 0
+    longest_chain: int = 0
+    oversized_items: int = 0
+    oversized_buffers: int = 0
+    # bucket start -> groups, for buckets of the given width
+    bytes_per_group: dict[int, int] = field(default_factory=dict)
+    bytes_bucket: int = 1
+    records_per_group: dict[int, int] = field(default_factory=dict)
+    records_bucket: int = 1
+    # overflow buffers -> groups
+    chain_lengths: dict[int, int] = field(default_factory=dict)
+    suggested_modulus: int = 0
+    suggested_separation: int = 0
+
+    @property
+    def free_ratio(self) -> float:
+        """
+        The share of the primary and overflow buffers taken by free items
+        """
+        total = self.bytes + self.free_bytes
+        return self.free_bytes / total if total else 0.0
+
+    @property
+    def load(self) -> float:
+        """
+        Bytes of live items against the size of the primary groups
+        """
+        size = self.groups * self.group_length
+        return self.bytes / size if size else 0.0
+
+
+def group_layout(group:Group) -> GroupLayout:
+    """
+    Walk the item chain of a group by headers, without reading any record or
+    following oversized chains
+    """
+    info = group.info
+    layout = GroupLayout(group.groupIndex)
+    offset = info.header_length + info.group_length * group.groupIndex
+    in_over_30 = False
+    last_buffer = None
+
+    while True:
+        header = group.read_item_header(offset, in_over_30)
+        if header == None:
+            break
+        (forward_pointer, _, flags, item_header_size) = header
+        (free_item, record_padded, _, forward_to_over30, oversized_item, _) = flags
+
+        buffer = (in_over_30, (offset - info.header_length) // info.group_length)
+        if buffer != last_buffer:
+            layout.buffers = layout.buffers + 1
+            last_buffer = buffer
+
+        body_length = max(0, group.item_length(offset, forward_pointer, item_header_size))
+        length = item_header_size + body_length
+        if free_item:
+            layout.free_bytes = layout.free_bytes + length
+        else:
+            layout.records = layout.records + 1
+            layout.bytes = layout.bytes + length
+            (data, start) = group.buffer_at(offset + item_header_size, in_over_30)
+            if oversized_item:
+                layout.oversized_items = layout.oversized_items + 1
+                oversized_stub = group.decoder.oversized_stub
+                (_, os_count) = oversized_stub.unpack_from(data, start)
+                layout.oversized_buffers = layout.oversized_buffers + os_count
+                body_length = body_length - oversized_stub.size + os_count * (info.group_length - item_header_size)
+            elif record_padded and body_length:
+                end = start + body_length
+                padding = data[end - 1]
+                if padding == 0:
+                    padding = int.from_bytes(data[end - 8:end], info.byteorder)
+                body_length = body_length - padding
+            # less the mark between the key and the record
+            layout.record_bytes = layout.record_bytes + max(0, body_length - 1)
+
+        if not forward_pointer:
+            break
+        offset = forward_pointer
+        in_over_30 = forward_to_over30 or in_over_30
+
+    return layout
+
+
+def histogram(values:list[int], width:int) -> dict[int, int]:
+    counts: dict[int, int] = {}
+    for value in values:
+        bucket = value - value % width
+        counts[bucket] = counts.get(bucket, 0) + 1
+    return dict(sorted(counts.items()))
+
+
+def next_prime(n:int) -> int:
+    n = max(2, n)
+    while any(n % d == 0 for d in range(2, int(n ** 0.5) + 1)):
+        n = n + 1
+    return n
+
+
+def suggest(layout:FileLayout, dynamic:bool) -> tuple[int, int]:
+    """
+    A modulus and separation for the data in layout: the smallest separation
+    whose groups hold ITEMS_PER_GROUP average items, and the modulus that
+    fills those groups to TARGET_LOAD. Static files get a prime modulus.
+    """
+    separations = DYNAMIC_SEPARATIONS if dynamic else STATIC_SEPARATIONS
+    average = layout.bytes / layout.records if layout.records else 0
+    separation = separations[-1]
+    for candidate in separations:
+        if candidate * 512 >= average * ITEMS_PER_GROUP:
+            separation = candidate
+            break
+
+    modulus = max(1, ceil(layout.bytes / (separation * 512 * TARGET_LOAD)))
+    if not dynamic:
+        modulus = next_prime(modulus)
+    return (modulus, separation)
+
+
+def analyze_layout(f:StaticHashedFile | DynamicHashedFile) -> FileLayout:
+    """
+    How the records of a static or dynamic hashed file are spread over its
+    groups, overflow and oversized buffers, with a modulus and separation
+    suggested for the same data
+    """
+    if not isinstance(f, StaticHashedFile | DynamicHashedFile):
+        raise Exception("Layouts can only be analyzed for hashed files")
+
+    info = f.info
+    layout = FileLayout(info.file_type, info.modulus, info.separation, info.group_length)
+    group_bytes = []
+    group_records = []
+    for group in f.groups():
+        g = group_layout(group)
+        if g.buffers == 0:
+            # past the end of the file
+            continue
+        layout.groups = layout.groups + 1
+        layout.records = layout.records + g.records
+        layout.bytes = layout.bytes + g.bytes
+        layout.free_bytes = layout.free_bytes + g.free_bytes
+        layout.buffers = layout.buffers + g.buffers
+        layout.overflow_buffers = layout.overflow_buffers + g.overflow_buffers
+        layout.longest_chain = max(layout.longest_chain, g.overflow_buffers)
+        layout.oversized_items = layout.oversized_items + g.oversized_items
+        layout.oversized_buffers = layout.oversized_buffers + g.oversized_buffers
+        layout.chain_lengths[g.overflow_buffers] = layout.chain_lengths.get(g.overflow_buffers, 0) + 1
+        group_bytes.append(g.bytes)
+        group_records.append(g.records)
+
+    layout.chain_lengths = dict(sorted(layout.chain_lengths.items()))
+    layout.bytes_bucket = max(1, info.group_length // 4)
+    layout.bytes_per_group = histogram(group_bytes, layout.bytes_bucket)
+    layout.records_bucket = max(1, ceil(max(group_records, default=0) / 20))
+    layout.records_per_group = histogram(group_records, layout.records_bucket)
+    (layout.suggested_modulus, layout.suggested_separation) = suggest(layout, isinstance(f, DynamicHashedFile))
+    return layout
@@ -0,0 +1,149 @@
+import mmap
+from io import SEEK_CUR, SEEK_END, SEEK_SET, BufferedReader
+from pathlib import Path
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from mattock.stats import ScanStats
+
+
+class MappedFile:
+    """
+    A read-only memory mapping of a file that provides the seek/read subset of
+    BufferedReader used by the readers. read() returns memoryview slices over
+    the mapping instead of copying, so seeks and reads cost no system calls.
+    """
+    path: Path
+    position: int
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.position = 0
+        with path.open("rb") as fd:
+            size = fd.seek(0, SEEK_END)
+            if size > 0:
+                self.mmap = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+                self.view = memoryview(self.mmap)
+            else:
+                # an empty file can't be mapped
+                self.mmap = None
+                self.view = memoryview(b"")
+        self.size = size
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def seek(self, offset: int, whence: int = SEEK_SET) -> int:
+        if whence == SEEK_SET:
+            self.position = offset
+        elif whence == SEEK_CUR:
+            self.position = self.position + offset
+        elif whence == SEEK_END:
+            self.position = self.size + offset
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+    def read(self, size: int = -1) -> memoryview:
+        start = self.position
+        end = self.size if size < 0 else min(start + size, self.size)
+        self.position = max(start, end)
+        return self.view[start:end]
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.view.release()
+        if self.mmap != None:
+            try:
+                self.mmap.close()
+            except BufferError:
+                # records still hold slices of the mapping. It is unmapped
+                # when the last of them is released.
+                pass
+
+
+def find_byte(buf: bytes | memoryview, mark: bytes) -> int:
+    """
+    bytes.find for bytes or memoryview. Keys are short so a memoryview is only
+    copied in full when the mark isn't near the start.
+    """
+    if isinstance(buf, memoryview):
+        index = bytes(buf[:256]).find(mark)
+        if index >= 0 or len(buf) <= 256:
+            return index
+        return bytes(buf).find(mark)
+    return buf.find(mark)
+
+
+# bytes of a memoryview copied at a time when looking for a mark
+FIND_WINDOW = 4096
+
+def find_mark(buf: bytes | memoryview, mark: bytes, start: int, end: int) -> int:
+    """
+    bytes.find of a one byte mark for bytes or memoryview. A memoryview is
+    copied a window at a time, only as far as the mark.
+    """
+    if not isinstance(buf, memoryview):
+        return buf.find(mark, start, end)
+    while start < end:
+        stop = min(start + FIND_WINDOW, end)
+        index = bytes(buf[start:stop]).find(mark)
+        if index >= 0:
+            return start + index
+        start = stop
+    return -1
+
+
+class CountingFile:
+    """
+    Counts and times the seeks and reads of a file into a ScanStats. Only
+    files opened with stats are wrapped.
+    """
+    def __init__(self, fd: BufferedReader | MappedFile, stats: "ScanStats"):
+        self.fd = fd
+        self.stats = stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def seek(self, offset: int, whence: int = SEEK_SET) -> int:
+        self.stats.seeks = self.stats.seeks + 1
+        return self.fd.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self.fd.tell()
+
+    def read(self, size: int = -1) -> bytes | memoryview:
+        stats = self.stats
+        if stats.on_read != None:
+            stats.on_read(self.fd.tell(), size)
+        start = perf_counter()
+        data = self.fd.read(size)
+        stats.add_time("io", perf_counter() - start)
+        stats.reads = stats.reads + 1
+        stats.bytes_read = stats.bytes_read + len(data)
+        return data
+
+    def close(self):
+        self.fd.close()
+
+
+ReadableFile = BufferedReader | MappedFile | CountingFile
+
+
+def open_readable(path: Path, use_mmap: bool = False, stats: "ScanStats | None" = None) -> ReadableFile:
+    fd = MappedFile(path) if use_mmap else path.open("rb")
+    if stats != None:
+        return CountingFile(fd, stats)
+    return fd
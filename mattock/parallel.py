@@ -0,0 +1,220 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from os import cpu_count
+from pathlib import Path
+from typing import Any, Callable, Generator, Iterable, TypeVar
+from urllib.parse import quote
+
+from mattock.count import count_file
+from mattock.export import Format, Level, record_writer, open_output
+from mattock.files import DynamicHashedFile, File1, File19, StaticHashedFile, U2ReadException, open_uv_file
+from mattock.pool import map_bounded
+from mattock.query import Position, Predicate
+from mattock.record import Record
+
+T = TypeVar("T")
+
+def partition_ranges(group_count:int, partitions:int) -> list[tuple[int,int]]:
+    partitions = max(1, min(partitions, group_count))
+    size, extra = divmod(group_count, partitions)
+    ranges = []
+    start = 0
+    for i in range(partitions):
+        stop = start + size + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+def scan_partition(
+        path:Path,
+        use_mmap:bool,
+        start:int,
+        stop:int,
+        aggregate:Callable[[Iterable[Record]], Any] | None,
+):
+    """
+    Runs in a worker process, which opens its own file descriptors
+    """
+    with open_uv_file(path, use_mmap=use_mmap) as f:
+        records = (r for g in f.groups(start, stop) for r in g.records())
+        if aggregate != None:
+            return aggregate(records)
+        return [(r.key, bytes(r.raw)) for r in records]
+
+def scan_parallel(
+        path:Path,
+        aggregate:Callable[[Iterable[Record]], Any] | None,
+        processes:int | None,
+        partitions:int | None,
+        ordered:bool,
+        use_mmap:bool,
+) -> Generator[Any, Any, None]:
+    with open_uv_file(path) as f:
+        if not isinstance(f, StaticHashedFile | DynamicHashedFile):
+            raise Exception("Parallel scans are only supported for hashed files")
+        group_count = f.group_count()
+
+    processes = processes or cpu_count() or 1
+    ranges = partition_ranges(group_count, partitions or processes * 4)
+    # at most this many partitions are scanned or waiting to be consumed at once
+    in_flight = processes * 2
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        partitions_args = ((path, use_mmap, start, stop, aggregate) for (start, stop) in ranges)
+        for result in map_bounded(executor, scan_partition, partitions_args, in_flight, ordered):
+            yield result
+
+def parallel_records(
+        path:Path,
+        processes:int | None = None,
+        partitions:int | None = None,
+        ordered:bool = True,
+        use_mmap:bool = False,
+) -> Generator[Record, Any, None]:
+    """
+    Scan a static or dynamic hashed file with a pool of worker processes, each
+    reading its own range of groups. With ordered the records come back in
+    group order, otherwise partitions are yielded as soon as they are read.
+    """
+    for partition in scan_parallel(path, None, processes, partitions, ordered, use_mmap):
+        for (key, raw) in partition:
+            yield Record(key, raw)
+
+def parallel_aggregate(
+        path:Path,
+        aggregate:Callable[[Iterable[Record]], T],
+        processes:int | None = None,
+        partitions:int | None = None,
+        ordered:bool = True,
+        use_mmap:bool = False,
+) -> Generator[T, Any, None]:
+    """
+    Like parallel_records, but each worker reduces the records of its partition
+    with aggregate and only the results are sent back. aggregate must be
+    picklable, e.g. a module level function.
+    """
+    for result in scan_parallel(path, aggregate, processes, partitions, ordered, use_mmap):
+        yield result
+
+
+@dataclass()
+class FileScan:
+    """
+    The outcome of scanning one file of an account. error holds what stopped
+    the scan, if anything did. estimated is set when bytes was counted from
+    headers and is an estimate, see FileCount.
+    """
+    file_name: str
+    path: str
+    size: int
+    file_type: int | None = None
+    records: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    error: str | None = None
+    estimated: bool = False
+
+def disk_size(path:Path) -> int:
+    """
+    The bytes on disk of a file, or of every file under a directory
+    """
+    if path.is_file():
+        return path.stat().st_size
+    size = 0
+    for (root, _, files) in os.walk(path):
+        for name in files:
+            try:
+                size = size + os.stat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return size
+
+def file_type_of(f) -> int:
+    if isinstance(f, File1):
+        return 1
+    if isinstance(f, File19):
+        return 19
+    return f.info.file_type
+
+def count_records(f, scan:FileScan):
+    for r in f.records():
+        scan.records = scan.records + 1
+        scan.bytes = scan.bytes + len(r.key) + len(r.raw)
+
+def count_headers(f, scan:FileScan):
+    """
+    Like count_records from the headers alone, see count_file
+    """
+    count = count_file(f)
+    scan.records = count.records
+    scan.bytes = count.bytes
+    scan.estimated = count.estimated
+
+FORMAT_SUFFIXES = {"ndjson": ".ndjson", "csv": ".csv", "arrow": ".arrows"}
+
+@dataclass()
+class ExportFile:
+    """
+    Writes the records of a file to its own file in directory, named after
+    it. Used as the task of scan_files.
+    """
+    directory: Path
+    format: Format = "ndjson"
+    level: Level | None = None
+    options: dict = field(default_factory=dict)
+    where: list[Predicate] | None = None
+    select: list[Position] | None = None
+    sweep: bool = False
+
+    def output_path(self, file_name:str) -> Path:
+        return self.directory.joinpath(quote(file_name, safe="") + FORMAT_SUFFIXES[self.format])
+
+    def __call__(self, f, scan:FileScan):
+        with open_output(self.output_path(scan.file_name)) as out:
+            writer = record_writer(out, self.format, self.level, **self.options)
+            if self.sweep and isinstance(f, DynamicHashedFile):
+                records = f.records(where=self.where, select=self.select, sweep=True)
+            else:
+                records = f.records(where=self.where, select=self.select)
+            for r in records:
+                writer.write(scan.file_name, r)
+                scan.records = scan.records + 1
+                scan.bytes = scan.bytes + len(r.key) + len(r.raw)
+            writer.close()
+
+def scan_file(file_name:str, path:Path, size:int, task:Callable[[Any, FileScan], None]) -> FileScan:
+    """
+    Runs in a worker process. Any error is reported in the result rather than
+    raised, so one bad file doesn't stop the others.
+    """
+    scan = FileScan(file_name, str(path), size)
+    start = time.perf_counter()
+    try:
+        with open_uv_file(path) as f:
+            scan.file_type = file_type_of(f)
+            task(f, scan)
+    except U2ReadException as e:
+        scan.error = e.error_code.name
+    except Exception as e:
+        scan.error = f"{type(e).__name__}: {e}"
+    scan.seconds = time.perf_counter() - start
+    return scan
+
+def scan_files(
+        files:Iterable[tuple[str, Path]],
+        task:Callable[[Any, FileScan], None] = count_records,
+        processes:int | None = None,
+) -> Generator[FileScan, Any, None]:
+    """
+    Run task on each of the (name, path) files with a pool of worker
+    processes, biggest files first so the longest scans start earliest.
+    Results are yielded as each file finishes. task must be picklable.
+    """
+    sized = sorted([(disk_size(path), name, path) for (name, path) in files], key=lambda f: f[0], reverse=True)
+    processes = processes or cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        args = ((name, path, size, task) for (size, name, path) in sized)
+        for result in map_bounded(executor, scan_file, args, processes * 2, False):
+            yield result
@@ -0,0 +1,40 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from typing import Any, Callable, Generator, Iterable, TypeVar
+
+T = TypeVar("T")
+
+def map_bounded(
+        executor:Executor,
+        fn:Callable[..., T],
+        items:Iterable[tuple],
+        in_flight:int,
+        ordered:bool,
+) -> Generator[T, Any, None]:
+    """
+    fn(*item) for each of items, run on executor. items are only pulled as
+    there is room, so at most in_flight calls are running or waiting to be
+    consumed at once. With ordered the results come back in the order of
+    items, otherwise as soon as each is ready.
+    """
+    pending = iter(items)
+    running: deque[Future] = deque()
+
+    def submit():
+        while len(running) < in_flight:
+            item = next(pending, None)
+            if item == None:
+                return
+            running.append(executor.submit(fn, *item))
+
+    submit()
+    while running:
+        if ordered:
+            future = running.popleft()
+        else:
+            (done, _) = wait(running, return_when=FIRST_COMPLETED)
+            future = done.pop()
+            running.remove(future)
+        result = future.result()
+        submit()
+        yield result
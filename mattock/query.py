@@ -0,0 +1,217 @@
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Callable, Generator, Iterable
+
+from mattock.record import FIELD_MARK, SUBVALUE_MARK, VALUE_MARK, Record, find_nth
+
+# Filters and projections evaluated on the raw bytes of records. A position is
+# a field, (field, value) or (field, value, subvalue), counted from 0 as in
+# Record.get, or None for the key. Records are only split as far as the
+# positions asked for, and never into Field or Value objects.
+
+Position = int | tuple[int] | tuple[int, int] | tuple[int, int, int] | None
+# called with the key and the record, which is a memoryview for files opened
+# with use_mmap
+Predicate = Callable[[bytes, bytes | memoryview], bool]
+
+MARKS = [FIELD_MARK, VALUE_MARK, SUBVALUE_MARK]
+
+def normalize_position(position:Position) -> tuple[int, ...] | None:
+    if position == None:
+        return None
+    if isinstance(position, int):
+        return (position,)
+    if not 1 <= len(position) <= 3:
+        raise Exception(f"Not a field, value or subvalue position: {position}")
+    return tuple(position)
+
+def locate(data:bytes | memoryview, position:tuple[int, ...]) -> tuple[int, int] | None:
+    """
+    The bounds of the piece of data at position, or None if the record has no
+    such field, value or subvalue. Only the marks up to the piece are found.
+    """
+    bounds = (0, len(data))
+    for (mark, n) in zip(MARKS, position):
+        bounds = find_nth(data, mark, n, bounds[0], bounds[1])
+        if bounds == None:
+            return None
+    return bounds
+
+def extract(data:bytes | memoryview, position:tuple[int, ...]) -> bytes | None:
+    """
+    A copy of the piece of data at position, or None if there is none
+    """
+    bounds = locate(data, position)
+    if bounds == None:
+        return None
+    return bytes(data[bounds[0]:bounds[1]])
+
+
+@dataclass(frozen=True)
+class Condition(ABC):
+    """
+    A test of the piece of a record at position. A missing field, value or
+    subvalue is tested as empty, as UniVerse does.
+    """
+    position: Position
+
+    def __post_init__(self):
+        object.__setattr__(self, "position", normalize_position(self.position))
+
+    def piece(self, key:bytes, data:bytes | memoryview) -> bytes:
+        if self.position == None:
+            return key
+        return extract(data, self.position) or b""
+
+    @abstractmethod
+    def test(self, piece:bytes) -> bool:
+        pass
+
+    def __call__(self, key:bytes, data:bytes | memoryview) -> bool:
+        return self.test(self.piece(key, data))
+
+    def test_head(self, key:bytes, head:bytes | memoryview) -> bool | None:
+        """
+        The test decided from head, the start of a record, or None if the
+        piece may run on past it
+        """
+        if self.position == None:
+            return self.test(key)
+        bounds = locate(head, self.position)
+        if bounds == None or bounds[1] == len(head):
+            return None
+        return self.test(bytes(head[bounds[0]:bounds[1]]))
+
+
+@dataclass(frozen=True)
+class Equals(Condition):
+    value: bytes
+
+    def test(self, piece:bytes) -> bool:
+        return piece == self.value
+
+
+@dataclass(frozen=True)
+class StartsWith(Condition):
+    prefix: bytes
+
+    def test(self, piece:bytes) -> bool:
+        return piece.startswith(self.prefix)
+
+
+@dataclass(frozen=True)
+class Between(Condition):
+    """
+    low <= piece < high, compared as bytes. Either bound may be left out.
+    """
+    low: bytes | None = None
+    high: bytes | None = None
+
+    def test(self, piece:bytes) -> bool:
+        return (self.low == None or piece >= self.low) and (self.high == None or piece < self.high)
+
+
+@dataclass(frozen=True)
+class AllOf:
+    """
+    Predicates that must all match, tested in order up to the first that
+    doesn't
+    """
+    predicates: tuple[Predicate, ...]
+
+    def __call__(self, key:bytes, data:bytes | memoryview) -> bool:
+        return all(p(key, data) for p in self.predicates)
+
+
+def matcher(where:Predicate | Iterable[Predicate] | None) -> Predicate | None:
+    """
+    One predicate of where, which is a predicate or predicates that must all
+    match
+    """
+    if where == None or callable(where):
+        return where
+    predicates = tuple(where)
+    if len(predicates) == 1:
+        return predicates[0]
+    return AllOf(predicates)
+
+def match_head(match:Predicate, key:bytes, head:bytes | memoryview) -> bool | None:
+    """
+    match decided from head, the start of a record, or None if the rest of
+    the record is needed. Only conditions can be decided early.
+    """
+    if isinstance(match, Condition):
+        return match.test_head(key, head)
+    if isinstance(match, AllOf):
+        decided: bool | None = True
+        for p in match.predicates:
+            result = match_head(p, key, head)
+            if result == False:
+                return False
+            if result == None:
+                decided = None
+        return decided
+    return None
+
+def projector(select:Iterable[Position] | None) -> Callable[[bytes | memoryview], bytes] | None:
+    """
+    A function building the raw bytes of a record holding only the pieces at
+    the select positions, in select order, one per field
+    """
+    if select == None:
+        return None
+    positions = [normalize_position(p) for p in select]
+    if None in positions:
+        raise Exception("The key is always selected")
+    return lambda data: FIELD_MARK.join([extract(data, p) or b"" for p in positions])
+
+def query_records(
+        records:Iterable[Record],
+        where:Predicate | Iterable[Predicate] | None = None,
+        select:Iterable[Position] | None = None,
+) -> Iterable[Record]:
+    """
+    The records matching where, holding only the select positions. Without
+    either the records are passed through untouched.
+    """
+    match = matcher(where)
+    project = projector(select)
+    if match == None and project == None:
+        return records
+    return filter_records(records, match, project)
+
+def filter_records(records:Iterable[Record], match:Predicate | None, project:Callable[[bytes | memoryview], bytes] | None) -> Generator[Record, Any, None]:
+    for record in records:
+        if match != None and not match(record.key, record.raw):
+            continue
+        if project != None:
+            yield Record(record.key, project(record.raw))
+        else:
+            yield record
+
+def parse_position(text:str) -> Position:
+    """
+    @ID, F, F.V or F.V.S
+    """
+    if text.upper() == "@ID":
+        return None
+    return tuple([int(p) for p in text.split(".")])
+
+CONDITION = re.compile(r"\s*([@\w.]+)\s*(\^=|>=|<|=)(.*)", re.DOTALL)
+
+def parse_condition(text:str, encoding:str = "latin-1") -> Condition:
+    """
+    POSITION=VALUE, POSITION^=PREFIX, POSITION>=LOW or POSITION<HIGH
+    """
+    m = CONDITION.fullmatch(text)
+    if m == None:
+        raise Exception(f"Not a condition: {text}")
+    (position, op, value) = (parse_position(m.group(1)), m.group(2), m.group(3).encode(encoding))
+    if op == "^=":
+        return StartsWith(position, value)
+    if op == ">=":
+        return Between(position, low=value)
+    if op == "<":
+        return Between(position, high=value)
+    return Equals(position, value)
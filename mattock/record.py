@@ -1,39 +1,128 @@
+from mattock.mapped import find_mark
+
+FIELD_MARK = b"\xfe"
+VALUE_MARK = b"\xfd"
+SUBVALUE_MARK = b"\xfc"
+
+def find_nth(data:bytes | memoryview, mark:bytes, n:int, start:int, end:int) -> tuple[int,int] | None:
+    """
+    The bounds of the nth mark-delimited piece of data[start:end], or None if
+    there are fewer than n + 1 pieces. A memoryview is searched without
+    copying past the piece.
+    """
+    find = data.find if isinstance(data, bytes) else lambda m, s, e: find_mark(data, m, s, e)
+    for _ in range(n):
+        i = find(mark, start, end)
+        if i < 0:
+            return None
+        start = i + 1
+    i = find(mark, start, end)
+    return (start, end if i < 0 else i)
+
 class Value:
-    subvalues: list[bytes]
+    __slots__ = ("raw", "_subvalues")
+    raw: bytes
 
     def get(self, s_idx:int):
-        return self.subvalues[s_idx] if s_idx < len(self.subvalues) else None
+        if self._subvalues != None:
+            return self._subvalues[s_idx] if s_idx < len(self._subvalues) else None
+        bounds = find_nth(self.raw, SUBVALUE_MARK, s_idx, 0, len(self.raw))
+        return self.raw[bounds[0]:bounds[1]] if bounds else None
+
+    @property
+    def subvalues(self) -> list[bytes]:
+        if self._subvalues == None:
+            self._subvalues = self.raw.split(SUBVALUE_MARK)
+        return self._subvalues
 
     def to_list(self):
         return self.subvalues
-    
+
     def __init__(self, bytes:bytes):
-        self.subvalues = [b for b in bytes.split(b"\xfc")]
+        self.raw = bytes
+        self._subvalues = None
 
 class Field:
-    values: list[Value]
+    __slots__ = ("raw", "_values")
+    raw: bytes
 
     def get(self, v_idx:int, s_idx:int):
-        return self.values[v_idx].get(s_idx) if v_idx < len(self.values) else None
+        if self._values != None:
+            return self._values[v_idx].get(s_idx) if v_idx < len(self._values) else None
+        bounds = find_nth(self.raw, VALUE_MARK, v_idx, 0, len(self.raw))
+        if not bounds:
+            return None
+        bounds = find_nth(self.raw, SUBVALUE_MARK, s_idx, bounds[0], bounds[1])
+        return self.raw[bounds[0]:bounds[1]] if bounds else None
+
+    @property
+    def values(self) -> list[Value]:
+        if self._values == None:
+            self._values = [Value(b) for b in self.raw.split(VALUE_MARK)]
+        return self._values
 
     def to_list(self):
         return [v.to_list() for v in self.values]
 
     def __init__(self, bytes:bytes):
-        self.values = [Value(b) for b in bytes.split(b"\xfd")]
+        self.raw = bytes
+        self._values = None
 
 class Record:
+    """
+    A record is only split into fields, values and subvalues when they are
+    asked for. The field mark offsets are indexed on the first get(), and get()
+    slices out just the requested piece.
+    """
+    __slots__ = ("key", "raw", "_field_marks", "_fields")
     key: bytes
-    fields: list[Field]
-    raw:bytes
+    raw:bytes | memoryview
+
+    def field_marks(self) -> list[int]:
+        if self._field_marks == None:
+            data = self.raw if isinstance(self.raw, bytes) else bytes(self.raw)
+            marks = []
+            i = data.find(FIELD_MARK)
+            while i >= 0:
+                marks.append(i)
+                i = data.find(FIELD_MARK, i + 1)
+            self._field_marks = marks
+        return self._field_marks
+
+    def field_bounds(self, f_idx:int) -> tuple[int,int] | None:
+        marks = self.field_marks()
+        if f_idx > len(marks):
+            return None
+        start = marks[f_idx - 1] + 1 if f_idx > 0 else 0
+        end = marks[f_idx] if f_idx < len(marks) else len(self.raw)
+        return (start, end)
 
     def get(self, f_idx: int, v_idx:int, s_idx:int):
-        return self.fields[f_idx].get(v_idx, s_idx) if f_idx < len(self.fields) else None
+        bounds = self.field_bounds(f_idx)
+        if not bounds:
+            return None
+        (start, end) = bounds
+        data = self.raw
+        if not isinstance(data, bytes):
+            data = bytes(data[start:end])
+            (start, end) = (0, len(data))
+        bounds = find_nth(data, VALUE_MARK, v_idx, start, end)
+        if not bounds:
+            return None
+        bounds = find_nth(data, SUBVALUE_MARK, s_idx, bounds[0], bounds[1])
+        return data[bounds[0]:bounds[1]] if bounds else None
+
+    @property
+    def fields(self) -> list[Field]:
+        if self._fields == None:
+            self._fields = [Field(b) for b in bytes(self.raw).split(FIELD_MARK)]
+        return self._fields
 
     def to_list(self):
         return [f.to_list() for f in self.fields]
 
-    def __init__(self, key:bytes, raw:bytes):
+    def __init__(self, key:bytes, raw:bytes | memoryview):
         self.raw = raw
         self.key = key
-        self.fields = [Field(b) for b in raw.split(b"\xfe")]
\ No newline at end of file
+        self._field_marks = None
+        self._fields = None
@@ -0,0 +1,68 @@
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Callable
+
+class ScanStats:
+    """
+    Counters for the reads and parsing of one open file, attached with
+    open_uv_file(path, stats=ScanStats()). Nothing is counted for files
+    opened without one.
+
+    Hooks, when set, are called with:
+        on_read(offset, length) for each read of the file
+        on_group_start(group_index) and on_group_end(group_index) around the
+            items of a hashed file group, its overflow buffers included
+        on_page_read(offset, page_type) for each B-tree page
+    """
+    def __init__(self):
+        self.bytes_read = 0
+        self.reads = 0
+        self.seeks = 0
+        # hashed files
+        self.groups = 0
+        self.items = 0
+        self.free_items = 0
+        self.padded_items = 0
+        self.overflow_hops = 0
+        # hashed and B-tree files
+        self.oversized_chains = 0
+        self.oversized_buffers = 0
+        # B-tree files
+        self.leaf_pages = 0
+        self.parent_pages = 0
+        # type 1 and type 19 files
+        self.directories = 0
+        self.record_files = 0
+        self.seconds: dict[str, float] = {}
+
+        self.on_read: Callable[[int, int], None] | None = None
+        self.on_group_start: Callable[[int], None] | None = None
+        self.on_group_end: Callable[[int], None] | None = None
+        self.on_page_read: Callable[[int, int], None] | None = None
+
+    @property
+    def pages(self) -> int:
+        return self.leaf_pages + self.parent_pages
+
+    def add_time(self, phase:str, seconds:float):
+        self.seconds[phase] = self.seconds.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name:str):
+        """
+        Add the time spent in the with block to the named phase. open and io
+        are timed by the readers, callers can time their own phases.
+        """
+        start = perf_counter()
+        try:
+            yield self
+        finally:
+            self.add_time(name, perf_counter() - start)
+
+    def to_dict(self) -> dict[str, int | dict[str, float]]:
+        counters = dict([(k, v) for (k, v) in vars(self).items() if isinstance(v, int)])
+        return {**counters, "pages": self.pages, "seconds": dict(self.seconds)}
+
+    def __repr__(self) -> str:
+        counters = ", ".join([f"{k}={v}" for (k, v) in self.to_dict().items() if v and k != "seconds"])
+        return f"ScanStats({counters})"
@@ -0,0 +1,109 @@
+import io
+from collections import deque
+from pathlib import Path
+from typing import Any, Generator, Iterable, Iterator
+
+from mattock.mapped import find_byte
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+Chunk = bytes | memoryview
+
+class ChunkReader(io.RawIOBase):
+    """
+    A read only binary stream over an iterable of chunks. The chunks are only
+    pulled from the iterable as they are read.
+    """
+    def __init__(self, chunks:Iterable[Chunk]):
+        self.chunks: Iterator[Chunk] = iter(chunks)
+        self.pending = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not len(self.pending):
+            chunk = next(self.chunks, None)
+            if chunk == None:
+                return 0
+            self.pending = memoryview(chunk)
+        n = min(len(b), len(self.pending))
+        b[:n] = self.pending[:n]
+        self.pending = self.pending[n:]
+        return n
+
+    def close(self):
+        close = getattr(self.chunks, "close", None)
+        if close != None:
+            close()
+        self.pending = memoryview(b"")
+        super().close()
+
+def open_chunks(chunks:Iterable[Chunk]) -> io.BufferedReader:
+    return io.BufferedReader(ChunkReader(chunks))
+
+def strip_key(chunks:Iterable[Chunk]) -> Generator[Chunk, Any, None]:
+    """
+    The chunks of an item after its key and key mark
+    """
+    it = iter(chunks)
+    for chunk in it:
+        i = find_byte(chunk, b"\xff")
+        if i >= 0:
+            if i + 1 < len(chunk):
+                yield chunk[i + 1:]
+            break
+    for chunk in it:
+        yield chunk
+
+def strip_padding(chunks:Iterable[Chunk], byteorder:str, hold:int) -> Generator[Chunk, Any, None]:
+    """
+    The chunks of a padded item without its padding. The padding length is
+    in the last byte, or the last 8 bytes when that is 0, so at least hold
+    bytes are kept back until the last chunk has been seen.
+    """
+    pending: deque[Chunk] = deque()
+    pending_length = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        pending_length = pending_length + len(chunk)
+        while pending_length - len(pending[0]) >= hold:
+            first = pending.popleft()
+            pending_length = pending_length - len(first)
+            yield first
+
+    tail = b"".join(pending)
+    if not tail:
+        return
+    padding = tail[-1]
+    if padding == 0:
+        padding = int.from_bytes(tail[-8:], byteorder)
+    if padding > len(tail):
+        raise Exception("Padding is longer than the end of the item")
+    if padding < len(tail):
+        yield tail[:len(tail) - padding]
+
+def crlf_to_field_marks(chunks:Iterable[Chunk]) -> Generator[bytes, Any, None]:
+    """
+    Replace the \\r\\n line endings of a type 1 or type 19 record with field
+    marks, including those split across two chunks
+    """
+    carry = b""
+    for chunk in chunks:
+        chunk = carry + chunk if carry else bytes(chunk)
+        if chunk.endswith(b"\r"):
+            (chunk, carry) = (chunk[:-1], b"\r")
+        else:
+            carry = b""
+        if chunk:
+            yield chunk.replace(b"\r\n", b"\xfe")
+    if carry:
+        yield carry
+
+def file_chunks(path:Path, chunk_size:int = DEFAULT_CHUNK_SIZE) -> Generator[bytes, Any, None]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
@@ -0,0 +1,274 @@
+from heapq import heappop, heappush
+from typing import TYPE_CHECKING, Any, Generator
+
+from mattock.group import Group, ReadItemResult
+from mattock.mapped import find_byte
+from mattock.query import Predicate
+from mattock.record import Record
+
+if TYPE_CHECKING:
+    from mattock.files import DynamicHashedFile
+
+# A scan of a dynamic file that reads each of its files front to back. The
+# primary groups of DATA.30 are swept first, in large reads. Every item that
+# continues in OVER.30, an overflow buffer or the chunks of an oversized
+# item, is queued by offset instead of being followed. OVER.30 is then swept
+# in ascending offset order, reading the queued buffers and any close to
+# them in large reads. Buffers found along the way are queued for the same
+# sweep when they lie ahead of it and for the next sweep when they lie behind.
+
+# bytes read at once from either file
+SWEEP_READ_SIZE = 1024 * 1024
+# queued buffers closer than this to the end of a read are read with it
+SWEEP_READ_GAP = 64 * 1024
+# bytes of oversized items held while their chunks are collected
+SWEEP_MEMORY_BYTES = 64 * 1024 * 1024
+
+
+class OversizedItem:
+    """
+    An oversized item whose chunks are being collected from OVER.30
+    """
+    __slots__ = ("chunks", "remaining", "padded", "reserved", "tested")
+
+    def __init__(self, stub_part:bytes, count:int, padded:bool, reserved:int):
+        self.chunks = [stub_part]
+        self.remaining = count
+        self.padded = padded
+        self.reserved = reserved
+        # whether the match has been tried on the first oversized buffer
+        self.tested = False
+
+
+class Sweep:
+    """
+    The state of a two pass scan of one dynamic file. Records come back in
+    the order their last piece is read, not in group order.
+    """
+    def __init__(self, f:"DynamicHashedFile", read_size:int = SWEEP_READ_SIZE, memory_bytes:int = SWEEP_MEMORY_BYTES, match:Predicate | None = None):
+        self.f = f
+        # only records matching this are returned, and the chunks of an
+        # oversized item it rules out from its stub are never read
+        self.match = match
+        self.info = f.info
+        # for item lengths, assembly and the fallback to random reads
+        self.group = Group(0, f.info, f.fd, f.over_30_fd, None, f.stats)
+        self.decoder = self.group.decoder
+        self.read_size = max(read_size, f.info.group_length)
+        self.memory_bytes = memory_bytes
+        self.held_bytes = 0
+        # (offset, order, task) queued for the sweep of OVER.30 under way:
+        # those queued before it started, sorted once in descending order
+        # and taken from the end, and a heap of those found ahead of it
+        # since. Those found behind it wait in next_queue for the next sweep.
+        self.queue: list[tuple[int, int, Any]] = []
+        self.ahead: list[tuple[int, int, Any]] = []
+        self.next_queue: list[tuple[int, int, Any]] = []
+        self.queued = 0
+        self.position = 0
+        self.block_offset = 0
+        self.block = b""
+
+    def buffer_offset(self, offset:int) -> int:
+        info = self.info
+        return info.header_length + (offset - info.header_length) // info.group_length * info.group_length
+
+    def enqueue(self, offset:int, task):
+        # the order keeps tasks for one offset from being compared
+        self.queued = self.queued + 1
+        entry = (offset, self.queued, task)
+        if offset >= self.position:
+            heappush(self.ahead, entry)
+        else:
+            self.next_queue.append(entry)
+
+    def record(self, item:bytes | memoryview) -> Record | None:
+        if not item:
+            return None
+        key_mark = find_byte(item, b"\xff")
+        if key_mark < 0:
+            raise ValueError("subsection not found")
+        (key, content) = (bytes(item[:key_mark]), item[key_mark + 1:])
+        if self.match != None and not self.match(key, content):
+            return None
+        return Record(key, content)
+
+    def walk_buffer(self, block:bytes | memoryview, block_offset:int, offset:int, in_over_30:bool) -> Generator[Record, Any, None]:
+        """
+        The records of the item chain starting at offset, as far as it runs
+        in the buffer holding offset. Where it leaves the buffer it is queued.
+        """
+        item_header = self.decoder.item_header
+        while True:
+            start = offset - block_offset
+            if len(block) < start + item_header.size:
+                return
+            (forward_pointer, _, flags) = item_header.unpack_from(block, start)
+            (free_item, record_padded, _, forward_to_over30, oversized_item, _) = self.decoder.item_flags(flags)
+            item_length = self.group.item_length(offset, forward_pointer, item_header.size)
+
+            if free_item and not forward_pointer:
+                return
+
+            if not free_item and item_length > 0:
+                body = block[start + item_header.size:start + item_header.size + item_length]
+                if oversized_item:
+                    for record in self.oversized(body, record_padded):
+                        yield record
+                else:
+                    record = self.record(self.group.assemble(body, False, record_padded))
+                    if record != None:
+                        yield record
+
+            if not forward_pointer:
+                return
+            next_in_over_30 = forward_to_over30 or in_over_30
+            if next_in_over_30 == in_over_30 and self.buffer_offset(forward_pointer) == self.buffer_offset(offset):
+                offset = forward_pointer
+                continue
+            if not next_in_over_30:
+                # a chain leaving its primary buffer for another in DATA.30
+                for record in self.random_walk(forward_pointer, False):
+                    yield record
+                return
+            self.enqueue(forward_pointer, ("chain",))
+            return
+
+    def oversized(self, stub:bytes | memoryview, padded:bool) -> Generator[Record, Any, None]:
+        """
+        Queue the chunks of an oversized item, or read them now if holding
+        them would go over the memory budget
+        """
+        oversized_stub = self.decoder.oversized_stub
+        (os_offset, os_count) = oversized_stub.unpack_from(stub)
+        if self.match != None and os_count > 0 and self.group.head_excluded(stub[oversized_stub.size:], self.match):
+            return
+        reserved = os_count * self.info.group_length
+        if self.held_bytes + reserved > self.memory_bytes:
+            record = self.record(self.group.assemble(stub, True, padded))
+            if record != None:
+                yield record
+            return
+        self.held_bytes = self.held_bytes + reserved
+        item = OversizedItem(bytes(stub[oversized_stub.size:]), os_count, padded, reserved)
+        if os_count == 0:
+            for record in self.finish(item):
+                yield record
+            return
+        self.enqueue(os_offset, ("chunk", item))
+
+    def chunk(self, block:bytes | memoryview, block_offset:int, offset:int, item:OversizedItem) -> Generator[Record, Any, None]:
+        item_header = self.decoder.item_header
+        start = offset - block_offset
+        if len(block) < start + item_header.size:
+            raise Exception("Expected os_item for oversized item")
+        (forward_pointer, _, _) = item_header.unpack_from(block, start)
+        item_length = self.group.item_length(offset, forward_pointer, item_header.size)
+        if item_length > 0:
+            item.chunks.append(bytes(block[start + item_header.size:start + item_header.size + item_length]))
+        item.remaining = item.remaining - 1
+        if item.remaining > 0 and forward_pointer:
+            if self.match != None and not item.tested:
+                # as Group.matching_content does, before queueing the rest
+                item.tested = True
+                if self.group.head_excluded(b"".join(item.chunks), self.match):
+                    self.held_bytes = self.held_bytes - item.reserved
+                    return
+            self.enqueue(forward_pointer, ("chunk", item))
+            return
+        for record in self.finish(item):
+            yield record
+
+    def finish(self, item:OversizedItem) -> Generator[Record, Any, None]:
+        self.held_bytes = self.held_bytes - item.reserved
+        record = self.record(self.group.assemble(b"".join(item.chunks), False, item.padded))
+        if record != None:
+            yield record
+
+    def random_walk(self, offset:int, in_over_30:bool) -> Generator[Record, Any, None]:
+        """
+        The rest of a chain read the way records() reads it
+        """
+        group = Group(0, self.info, self.f.fd, self.f.over_30_fd, None, self.f.stats)
+        state = ReadItemResult(offset, in_over_30, None)
+        for item in group.walk_items(state):
+            record = self.record(group.item_content(item))
+            if record != None:
+                yield record
+
+    def read_block(self, fd, offset:int, length:int) -> bytes | memoryview:
+        fd.seek(offset)
+        return fd.read(length)
+
+    def primary(self) -> Generator[Record, Any, None]:
+        """
+        The first pass, over the primary groups of DATA.30
+        """
+        info = self.info
+        groups_per_read = max(1, self.read_size // info.group_length)
+        group_count = self.f.group_count()
+        for first in range(0, group_count, groups_per_read):
+            count = min(groups_per_read, group_count - first)
+            block_offset = info.header_length + first * info.group_length
+            block = self.read_block(self.f.fd, block_offset, count * info.group_length)
+            for i in range(count):
+                offset = block_offset + i * info.group_length
+                if len(block) < offset - block_offset + self.decoder.item_header.size:
+                    # past the end of the file
+                    return
+                for record in self.walk_buffer(block, block_offset, offset, False):
+                    yield record
+
+    def next_entry(self) -> tuple[int, int, Any]:
+        if not self.ahead or (self.queue and self.queue[-1] < self.ahead[0]):
+            return self.queue.pop()
+        return heappop(self.ahead)
+
+    def overflow(self) -> Generator[Record, Any, None]:
+        """
+        The sweeps of OVER.30, each in ascending offset order, until nothing
+        is left queued
+        """
+        group_length = self.info.group_length
+        while self.queue or self.ahead or self.next_queue:
+            if not (self.queue or self.ahead):
+                self.queue = sorted(self.next_queue, reverse=True)
+                self.next_queue = []
+                self.block = b""
+            while self.queue or self.ahead:
+                (offset, _, task) = self.next_entry()
+                self.position = offset
+                buffer_offset = self.buffer_offset(offset)
+                if not (self.block_offset <= buffer_offset and buffer_offset + group_length <= self.block_offset + len(self.block)):
+                    self.block_offset = buffer_offset
+                    self.block = self.read_block(self.f.over_30_fd, buffer_offset, self.read_length(buffer_offset))
+                if task[0] == "chain":
+                    records = self.walk_buffer(self.block, self.block_offset, offset, True)
+                else:
+                    records = self.chunk(self.block, self.block_offset, offset, task[1])
+                for record in records:
+                    yield record
+
+    def read_length(self, buffer_offset:int) -> int:
+        """
+        How much to read from buffer_offset: up to the last buffer queued
+        before the sweep within reach, reading across gaps of up to
+        SWEEP_READ_GAP, and at least SWEEP_READ_GAP ahead for the buffers
+        found along the way
+        """
+        group_length = self.info.group_length
+        end = buffer_offset + min(self.read_size, max(group_length, SWEEP_READ_GAP))
+        for i in range(len(self.queue) - 1, -1, -1):
+            offset = self.queue[i][0]
+            next_end = self.buffer_offset(offset) + group_length
+            if next_end - buffer_offset > self.read_size or offset - end > SWEEP_READ_GAP:
+                break
+            end = max(end, next_end)
+        return end - buffer_offset
+
+    def records(self) -> Generator[Record, Any, None]:
+        for record in self.primary():
+            yield record
+        for record in self.overflow():
+            yield record
+
@@ -0,0 +1,214 @@
+import argparse
+import json
+import multiprocessing
+import random
+import resource
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable
+
+from mattock.files import build_key_index, open_uv_file
+from mattock.tests.generate import (
+    synthetic_data,
+    write_btree_file,
+    write_dynamic_hashed_file,
+    write_static_hashed_file,
+    write_type19_file,
+    write_type1_file,
+)
+
+# Reproducible reader benchmarks on generated files. Each case runs in a
+# fresh process so its peak RSS and system call counts are its own.
+
+LAYOUTS = {
+    "32le": ("32", "little"),
+    "32be": ("32", "big"),
+    "64le": ("64", "little"),
+    "64be": ("64", "big"),
+}
+
+def hashed_modulus(data:dict[bytes, bytes], group_length:int) -> int:
+    """
+    A modulus that fills groups to about 80%
+    """
+    total = sum(len(k) + len(v) + 16 for (k, v) in data.items())
+    return max(1, int(total / (group_length * 0.8)))
+
+def write_static(path:Path, data:dict[bytes, bytes], arch, byteorder):
+    write_static_hashed_file(path, data, 18, hashed_modulus(data, 2048), 4, arch, byteorder)
+
+def write_dynamic(path:Path, data:dict[bytes, bytes], arch, byteorder):
+    write_dynamic_hashed_file(path, data, hashed_modulus(data, 2048), 1, 0, arch, byteorder)
+
+def write_btree(path:Path, data:dict[bytes, bytes], arch, byteorder):
+    write_btree_file(path, data, arch, byteorder)
+
+def write_type1(path:Path, data:dict[bytes, bytes], arch, byteorder):
+    write_type1_file(path, data)
+
+def write_type19(path:Path, data:dict[bytes, bytes], arch, byteorder):
+    write_type19_file(path, data)
+
+FORMATS: dict[str, Callable[[Path, dict[bytes, bytes], Any, Any], None]] = {
+    "static": write_static,
+    "dynamic": write_dynamic,
+    "btree": write_btree,
+    "type1": write_type1,
+    "type19": write_type19,
+}
+
+OPERATIONS = ["scan", "keys", "get_record", "get_many"]
+
+def read_io() -> dict[str, int]:
+    """
+    The read system calls and bytes of this process so far, where the
+    platform reports them
+    """
+    try:
+        with open("/proc/self/io") as f:
+            return dict([(k, int(v)) for (k, v) in [line.split(": ") for line in f.read().splitlines()]])
+    except OSError:
+        return {}
+
+def run_case(path:str, operation:str, use_mmap:bool, lookup_keys:list[bytes]) -> dict[str, Any]:
+    """
+    Time one operation on one file and count the records and bytes it read
+    """
+    io_before = read_io()
+    start = time.perf_counter()
+    records = 0
+    data_bytes = 0
+    with open_uv_file(Path(path), use_mmap=use_mmap) as f:
+        if operation == "scan":
+            for r in f.records():
+                records = records + 1
+                data_bytes = data_bytes + len(r.key) + len(r.raw)
+        elif operation == "keys":
+            for key in f.keys():
+                records = records + 1
+                data_bytes = data_bytes + len(key)
+        elif operation == "get_record":
+            for key in lookup_keys:
+                raw = f.get_record(key)
+                records = records + 1
+                data_bytes = data_bytes + len(key) + len(raw or b"")
+        else:
+            for (key, raw) in f.get_many(lookup_keys):
+                records = records + 1
+                data_bytes = data_bytes + len(key) + len(raw or b"")
+    seconds = time.perf_counter() - start
+    io_after = read_io()
+
+    return {
+        "records": records,
+        "bytes": data_bytes,
+        "seconds": seconds,
+        "records_per_sec": records / seconds if seconds else None,
+        "mb_per_sec": data_bytes / seconds / 1e6 if seconds else None,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "read_syscalls": io_after["syscr"] - io_before["syscr"] if "syscr" in io_before else None,
+        "read_bytes": io_after["rchar"] - io_before["rchar"] if "rchar" in io_before else None,
+    }
+
+def run_isolated(path:Path, operation:str, use_mmap:bool, lookup_keys:list[bytes]) -> dict[str, Any]:
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(run_case, str(path), operation, use_mmap, lookup_keys).result()
+
+def format_number(value:float | None, digits:int = 0) -> str:
+    return "-" if value == None else f"{value:,.{digits}f}"
+
+def print_results(results:list[dict[str, Any]], baseline:dict[str, dict[str, Any]]):
+    columns = ["case", "records/s", "MB/s", "peak RSS MB", "read calls", "vs baseline"]
+    rows = []
+    for result in results:
+        change = "-"
+        previous = baseline.get(result["case"])
+        if previous != None and previous.get("records_per_sec") and result["records_per_sec"]:
+            change = f"{result['records_per_sec'] / previous['records_per_sec'] - 1:+.0%}"
+        rows.append([
+            result["case"],
+            format_number(result["records_per_sec"]),
+            format_number(result["mb_per_sec"], 1),
+            format_number(result["peak_rss_mb"], 1),
+            format_number(result["read_syscalls"]),
+            change,
+        ])
+    widths = [max([len(c)] + [len(r[i]) for r in rows]) for (i, c) in enumerate(columns)]
+    print("  ".join([c.ljust(w) if i == 0 else c.rjust(w) for (i, (c, w)) in enumerate(zip(columns, widths))]))
+    for row in rows:
+        print("  ".join([c.ljust(w) if i == 0 else c.rjust(w) for (i, (c, w)) in enumerate(zip(row, widths))]))
+
+def size_range(value:str) -> tuple[int, int]:
+    (low, _, high) = value.partition(":")
+    return (int(low), int(high or low))
+
+def main(argv:list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m mattock.tests.benchmark", description="Benchmark the readers on generated files")
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--record-size", type=size_range, default=(16, 256), help="MIN:MAX bytes per record")
+    parser.add_argument("--keys", choices=["sequential", "random"], default="sequential")
+    parser.add_argument("--key-length", type=size_range, default=(4, 16), help="MIN:MAX characters per random key")
+    parser.add_argument("--oversized-ratio", type=float, default=0.0, help="Fraction of records that are oversized")
+    parser.add_argument("--oversized-size", type=int, default=64 * 1024)
+    parser.add_argument("--lookups", type=int, default=1000, help="Keys looked up by get_record and get_many")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--formats", default=",".join(FORMATS), help="Comma separated, from " + ", ".join(FORMATS))
+    parser.add_argument("--layouts", default="32le", help="Comma separated, from " + ", ".join(LAYOUTS))
+    parser.add_argument("--operations", default=",".join(OPERATIONS), help="Comma separated, from " + ", ".join(OPERATIONS))
+    parser.add_argument("--mmap", action="store_true", help="Also run each case with use_mmap")
+    parser.add_argument("--dir", type=Path, default=None, help="Generate the files here and keep them")
+    parser.add_argument("--json", type=Path, default=None, help="Write the results to this file")
+    parser.add_argument("--compare", type=Path, default=None, help="Compare records/s with the results in this file")
+    args = parser.parse_args(argv)
+
+    data = synthetic_data(
+        args.records,
+        seed=args.seed,
+        keys=args.keys,
+        key_length=args.key_length,
+        record_size=args.record_size,
+        oversized_ratio=args.oversized_ratio,
+        oversized_size=args.oversized_size,
+    )
+    lookup_keys = random.Random(args.seed).sample(list(data), min(args.lookups, len(data)))
+
+    directory = args.dir or Path(tempfile.mkdtemp(prefix="mattock-benchmark-"))
+    baseline = {}
+    if args.compare != None:
+        baseline = dict([(r["case"], r) for r in json.loads(args.compare.read_text())])
+
+    results = []
+    try:
+        for format_name in args.formats.split(","):
+            layouts = args.layouts.split(",") if format_name not in ["type1", "type19"] else ["-"]
+            for layout_name in layouts:
+                (arch, byteorder) = LAYOUTS.get(layout_name, ("32", "little"))
+                file_name = format_name if layout_name == "-" else f"{format_name}_{layout_name}"
+                path = directory.joinpath(file_name)
+                if not path.exists():
+                    FORMATS[format_name](path, data, arch, byteorder)
+                    if format_name in ["static", "dynamic"]:
+                        # hashed files are looked up through their key index
+                        build_key_index(path)
+                for operation in args.operations.split(","):
+                    for use_mmap in [False, True] if args.mmap else [False]:
+                        case = f"{file_name} {operation}" + (" mmap" if use_mmap else "")
+                        result = {"case": case, **run_isolated(path, operation, use_mmap, lookup_keys)}
+                        results.append(result)
+                        print(f"{case}: {format_number(result['records_per_sec'])} records/s", flush=True)
+    finally:
+        if args.dir == None:
+            shutil.rmtree(directory)
+
+    print()
+    print_results(results, baseline)
+    if args.json != None:
+        args.json.write_text(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+from pathlib import Path
+
+import pytest
+
+from mattock.tests.generated import GeneratedFile
+from mattock.tests.test_data import account_file_id, account_files
+
+@pytest.fixture(params=account_files(), ids=account_file_id, scope="module")
+def file(request):
+    return request.param
+
+@pytest.fixture
+def generated(request, tmp_path:Path) -> GeneratedFile:
+    """
+    A file to write in the format and layout the test is parametrized with
+    through generated_formats
+    """
+    (format_name, layout) = request.param
+    return GeneratedFile(tmp_path.joinpath("FILE"), format_name, layout)
@@ -0,0 +1,524 @@
+import argparse
+import random
+import shutil
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Literal
+
+from mattock.files import key_to_type1_path, key_to_type19_path
+from mattock.tests.test_data import GENERATED_ACCOUNT, BtreeFileSpec, DynFileSpec, HashFileSpec, NonHashFileSpec, test_files
+
+# Writes revision 0x0c UniVerse files without a UniVerse install: static
+# hashed (types 2 to 18), dynamic (type 30), B-tree (type 25) and type 1 and
+# type 19 files, for 32 and 64 bit files of either byte order. Files are laid
+# out the way mattock reads them and written a group or page at a time, so
+# large files can be generated in little memory.
+#
+# Keys are put in groups by their CRC-32, not with mattock.hashing, so these
+# files can't check the hash functions against themselves. That is left to
+# the hash vectors from files UniVerse wrote, see mattock.tests.vectors.
+
+Arch = Literal["32", "64"]
+ByteOrder = Literal["little", "big"]
+
+class Layout:
+    byteorder: ByteOrder
+    arch: Arch
+    separation: int
+
+    def __init__(self, byteorder:ByteOrder, arch:Arch, separation:int) -> None:
+        self.byteorder = byteorder
+        self.arch = arch
+        self.separation = separation
+        self.group_length = separation * 512
+        self.header_length = separation * 512 if separation % 2 == 0 else 1024
+        self.item_header_size = 12 if arch == "32" else 24
+        self.pointer_size = 4 if arch == "32" else 8
+
+    def int(self, value:int, length:int) -> bytes:
+        return value.to_bytes(length, self.byteorder)
+
+    def pointer(self, value:int) -> bytes:
+        return self.int(value, self.pointer_size)
+
+    def buffer_offset(self, index:int) -> int:
+        return self.header_length + index * self.group_length
+
+    def file_header(self, file_type:int, modulus:int, dyn_hash_alg:int = 0) -> bytes:
+        header = bytearray(self.header_length)
+        arch_byte = 1 if self.arch == "32" else 2
+        if self.byteorder == "little":
+            header[0:4] = bytes([0x0c, arch_byte]) + b"\xef\xac"
+        else:
+            header[0:4] = b"\xac\xef" + bytes([arch_byte, 0x0c])
+        header[4:8] = self.int(file_type, 4)
+        if self.arch == "32":
+            header[12:16] = self.int(modulus, 4)
+            if file_type == 30:
+                header[0x24:0x28] = self.int(modulus, 4)
+        else:
+            header[8:16] = self.int(modulus, 8)
+            if file_type == 30:
+                header[0x20:0x28] = self.int(modulus, 8)
+        header[16:20] = self.int(self.separation, 4)
+        header[0x48:0x4c] = self.int(dyn_hash_alg, 4)
+        return bytes(header)
+
+    def item_flags(
+            self,
+            free_item:bool = False,
+            record_padded:bool = False,
+            forward_to_over30:bool = False,
+            oversized_item:bool = False,
+            oversized_item_buffer:bool = False,
+    ) -> int:
+        bits = []
+        if free_item:
+            bits.append(1)
+        if record_padded:
+            bits.append(5)
+        if forward_to_over30:
+            bits.append(13)
+        if oversized_item:
+            bits.append(7)
+        if oversized_item_buffer:
+            bits.append(6)
+        if self.byteorder == "big":
+            bits = [15 - b for b in bits]
+        flags = 0
+        for b in bits:
+            flags = flags | (1 << b)
+        return flags
+
+    def item_header(self, forward_pointer:int, blink:int, flags:int) -> bytes:
+        header = self.pointer(forward_pointer) + self.pointer(blink) + b"\x00\x00" + self.int(flags, 2)
+        if self.arch == "64":
+            header = header + b"\x00" * 4
+        return header
+
+class BufferSpace:
+    """
+    The buffers of one physical file: a static hashed file, DATA.30 or
+    OVER.30. Buffers are built in memory and written out by flush, once the
+    group they belong to is complete.
+    """
+    def __init__(self, layout:Layout, fd:BinaryIO, buffer_count:int) -> None:
+        self.layout = layout
+        self.fd = fd
+        self.buffer_count = buffer_count
+        self.dirty: dict[int, bytearray] = {}
+
+    def allocate(self) -> int:
+        self.buffer_count = self.buffer_count + 1
+        return self.buffer_count - 1
+
+    def offset(self, index:int) -> int:
+        return self.layout.buffer_offset(index)
+
+    def write(self, offset:int, data:bytes):
+        index = (offset - self.layout.header_length) // self.layout.group_length
+        buffer = self.dirty.get(index)
+        if buffer == None:
+            buffer = self.dirty[index] = bytearray(self.layout.group_length)
+        start = offset - self.layout.buffer_offset(index)
+        buffer[start:start + len(data)] = data
+
+    def flush(self):
+        for index in sorted(self.dirty):
+            self.fd.seek(self.offset(index))
+            self.fd.write(self.dirty[index])
+        self.dirty.clear()
+
+    def close(self, header:bytes):
+        self.flush()
+        self.fd.seek(0)
+        self.fd.write(header)
+        self.fd.truncate(self.offset(self.buffer_count))
+
+def pad_body(body:bytes) -> tuple[bytes, bool]:
+    padding = (4 - len(body) % 4) % 4
+    if padding == 0:
+        return (body, False)
+    return (body + b"\x00" * (padding - 1) + bytes([padding]), True)
+
+class HashedWriter:
+    """
+    Writes the items of hashed file groups, overflowing into new buffers and
+    moving records longer than large_record into oversized buffers
+    """
+    def __init__(self, layout:Layout, data:BufferSpace, over:BufferSpace, dynamic:bool, large_record:int | None = None) -> None:
+        self.layout = layout
+        self.data = data
+        self.over = over
+        self.dynamic = dynamic
+        self.large_record = large_record if large_record != None else (layout.group_length * 4) // 5
+
+    def write_oversized_chunks(self, payload:bytes) -> tuple[int, int]:
+        layout = self.layout
+        hs = layout.item_header_size
+        capacity = layout.group_length - hs
+        chunks = [payload[i:i + capacity] for i in range(0, len(payload), capacity)] or [b""]
+        indices = [self.over.allocate() for _ in chunks]
+        flags = layout.item_flags(oversized_item_buffer=True)
+        for (n, (chunk, index)) in enumerate(zip(chunks, indices)):
+            offset = self.over.offset(index)
+            if n + 1 < len(chunks):
+                forward = self.over.offset(indices[n + 1])
+            elif capacity - len(chunk) >= hs:
+                forward = offset + hs + len(chunk)
+                self.over.write(forward, layout.item_header(0, offset, layout.item_flags(free_item=True)))
+            else:
+                forward = 0
+            self.over.write(offset, layout.item_header(forward, 0, flags) + chunk)
+        return (self.over.offset(indices[0]), len(chunks))
+
+    def oversized_payload(self, data:bytes) -> tuple[bytes, bool]:
+        """
+        The padded data of an oversized item. The last chunk either fills its
+        buffer or leaves room for a free item after it.
+        """
+        hs = self.layout.item_header_size
+        capacity = self.layout.group_length - hs
+        (payload, padded) = pad_body(data)
+        remaining = (capacity - len(payload) % capacity) % capacity
+        if 0 < remaining < hs:
+            total = len(payload) - len(data) + remaining
+            payload = data + b"\x00" * (total - 1) + bytes([total])
+            padded = True
+        return (payload, padded)
+
+    def write_group(self, group_index:int, items:list[tuple[bytes, bytes]]):
+        layout = self.layout
+        hs = layout.item_header_size
+        space = self.data
+        offset = space.offset(group_index)
+        buffer_end = offset + layout.group_length
+        blink = 0
+
+        for (key, value) in items:
+            body = key + b"\xff" + value
+            oversized = len(body) > self.large_record
+            if oversized:
+                (payload, padded) = self.oversized_payload(value)
+                (os_offset, os_count) = self.write_oversized_chunks(payload)
+                body = layout.pointer(os_offset) + layout.int(os_count, 4) + key + b"\xff"
+            else:
+                (body, padded) = pad_body(body)
+
+            if buffer_end - (offset + hs + len(body)) < hs:
+                # chain a free item to a new overflow buffer
+                new_offset = self.over.offset(self.over.allocate())
+                link_flags = layout.item_flags(free_item=True, forward_to_over30=self.dynamic)
+                space.write(offset, layout.item_header(new_offset, blink, link_flags))
+                space = self.over
+                offset = new_offset
+                buffer_end = offset + layout.group_length
+                blink = 0
+
+            forward = offset + hs + len(body)
+            flags = layout.item_flags(record_padded=padded, oversized_item=oversized)
+            space.write(offset, layout.item_header(forward, blink, flags) + body)
+            blink = offset
+            offset = forward
+
+        space.write(offset, layout.item_header(0, blink, layout.item_flags(free_item=True)))
+        self.data.flush()
+        self.over.flush()
+
+def hashed_groups(data:dict[bytes, bytes], modulus:int) -> list[list[tuple[bytes, bytes]]]:
+    groups: list[list[tuple[bytes, bytes]]] = [[] for _ in range(modulus)]
+    for (key, value) in data.items():
+        groups[zlib.crc32(key) % modulus].append((key, value))
+    return groups
+
+def write_static_hashed_file(
+        path:Path,
+        data:dict[bytes, bytes],
+        file_type:int,
+        modulus:int,
+        separation:int,
+        arch:Arch = "32",
+        byteorder:ByteOrder = "little",
+        large_record:int | None = None,
+):
+    layout = Layout(byteorder, arch, separation)
+    with open(path, "wb") as fd:
+        space = BufferSpace(layout, fd, modulus)
+        writer = HashedWriter(layout, space, space, dynamic=False, large_record=large_record)
+        for (i, items) in enumerate(hashed_groups(data, modulus)):
+            writer.write_group(i, items)
+        space.close(layout.file_header(file_type, modulus))
+
+def write_dynamic_hashed_file(
+        path:Path,
+        data:dict[bytes, bytes],
+        modulus:int,
+        group_size:int = 1,
+        dyn_hash_alg:int = 0,
+        arch:Arch = "32",
+        byteorder:ByteOrder = "little",
+        large_record:int | None = None,
+):
+    # GROUP.SIZE 1 is 2048 byte groups and 2 is 4096
+    layout = Layout(byteorder, arch, group_size * 4)
+    path.mkdir(parents=True, exist_ok=True)
+    path.joinpath(".Type30").write_bytes(b"")
+    header = layout.file_header(30, modulus, dyn_hash_alg)
+    with open(path.joinpath("DATA.30"), "wb") as data_fd, open(path.joinpath("OVER.30"), "wb") as over_fd:
+        data_space = BufferSpace(layout, data_fd, modulus)
+        over_space = BufferSpace(layout, over_fd, 0)
+        writer = HashedWriter(layout, data_space, over_space, dynamic=True, large_record=large_record)
+        for (i, items) in enumerate(hashed_groups(data, modulus)):
+            writer.write_group(i, items)
+        data_space.close(header)
+        over_space.close(header)
+
+class BtreeWriter:
+    """
+    Writes sorted records to leaf pages, then builds the parent pages above
+    them level by level. The root is always page 0.
+    """
+    def __init__(self, layout:Layout, fd:BinaryIO, large_record:int | None = None) -> None:
+        self.layout = layout
+        self.fd = fd
+        self.page_count = 1
+        self.large_record = large_record if large_record != None else layout.group_length // 4
+        if layout.arch == "32":
+            self.leaf_offsets = 0x0e
+            self.leaf_count = 0x0c
+            self.parent_keys = 0x6 + 0x600
+        else:
+            self.leaf_offsets = 0x1a
+            self.leaf_count = 0x18
+            self.parent_keys = 0xa + 0xc00
+
+    def allocate(self) -> int:
+        self.page_count = self.page_count + 1
+        return self.page_count - 1
+
+    def write_page(self, index:int, page:bytes):
+        self.fd.seek(self.layout.buffer_offset(index))
+        self.fd.write(page.ljust(self.layout.group_length, b"\x00"))
+
+    def order_flags(self, order:int, flags:int) -> bytes:
+        if self.layout.byteorder == "little":
+            return bytes([order, flags])
+        return bytes([flags, order])
+
+    def write_oversize(self, payload:bytes) -> int:
+        layout = self.layout
+        capacity = layout.group_length - (12 if layout.arch == "32" else 16)
+        chunks = [payload[i:i + capacity] for i in range(0, len(payload), capacity)]
+        indices = [self.allocate() for _ in chunks]
+        for (n, (chunk, index)) in enumerate(zip(chunks, indices)):
+            next_offset = layout.buffer_offset(indices[n + 1]) if n + 1 < len(chunks) else 0
+            if layout.arch == "32":
+                page = layout.int(8, 2) + b"\x00\x00" + layout.int(next_offset, 4) + layout.int(len(chunk), 4) + chunk
+            else:
+                page = layout.int(8, 2) + b"\x00\x00" + layout.int(len(chunk), 4) + layout.int(next_offset, 8) + chunk
+            self.write_page(index, page)
+        return layout.buffer_offset(indices[0])
+
+    def leaf_body(self, key:bytes, value:bytes) -> tuple[int, bytes]:
+        """
+        The flags and padded body of a leaf item, writing the oversize pages
+        of a large record
+        """
+        if len(key) + len(value) + 1 > self.large_record:
+            body = self.layout.pointer(self.write_oversize(value[16:])) + key + b"\xff" + value[:16]
+            oversize = True
+        else:
+            body = key + b"\xff" + value
+            oversize = False
+        (body, padded) = pad_body(body)
+        return ((1 << 5 if padded else 0) | (1 << 6 if oversize else 0), body)
+
+    def leaf_page(self, items:list[tuple[int, bytes]]) -> bytes:
+        layout = self.layout
+        page = bytearray(layout.group_length)
+        page[0:2] = layout.int(2, 2)
+        page[self.leaf_count:self.leaf_count + 2] = layout.int(len(items), 2)
+        data_offset = self.leaf_offsets + 0x200
+        position = 0
+        for (i, (flags, body)) in enumerate(items):
+            item = self.order_flags(i, flags) + body
+            page[self.leaf_offsets + i * 2:self.leaf_offsets + i * 2 + 2] = layout.int(position, 2)
+            page[self.leaf_offsets + 0x100 + i * 2:self.leaf_offsets + 0x100 + i * 2 + 2] = layout.int(len(item), 2)
+            page[data_offset + position:data_offset + position + len(item)] = item
+            position = position + len(item)
+        page[2:4] = layout.int(position, 2)
+        return bytes(page)
+
+    def parent_page(self, children:list[tuple[int, bytes]]) -> bytes:
+        layout = self.layout
+        page = bytearray(layout.group_length)
+        page[0:2] = layout.int(1, 2)
+        p = layout.pointer_size
+        first = 4 if layout.arch == "32" else 8
+        offsets_at = self.parent_keys
+        lengths_at = offsets_at + 0x300
+        data_at = lengths_at + 0x300
+        page[offsets_at - 2:offsets_at] = layout.int(len(children) - 1, 2)
+        position = 0
+        for (i, (child_index, max_key)) in enumerate(children):
+            page[first + i * p:first + (i + 1) * p] = layout.pointer(layout.buffer_offset(child_index))
+            entry = b"" if i + 1 == len(children) else bytes([min(i, 0xff), 0]) + max_key
+            page[offsets_at + i * 2:offsets_at + i * 2 + 2] = layout.int(position, 2)
+            page[lengths_at + i * 2:lengths_at + i * 2 + 2] = layout.int(len(entry), 2)
+            page[data_at + position:data_at + position + len(entry)] = entry
+            position = position + len(entry)
+        page[2:4] = layout.int(position, 2)
+        return bytes(page)
+
+    def write(self, data:dict[bytes, bytes], leaf_items:int = 128, parent_children:int = 384):
+        data_capacity = self.layout.group_length - (self.leaf_offsets + 0x200)
+        # the page index and last key of each leaf written so far
+        level: list[tuple[int, bytes]] = []
+        items: list[tuple[int, bytes]] = []
+        last_key = b""
+        used = 0
+        for key in sorted(data):
+            (flags, body) = self.leaf_body(key, data[key])
+            if len(items) >= min(leaf_items, 128) or used + len(body) + 2 > data_capacity:
+                index = self.allocate()
+                self.write_page(index, self.leaf_page(items))
+                level.append((index, last_key))
+                items = []
+                used = 0
+            items.append((flags, body))
+            last_key = key
+            used = used + len(body) + 2
+
+        if not level:
+            self.write_page(0, self.leaf_page(items))
+            return
+
+        index = self.allocate()
+        self.write_page(index, self.leaf_page(items))
+        level.append((index, last_key))
+
+        data_capacity = self.layout.group_length - (self.parent_keys + 0x600)
+        while True:
+            parents: list[list[tuple[int, bytes]]] = [[]]
+            used = 0
+            for child in level:
+                if len(parents[-1]) >= min(parent_children, 384) or used + len(child[1]) + 2 > data_capacity:
+                    parents.append([])
+                    used = 0
+                parents[-1].append(child)
+                used = used + len(child[1]) + 2
+            if len(parents) == 1:
+                self.write_page(0, self.parent_page(parents[0]))
+                return
+            level = []
+            for children in parents:
+                index = self.allocate()
+                self.write_page(index, self.parent_page(children))
+                level.append((index, children[-1][1]))
+
+def write_btree_file(
+        path:Path,
+        data:dict[bytes, bytes],
+        arch:Arch = "32",
+        byteorder:ByteOrder = "little",
+        leaf_items:int = 128,
+        parent_children:int = 384,
+        large_record:int | None = None,
+):
+    layout = Layout(byteorder, arch, 8 if arch == "32" else 16)
+    with open(path, "wb") as fd:
+        writer = BtreeWriter(layout, fd, large_record)
+        writer.write(data, leaf_items, parent_children)
+        fd.seek(0)
+        fd.write(layout.file_header(25, 1))
+        fd.truncate(layout.buffer_offset(writer.page_count))
+
+def write_type1_file(path:Path, data:dict[bytes, bytes]):
+    path.mkdir(parents=True, exist_ok=True)
+    path.joinpath(".Type1").write_bytes(b"")
+    for (key, value) in data.items():
+        record_path = path.joinpath(key_to_type1_path(key))
+        record_path.parent.mkdir(parents=True, exist_ok=True)
+        record_path.write_bytes(value.replace(b"\xfe", b"\r\n"))
+
+def write_type19_file(path:Path, data:dict[bytes, bytes]):
+    path.mkdir(parents=True, exist_ok=True)
+    for (key, value) in data.items():
+        path.joinpath(key_to_type19_path(key)).write_bytes(value.replace(b"\xfe", b"\r\n"))
+
+# random bytes are mapped onto letters, digits and spaces with about one in
+# 32 bytes a field, value or subvalue mark
+RECORD_ALPHABET = bytes(
+    [0xfe] * 5 + [0xfd] * 2 + [0xfc] +
+    list(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789 ") * 4
+)[:256]
+KEY_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+def synthetic_data(
+        count:int,
+        seed:int = 0,
+        keys:Literal["sequential", "random"] = "sequential",
+        key_length:tuple[int, int] = (4, 16),
+        record_size:tuple[int, int] = (16, 256),
+        oversized_ratio:float = 0.0,
+        oversized_size:int = 64 * 1024,
+) -> dict[bytes, bytes]:
+    """
+    count reproducible records. Keys are sequential numbers or random
+    alphanumeric strings of key_length characters. Records are record_size
+    bytes of text and marks, except oversized_ratio of them which are
+    oversized_size bytes.
+    """
+    rng = random.Random(seed)
+    data: dict[bytes, bytes] = {}
+    while len(data) < count:
+        if keys == "sequential":
+            key = str(len(data) + 1).encode()
+        else:
+            key = bytes(rng.choices(KEY_ALPHABET, k=rng.randint(*key_length)))
+            if key in data:
+                continue
+        if rng.random() < oversized_ratio:
+            size = oversized_size
+        else:
+            size = rng.randint(*record_size)
+        data[key] = rng.randbytes(size).translate(RECORD_ALPHABET)
+    return data
+
+def write_spec(account_path:Path, spec:NonHashFileSpec | HashFileSpec | DynFileSpec | BtreeFileSpec, data:dict[bytes, bytes]):
+    path = account_path.joinpath(str(spec))
+    if isinstance(spec, NonHashFileSpec):
+        if spec.type == 1:
+            write_type1_file(path, data)
+        else:
+            write_type19_file(path, data)
+    elif isinstance(spec, HashFileSpec):
+        write_static_hashed_file(path, data, spec.type, spec.modulus, spec.separation, spec.arch[:2], spec.machine_class)
+    elif isinstance(spec, DynFileSpec):
+        alg = 0 if spec.alg == "GENERAL" else 1
+        write_dynamic_hashed_file(path, data, spec.modulus, spec.group_size, alg, spec.arch[:2], spec.machine_class)
+    else:
+        write_btree_file(path, data, spec.arch[:2], spec.machine_class)
+
+def create_account(account_path:Path, specs:list[NonHashFileSpec | HashFileSpec | DynFileSpec | BtreeFileSpec]):
+    """
+    An account with a VOC and a file for each spec holding its dataset
+    """
+    account_path.mkdir(parents=True, exist_ok=True)
+    voc = {b"VOC": b"F\xfeVOC\xfeD_VOC"}
+    for spec in specs:
+        print(f"Create file {spec}")
+        write_spec(account_path, spec, spec.generate_data())
+        name = str(spec).encode()
+        voc[name] = b"F\xfe" + name + b"\xfeD_" + name
+    write_dynamic_hashed_file(account_path.joinpath("VOC"), voc, 7)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m mattock.tests.generate", description="Create a test account without a UniVerse install, in addition to the one setup.sh creates")
+    parser.add_argument("path", type=Path, nargs="?", default=GENERATED_ACCOUNT, help="Where to write the account, by default beside the one setup.sh creates")
+    parser.add_argument("--exclude", action="append", default=[], help="Skip files whose name contains this. May be repeated")
+    args = parser.parse_args()
+
+    if args.path.is_dir():
+        shutil.rmtree(args.path)
+    create_account(args.path, [s for s in test_files if not any(e in str(s) for e in args.exclude)])
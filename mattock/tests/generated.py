@@ -0,0 +1,38 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from mattock.files import open_uv_file
+from mattock.tests.benchmark import FORMATS, LAYOUTS
+
+class GeneratedFile:
+    """
+    A file written by mattock.tests.generate in one format and layout
+    """
+    def __init__(self, path:Path, format_name:str, layout:str):
+        self.path = path
+        self.format_name = format_name
+        (self.arch, self.byteorder) = LAYOUTS[layout]
+
+    def write(self, data:dict[bytes, bytes]) -> Path:
+        """
+        Write data to the file, replacing what it held
+        """
+        if self.path.is_dir():
+            shutil.rmtree(self.path)
+        elif self.path.exists():
+            self.path.unlink()
+        FORMATS[self.format_name](self.path, data, self.arch, self.byteorder)
+        return self.path
+
+    def open(self, **kwargs):
+        return open_uv_file(self.path, **kwargs)
+
+def generated_formats(format_names:list[str] = list(FORMATS), layouts:list[str] = ["32le"]) -> list:
+    """
+    Parameters for the generated fixture, one per format and layout
+    """
+    return [pytest.param((f, layout), id=f"{f}-{layout}") for f in format_names for layout in layouts]
+
+HASHED_FORMATS = ["static", "dynamic"]
@@ -0,0 +1,66 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from mattock.account import Account
+from mattock.parallel import ExportFile
+from mattock.query import Equals
+from mattock.tests.benchmark import FORMATS
+from mattock.tests.generate import synthetic_data, write_dynamic_hashed_file
+from mattock.tests.test_data import test_accounts, test_files
+
+@pytest.mark.parametrize("account_path", test_accounts.values(), ids=test_accounts.keys())
+def test_voc_index_read_once(account_path:Path):
+    account = Account(account_path)
+    voc_reads = 0
+    open_voc = account.open_voc
+
+    def counting_open_voc():
+        nonlocal voc_reads
+        voc_reads = voc_reads + 1
+        return open_voc()
+
+    account.open_voc = counting_open_voc
+    file_names = list(account.files())
+    assert str(test_files[0]) in file_names
+    for file_name in file_names:
+        assert account.get_filepath(file_name) != None
+    assert account.get_filepath("NOT A FILE") == None
+    assert voc_reads == 1
+
+    # a modified VOC is read again
+    account.voc_signature = None
+    account.get_filepath(file_names[0])
+    assert voc_reads == 2
+
+def test_account_scan_files(tmp_path:Path):
+    datasets = {
+        "SMALL": ("btree", synthetic_data(10, seed=1)),
+        "BIG": ("dynamic", synthetic_data(2000, seed=2)),
+        "MEDIUM": ("type1", synthetic_data(100, seed=3)),
+    }
+    voc = {b"VOC": b"F\xfeVOC\xfeD_VOC", b"MISSING": b"F\xfeMISSING\xfeD_MISSING", b"BROKEN": b"F\xfeBROKEN\xfeD_BROKEN"}
+    for (name, (format_name, data)) in datasets.items():
+        FORMATS[format_name](tmp_path.joinpath(name), data, "32", "little")
+        voc[name.encode()] = b"F\xfe" + name.encode() + b"\xfeD_" + name.encode()
+    tmp_path.joinpath("BROKEN").write_bytes(b"not a UniVerse file")
+    write_dynamic_hashed_file(tmp_path.joinpath("VOC"), voc, 7)
+    account = Account(tmp_path)
+
+    scans = dict([(scan.file_name, scan) for scan in account.scan_files(processes=2)])
+    assert set(scans) == {"VOC", "MISSING", "BROKEN", "SMALL", "BIG", "MEDIUM"}
+    for (name, (_, data)) in datasets.items():
+        assert scans[name].error == None
+        assert scans[name].records == len(data)
+        assert scans[name].bytes == sum([len(k) + len(v) for (k, v) in data.items()])
+    assert scans["MISSING"].error == "FILE_NOT_FOUND"
+    assert scans["BROKEN"].error != None
+    assert scans["BIG"].file_type == 30 and scans["MEDIUM"].file_type == 1
+
+    task = ExportFile(tmp_path.joinpath("out"), where=[Equals(None, b"5")])
+    task.directory.mkdir()
+    [scan] = list(account.scan_files(task, ["BIG"], processes=1))
+    assert scan.records == 1
+    [line] = task.output_path("BIG").read_text("utf8").splitlines()
+    assert json.loads(line)["record"] == datasets["BIG"][1][b"5"].decode("latin-1")
@@ -0,0 +1,14 @@
+import pytest
+
+from mattock.tests.benchmark import run_case
+from mattock.tests.generate import synthetic_data
+from mattock.tests.generated import GeneratedFile, generated_formats
+
+@pytest.mark.parametrize("generated", generated_formats(["btree"]), indirect=True)
+def test_benchmark_case(generated:GeneratedFile):
+    data = synthetic_data(100)
+    path = generated.write(data)
+
+    result = run_case(str(path), "get_many", False, list(data)[:10])
+    assert result["records"] == 10
+    assert result["bytes"] == sum([len(k) + len(data[k]) for k in list(data)[:10]])
@@ -0,0 +1,40 @@
+from io import BytesIO
+
+import pytest
+
+from mattock.cache import DEFAULT_CACHE_BYTES, PageCache
+from mattock.tests.generate import synthetic_data
+from mattock.tests.generated import GeneratedFile, generated_formats
+
+def test_page_cache_lru():
+    fd = BytesIO(bytes(range(256)) * 4)
+    cache = PageCache(max_bytes=200)
+
+    assert cache.read(fd, 0, 100) == bytes(range(100))
+    assert cache.read(fd, 100, 100) == bytes(range(100, 200))
+    assert cache.read(fd, 0, 100) == bytes(range(100))
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 2, 0)
+
+    # page 100 is now the least recently used
+    cache.read(fd, 200, 100)
+    assert (cache.hits, cache.misses, cache.evictions, cache.size) == (1, 3, 1, 200)
+    cache.read(fd, 0, 100)
+    cache.read(fd, 100, 100)
+    assert (cache.hits, cache.misses, cache.evictions) == (2, 4, 2)
+
+@pytest.mark.parametrize("generated", generated_formats(["btree"]), indirect=True)
+def test_page_cache_opt_in(generated:GeneratedFile):
+    data = synthetic_data(2000)
+    generated.write(data)
+
+    # scans read each page once, so files are opened without a cache
+    with generated.open() as f:
+        assert f.cache == None
+        assert len(list(f.records())) == len(data)
+
+    with generated.open(cache_bytes=DEFAULT_CACHE_BYTES) as f:
+        assert f.cache != None
+        for key in list(data)[:10]:
+            assert f.get_record(key) == data[key]
+        # the root and inner pages are read once for all ten descents
+        assert f.cache.hits > 0
@@ -0,0 +1,48 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from mattock.cdc import capture_changes
+from mattock.tests.generate import synthetic_data, write_dynamic_hashed_file
+from mattock.tests.generated import GeneratedFile, generated_formats
+
+@pytest.mark.parametrize("generated", generated_formats(), indirect=True)
+def test_capture_changes(tmp_path:Path, generated:GeneratedFile):
+    data = synthetic_data(500, seed=3, record_size=(8, 64), oversized_ratio=0.01, oversized_size=5000)
+    path = generated.write(data)
+    manifest = tmp_path.joinpath("FILE.manifest")
+
+    assert sorted([(kind, key, bytes(raw or b"")) for (kind, key, raw) in capture_changes(path, manifest)]) == sorted([("insert", k, v) for (k, v) in data.items()])
+    assert list(capture_changes(path, manifest)) == []
+
+    keys = list(data)
+    changed = dict(data)
+    for key in keys[:5]:
+        del changed[key]
+    for key in keys[100:103]:
+        changed[key] = changed[key] + b"\xfeCHANGED"
+    changed[b"NEW1"] = b"A\xfeB"
+    changed[b"NEW2"] = b"C"
+    generated.write(changed)
+
+    expected = [("delete", k, b"") for k in keys[:5]]
+    expected = expected + [("update", k, changed[k]) for k in keys[100:103]]
+    expected = expected + [("insert", b"NEW1", b"A\xfeB"), ("insert", b"NEW2", b"C")]
+    assert sorted([(kind, key, bytes(raw or b"")) for (kind, key, raw) in capture_changes(path, manifest)]) == sorted(expected)
+    assert list(capture_changes(path, manifest)) == []
+
+def test_capture_changes_moved_records(tmp_path:Path):
+    data = synthetic_data(300, seed=4)
+    path = tmp_path.joinpath("DYN")
+    manifest = tmp_path.joinpath("DYN.manifest")
+    write_dynamic_hashed_file(path, data, 7)
+    assert len(list(capture_changes(path, manifest))) == len(data)
+
+    # a bigger modulus moves records to other groups without changing them
+    changed = {**data, b"1": b"CHANGED"}
+    del changed[b"2"]
+    shutil.rmtree(path)
+    write_dynamic_hashed_file(path, changed, 11)
+    changes = [(kind, key, bytes(raw or b"")) for (kind, key, raw) in capture_changes(path, manifest)]
+    assert sorted(changes) == [("delete", b"2", b""), ("update", b"1", b"CHANGED")]
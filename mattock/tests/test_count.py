@@ -0,0 +1,22 @@
+import pytest
+
+from mattock.count import count_file
+from mattock.tests.generate import synthetic_data
+from mattock.tests.generated import HASHED_FORMATS, GeneratedFile, generated_formats
+
+@pytest.mark.parametrize("generated", generated_formats(layouts=["32le", "64be"]), indirect=True)
+@pytest.mark.parametrize("oversized_ratio", [0.0, 0.05])
+def test_count_file(generated:GeneratedFile, oversized_ratio:float):
+    data = synthetic_data(400, seed=4, record_size=(0, 300), oversized_ratio=oversized_ratio, oversized_size=7000)
+    generated.write(data)
+    total = sum([len(k) + len(v) for (k, v) in data.items()])
+
+    with generated.open() as f:
+        count = count_file(f)
+    assert count.records == len(data)
+    if count.estimated:
+        assert total <= count.bytes <= total * 1.2 + 8192 * len(data) * oversized_ratio
+    else:
+        assert count.bytes == total
+    if generated.format_name in ["btree"] or oversized_ratio == 0.0 and generated.format_name in HASHED_FORMATS:
+        assert not count.estimated
@@ -1,4 +1,5 @@
 import functools
+from pathlib import Path
 from typing import Any, Literal, Union
 import codecs
 
@@ -269,6 +270,37 @@ test_files:list[Union[NonHashFileSpec,HashFileSpec,DynFileSpec,BtreeFileSpec]] =
 test_files_map = dict([(str(f),f) for f in test_files])
 test_files_keys = [k for k in test_files_map]
 
+# the account setup.sh creates with UniVerse, and the one
+# python -m mattock.tests.generate writes without it. Tests run on each of
+# them that exists.
+UNIVERSE_ACCOUNT = Path(__file__).parent.joinpath("uvdb")
+GENERATED_ACCOUNT = Path(__file__).parent.joinpath("uvdb_generated")
+test_accounts = dict([(name, path) for (name, path) in [("universe", UNIVERSE_ACCOUNT), ("generated", GENERATED_ACCOUNT)] if path.is_dir()])
+
+class AccountFile:
+    """
+    A test file in one of the test accounts
+    """
+    def __init__(self, account_name:str, account:Path, spec:Union[NonHashFileSpec,HashFileSpec,DynFileSpec,BtreeFileSpec]) -> None:
+        self.account_name = account_name
+        self.account = account
+        self.spec = spec
+
+    def generate_data(self):
+        return self.spec.generate_data()
+
+    def __str__(self) -> str:
+        return str(self.spec)
+
+def account_files(*spec_types:type) -> list[AccountFile]:
+    """
+    The test files of every test account, or only those of spec_types
+    """
+    return [AccountFile(name, path, spec) for (name, path) in test_accounts.items() for spec in test_files if not spec_types or isinstance(spec, spec_types)]
+
+def account_file_id(f:AccountFile) -> str:
+    return f"{f.account_name}-{f}"
+
 if __name__ == "__main__":
     
     d = [
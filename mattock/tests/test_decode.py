@@ -0,0 +1,22 @@
+import pytest
+
+from mattock.decode import decoder
+
+@pytest.mark.parametrize("arch", ["32", "64"])
+@pytest.mark.parametrize("byteorder", ["little", "big"])
+def test_decoder_tables(arch, byteorder):
+    d = decoder(arch, byteorder)
+    values = [0, 1, 0x1234, 0xfffe]
+    buf = b"\xaa" * 3 + b"".join([v.to_bytes(2, byteorder) for v in values])
+    assert list(d.table(buf, 3, len(values), "H")) == values
+
+    size = 4 if arch == "32" else 8
+    words = [0, 1024, 0x7fffffff]
+    buf = b"".join([w.to_bytes(size, byteorder) for w in words])
+    assert list(d.table(buf, 0, len(words), d.word_code)) == words
+
+    free_item = 1 << (1 if byteorder == "little" else 14)
+    header = (0x1000).to_bytes(size, byteorder) + (0x2000).to_bytes(size, byteorder) + b"\x00\x00" + free_item.to_bytes(2, byteorder)
+    (forward, blink, flags) = d.item_header.unpack_from(header.ljust(d.item_header.size, b"\x00"))
+    assert (forward, blink) == (0x1000, 0x2000)
+    assert d.item_flags(flags) == (True, False, False, False, False, False)
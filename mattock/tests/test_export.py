@@ -0,0 +1,43 @@
+import json
+from io import BytesIO
+
+import pytest
+
+from mattock.export import ArrowWriter, CsvWriter, NdjsonWriter, export_records
+from mattock.record import Record
+
+def test_export_formats():
+    records = [("F", Record(b"K1", b"A\xfeB\xfdC\xfcD")), ("F", Record(b"K2", b""))]
+
+    out = BytesIO()
+    assert export_records(records, NdjsonWriter(out, "value")) == 2
+    lines = [json.loads(l) for l in out.getvalue().decode("utf8").splitlines()]
+    assert lines == [
+        {"file": "F", "key": "K1", "record": [["A"], ["B", "C\xfcD"]]},
+        {"file": "F", "key": "K2", "record": [[""]]},
+    ]
+
+    out = BytesIO()
+    export_records(records, CsvWriter(out, "field"))
+    assert out.getvalue() == b"F,K1,A,B]C\\D\r\nF,K2,\r\n"
+
+    out = BytesIO()
+    export_records(records, ArrowWriter(out, "subvalue", batch_size=1))
+    stream = out.getvalue()
+    # schema, two record batches and the end of stream marker
+    assert stream.count(b"\xff\xff\xff\xff") == 4
+    assert stream.endswith(b"\xff\xff\xff\xff\x00\x00\x00\x00")
+
+def test_arrow_batches_cut_by_bytes(monkeypatch:pytest.MonkeyPatch):
+    records = [("F", Record(f"K{i}".encode(), b"X" * 100)) for i in range(9)] + [("F", Record(b"BIG", b"Y" * 400))]
+
+    out = BytesIO()
+    export_records(records, ArrowWriter(out, "field", batch_bytes=250))
+    # schema, four batches of two records, one of the ninth record and one of
+    # the record bigger than batch_bytes on its own, and the end of stream
+    assert out.getvalue().count(b"\xff\xff\xff\xff") == 8
+
+    # a column can't outgrow its int32 offsets
+    monkeypatch.setattr("mattock.arrow.MAX_OFFSET", 300)
+    with pytest.raises(Exception, match="int32 offsets"):
+        export_records(records, ArrowWriter(BytesIO(), "record"))
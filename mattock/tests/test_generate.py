@@ -0,0 +1,18 @@
+import pytest
+
+from mattock.files import build_key_index
+from mattock.tests.benchmark import LAYOUTS
+from mattock.tests.generate import synthetic_data
+from mattock.tests.generated import HASHED_FORMATS, GeneratedFile, generated_formats
+
+@pytest.mark.parametrize("generated", generated_formats(layouts=list(LAYOUTS)), indirect=True)
+def test_generated_files_round_trip(generated:GeneratedFile):
+    data = synthetic_data(300, seed=1, keys="random", record_size=(0, 600), oversized_ratio=0.05, oversized_size=9000)
+    generated.write(data)
+    if generated.format_name in HASHED_FORMATS:
+        build_key_index(generated.path)
+
+    with generated.open() as uv_file:
+        assert dict([(r.key, bytes(r.raw)) for r in uv_file.records()]) == data
+        for key in list(data)[:50]:
+            assert bytes(uv_file.get_record(key)) == data[key]
@@ -0,0 +1,26 @@
+import json
+
+import pytest
+
+from mattock.hashing import dynamic_group, dynamic_group_of_hash, static_group
+from mattock.tests.vectors import VECTORS_PATH
+
+def test_hash_vectors():
+    if not VECTORS_PATH.is_file():
+        pytest.skip("No hash vectors from UniVerse files, see python -m mattock.tests.vectors")
+    for (name, vectors) in json.loads(VECTORS_PATH.read_text()).items():
+        for (key, group_index) in vectors["keys"]:
+            if vectors["file_type"] == 30:
+                assert dynamic_group(vectors["dyn_hash_alg"], bytes.fromhex(key), vectors["modulus"]) == group_index, name
+            else:
+                assert static_group(vectors["file_type"], bytes.fromhex(key), vectors["modulus"]) == group_index, name
+
+@pytest.mark.parametrize("modulus", [1, 2, 3, 7, 8, 97])
+def test_dynamic_group_split(modulus:int):
+    # growing the modulus by one only splits one group, into the new last group
+    base = 1 << (modulus.bit_length() - 1)
+    for h in range(1000):
+        before = dynamic_group_of_hash(h, modulus)
+        after = dynamic_group_of_hash(h, modulus + 1)
+        assert 0 <= before < modulus
+        assert after == before or (before == modulus - base and after == modulus)
@@ -0,0 +1,38 @@
+from pathlib import Path
+
+import pytest
+
+from mattock.files import build_key_index
+from mattock.indices import list_indices, open_index
+from mattock.tests.generate import write_btree_file
+from mattock.tests.generated import HASHED_FORMATS, GeneratedFile, generated_formats
+
+@pytest.mark.parametrize("generated", generated_formats(HASHED_FORMATS), indirect=True)
+def test_secondary_index(tmp_path:Path, generated:GeneratedFile):
+    data = dict([(f"ORD{i:04}".encode(), f"CUST{i % 7}\xfe{i}".encode("latin-1")) for i in range(200)])
+    path = generated.write(data)
+    assert list_indices(path) == []
+
+    by_customer: dict[bytes, list[bytes]] = {}
+    for (key, raw) in data.items():
+        by_customer.setdefault(raw.split(b"\xfe")[0], []).append(key)
+    directory = tmp_path.joinpath("I_FILE")
+    directory.mkdir()
+    write_btree_file(directory.joinpath("INDEX.000"), dict([(v, b"\xfd".join(k)) for (v, k) in by_customer.items()]), leaf_items=2)
+    write_btree_file(directory.joinpath("INDEX.001"), {b"1": b"ORD0001"})
+    directory.joinpath("INDEX.MAP").write_bytes(b"CUSTOMER INDEX.000\n")
+    assert list_indices(path) == ["CUSTOMER", "INDEX.001"]
+    # lookups join through the data file's key index
+    build_key_index(path)
+
+    with generated.open() as f, open_index(path, "CUSTOMER") as index:
+        assert list(index.entries()) == sorted(by_customer.items())
+        assert list(index.values(b"CUST2", b"CUST4")) == [b"CUST2", b"CUST3"]
+        assert index.keys_for(b"CUST3") == by_customer[b"CUST3"]
+        assert index.keys_for(b"NOBODY") == []
+        assert [(r.key, bytes(r.raw)) for r in index.lookup(f, b"CUST5")] == [(k, data[k]) for k in by_customer[b"CUST5"]]
+        expected = [k for v in [b"CUST5", b"CUST6"] for k in by_customer[v]]
+        assert [r.key for r in index.lookup_range(f, b"CUST5")] == expected
+        assert [v for (v, _) in index.entries_with_prefix(b"CUST", reverse=True)] == sorted(by_customer, reverse=True)
+    with pytest.raises(Exception):
+        open_index(path, "MISSING")
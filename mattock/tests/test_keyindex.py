@@ -0,0 +1,59 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from mattock.account import Account
+from mattock.files import DynamicHashedFile, StaticHashedFile, U2ReadException, build_key_index, open_uv_file
+from mattock.keyindex import key_index_path
+from mattock.tests.test_data import AccountFile, DynFileSpec, HashFileSpec, account_file_id, account_files
+
+@pytest.mark.parametrize("file", account_files(HashFileSpec, DynFileSpec), ids=account_file_id)
+def test_key_index(file:AccountFile, tmp_path:Path):
+
+    account = Account(file.account)
+    file_path = account.get_filepath(str(file))
+    assert file_path != None
+
+    # the index is written beside the file, so index a copy
+    copy_path = tmp_path.joinpath(file_path.name)
+    if file_path.is_dir():
+        shutil.copytree(file_path, copy_path)
+    else:
+        shutil.copy2(file_path, copy_path)
+    build_key_index(copy_path)
+
+    test_data = file.generate_data()
+    missing = [b"NOT A KEY"]
+    prefix = min(test_data, default=b"")[:1]
+
+    with open_uv_file(copy_path) as uv_file:
+        assert isinstance(uv_file, StaticHashedFile|DynamicHashedFile)
+        assert uv_file.key_index != None and len(uv_file.key_index) == len(test_data)
+        for (key, value) in test_data.items():
+            assert uv_file.get_record(key) == value
+            with uv_file.open_record(key) as stream:
+                assert stream.read() == value
+        assert uv_file.get_record(b"NOT A KEY") == None
+        assert uv_file.record_chunks(b"NOT A KEY") == None
+        assert dict(uv_file.get_many(list(test_data) + missing)) == {**test_data, b"NOT A KEY": None}
+        with_prefix = [(r.key, r.raw) for r in uv_file.records_with_prefix(prefix)]
+        assert with_prefix == sorted([(k, v) for (k, v) in test_data.items() if k.startswith(prefix)])
+
+    # nor is an index written by an older version
+    index_path = key_index_path(copy_path)
+    index_bytes = bytearray(index_path.read_bytes())
+    index_bytes[4:8] = (1).to_bytes(4, "little")
+    index_path.write_bytes(index_bytes)
+    with open_uv_file(copy_path) as uv_file:
+        assert uv_file.key_index == None
+    build_key_index(copy_path)
+
+    # a changed file isn't looked up through its old index
+    for source in [copy_path.joinpath("DATA.30")] if copy_path.is_dir() else [copy_path]:
+        os.utime(source, ns=(0, 0))
+    with open_uv_file(copy_path) as uv_file:
+        assert uv_file.key_index == None
+        with pytest.raises(U2ReadException):
+            uv_file.get_record(b"KEY1")
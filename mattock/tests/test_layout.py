@@ -0,0 +1,28 @@
+import pytest
+
+from mattock.account import Account
+from mattock.files import DynamicHashedFile, StaticHashedFile, open_uv_file
+from mattock.layout import analyze_layout
+from mattock.tests.test_data import AccountFile, DynFileSpec, HashFileSpec, account_file_id, account_files
+
+@pytest.mark.parametrize("file", account_files(HashFileSpec, DynFileSpec), ids=account_file_id)
+def test_layout(file:AccountFile):
+
+    account = Account(file.account)
+    file_path = account.get_filepath(str(file))
+    assert file_path != None
+
+    with open_uv_file(file_path) as uv_file:
+        assert isinstance(uv_file, StaticHashedFile|DynamicHashedFile)
+        layout = analyze_layout(uv_file)
+        items = [item for g in uv_file.groups() for item in g.items()]
+
+    assert layout.records == len(items) == len(file.generate_data())
+    assert layout.oversized_items == len([item for item in items if item.oversized])
+    assert layout.groups == sum(layout.bytes_per_group.values()) == sum(layout.chain_lengths.values())
+    # every byte of the primary and overflow buffers belongs to an item
+    assert layout.bytes + layout.free_bytes == layout.buffers * layout.group_length
+    assert layout.buffers == layout.groups + layout.overflow_buffers
+    assert layout.longest_chain == max(layout.chain_lengths)
+    assert layout.suggested_modulus >= 1
+    assert 0.0 <= layout.free_ratio <= 1.0
@@ -1,25 +1,23 @@
 from pathlib import Path
+
 import pytest
 
 from mattock.account import Account
-from mattock.files import DynamicHashedFile, StaticHashedFile, open_uv_file, key_to_type1_path, type1_path_to_key
-from mattock.tests.test_data import BtreeFileSpec, DynFileSpec, HashFileSpec, NonHashFileSpec, test_files, test_files_keys
-    
-ap_invocations:int = 0
+from mattock.files import DynamicHashedFile, File1, File19, StaticHashedFile, U2ReadError, U2ReadException, key_to_type1_path, open_uv_file, type1_path_to_key
+from mattock.tests.test_data import AccountFile, BtreeFileSpec, DynFileSpec, HashFileSpec, NonHashFileSpec, account_file_id, account_files
 
-@pytest.fixture(params=test_files, ids=test_files_keys, scope="module")
-def file(request):
-    return request.param
+ap_invocations:int = 0
 
-def test_all_records_appear_enum(file:NonHashFileSpec|BtreeFileSpec|HashFileSpec|DynFileSpec):
-    account_path = Path(__file__).parent.joinpath("uvdb")
+@pytest.mark.parametrize("use_mmap", [False, True], ids=["read", "mmap"])
+def test_all_records_appear_enum(file:AccountFile, use_mmap:bool):
+    account_path = file.account
     account = Account(account_path)
 
     file_path = account.get_filepath(str(file))
 
     assert file_path != None
 
-    with open_uv_file(file_path) as uv_file:
+    with open_uv_file(file_path, use_mmap=use_mmap) as uv_file:
 
         test_data = file.generate_data()
         processed = {}
@@ -42,30 +40,132 @@ def test_all_records_appear_enum(file:NonHashFileSpec|BtreeFileSpec|HashFileSpec
 
         print(file)
 
+@pytest.mark.parametrize("file", account_files(NonHashFileSpec, BtreeFileSpec), ids=account_file_id)
+def test_all_records_accessible_random(file:AccountFile):
+    account_path = file.account
+    account = Account(account_path)
+    file_path = account.get_filepath(str(file))
 
+    assert file_path != None
 
+    test_data = file.generate_data()
 
-def test_all_records_accessible_random(file:NonHashFileSpec|BtreeFileSpec|HashFileSpec|DynFileSpec):
-    account_path = Path(__file__).parent.joinpath("uvdb")
-    account = Account(account_path)
+    with open_uv_file(file_path) as uv_file:
+        for [key,value] in test_data.items():
+            uv_value = uv_file.get_record(key)
+            assert uv_value == value
+
+        if not isinstance(uv_file,File1|File19):
+            assert uv_file.get_record(b"NOT A KEY") == None
+
+@pytest.mark.parametrize("file", account_files(HashFileSpec, DynFileSpec), ids=account_file_id)
+def test_hashed_lookup_needs_key_index(file:AccountFile):
+    # keys aren't hashed to their group until the hash vectors are committed
+    file_path = Account(file.account).get_filepath(str(file))
+    assert file_path != None
+
+    with open_uv_file(file_path, use_key_index=False) as uv_file:
+        assert isinstance(uv_file, StaticHashedFile|DynamicHashedFile)
+        for lookup in [uv_file.get_record, uv_file.record_chunks, uv_file.open_record, lambda key: uv_file.get_many([key])]:
+            with pytest.raises(U2ReadException) as e:
+                lookup(b"KEY1")
+            assert e.value.error_code == U2ReadError.UNSUPPORTED_HASH
+
+@pytest.mark.parametrize("file", account_files(NonHashFileSpec, BtreeFileSpec), ids=account_file_id)
+def test_get_many(file:AccountFile):
+    account = Account(file.account)
+    file_path = account.get_filepath(str(file))
+    assert file_path != None
+
+    test_data = file.generate_data()
+    missing = [b"NOT A KEY", b"NOT/A/KEY"]
+
+    with open_uv_file(file_path) as uv_file:
+        results = list(uv_file.get_many(list(test_data) + missing + list(test_data)))
+
+    assert len(results) == len(test_data) + len(missing)
+    assert dict(results) == {**test_data, **dict([(k, None) for k in missing])}
+
+@pytest.mark.parametrize("file", account_files(NonHashFileSpec, BtreeFileSpec), ids=account_file_id)
+def test_record_streaming(file:AccountFile):
+    account = Account(file.account)
     file_path = account.get_filepath(str(file))
+    assert file_path != None
+
+    test_data = file.generate_data()
 
+    with open_uv_file(file_path) as uv_file:
+        for (key, value) in test_data.items():
+            chunks = uv_file.record_chunks(key)
+            assert chunks != None
+            assert b"".join([bytes(c) for c in chunks]) == value
+            with uv_file.open_record(key) as stream:
+                assert stream.read() == value
+        if not isinstance(uv_file, File1 | File19):
+            assert uv_file.record_chunks(b"NOT A KEY") == None
+
+@pytest.mark.parametrize("threads", [1, 4])
+@pytest.mark.parametrize("ordered", [True, False], ids=["ordered", "unordered"])
+@pytest.mark.parametrize("file", account_files(NonHashFileSpec), ids=account_file_id)
+def test_directory_scan(file:AccountFile, threads:int, ordered:bool):
+
+    account = Account(file.account)
+    file_path = account.get_filepath(str(file))
     assert file_path != None
 
     test_data = file.generate_data()
 
     with open_uv_file(file_path) as uv_file:
-        if isinstance(uv_file,StaticHashedFile):
-            pytest.skip('Random access for StaticHashedFile is not supported')
+        assert isinstance(uv_file, File1 | File19)
+        records = [(r.key, r.raw) for r in uv_file.records(threads=threads, ordered=ordered)]
+        if ordered:
+            assert [k for (k, _) in records] == [r.key for r in uv_file.records()]
 
-        if isinstance(uv_file,DynamicHashedFile):
-            pytest.skip('Random access for DynamicHashedFile is not supported')
+    assert len(records) == len(test_data)
+    assert dict(records) == test_data
 
-        for [key,value] in test_data.items():
-            uv_value = uv_file.get_record(key)
-            assert uv_value == value
+def test_keys_only(file:AccountFile, monkeypatch:pytest.MonkeyPatch):
+    account = Account(file.account)
+    file_path = account.get_filepath(str(file))
+    assert file_path != None
 
-        
+    test_data = file.generate_data()
+
+    with open_uv_file(file_path) as uv_file:
+        expected = [r.key for r in uv_file.records()]
+        if isinstance(uv_file, File1 | File19):
+            # the keys come from the directory listing without opening any record
+            def no_open(*args, **kwargs):
+                raise AssertionError("keys() opened a file")
+            monkeypatch.setattr("builtins.open", no_open)
+        keys = list(uv_file.keys())
+        monkeypatch.undo()
+
+    assert keys == expected
+    assert sorted(keys) == sorted(test_data)
+
+@pytest.mark.parametrize("reverse", [False, True], ids=["forward", "reverse"])
+@pytest.mark.parametrize("file", account_files(BtreeFileSpec), ids=account_file_id)
+def test_btree_range_scan(file:AccountFile, reverse:bool):
+
+    account = Account(file.account)
+    file_path = account.get_filepath(str(file))
+    assert file_path != None
+
+    keys = sorted(file.generate_data())
+
+    with open_uv_file(file_path) as uv_file:
+        for (start,end) in [(None,None),(b"B",None),(None,b"H12"),(b"H",b"K"),(b"K",b"H")]:
+            expected = [k for k in keys if (start == None or k >= start) and (end == None or k < end)]
+            if reverse:
+                expected.reverse()
+            assert [r.key for r in uv_file.records(start=start,end=end,reverse=reverse)] == expected
+
+        for prefix in [b"", b"H", b"H12", b"many_1", b"\xff"]:
+            expected = [k for k in keys if k.startswith(prefix)]
+            if reverse:
+                expected.reverse()
+            assert [r.key for r in uv_file.records_with_prefix(prefix,reverse=reverse)] == expected
 
 @pytest.mark.parametrize(
     "key,path",
@@ -96,4 +196,3 @@ def test_all_records_accessible_random(file:NonHashFileSpec|BtreeFileSpec|HashFi
 def test_file1_path_mapping(key,path):
     assert key_to_type1_path(key) == path
     assert type1_path_to_key(path) == key
-
@@ -0,0 +1,28 @@
+import pytest
+
+from mattock.account import Account
+from mattock.files import open_uv_file
+from mattock.parallel import parallel_aggregate, parallel_records
+from mattock.tests.test_data import AccountFile, DynFileSpec, HashFileSpec, account_file_id, account_files
+
+def count_records(records):
+    return sum(1 for _ in records)
+
+@pytest.mark.parametrize("ordered", [True, False], ids=["ordered", "unordered"])
+@pytest.mark.parametrize("file", account_files(HashFileSpec, DynFileSpec), ids=account_file_id)
+def test_parallel_scan(file:AccountFile, ordered:bool):
+
+    account = Account(file.account)
+    file_path = account.get_filepath(str(file))
+    assert file_path != None
+
+    test_data = file.generate_data()
+
+    with open_uv_file(file_path) as uv_file:
+        expected = [(r.key, r.raw) for r in uv_file.records()]
+
+    scanned = [(r.key, r.raw) for r in parallel_records(file_path, processes=2, partitions=5, ordered=ordered)]
+    if ordered:
+        assert scanned == expected
+    assert dict(scanned) == test_data
+    assert sum(parallel_aggregate(file_path, count_records, processes=2, ordered=ordered)) == len(test_data)
@@ -0,0 +1,50 @@
+import pytest
+
+from mattock.query import Between, Condition, Equals, StartsWith, parse_condition
+from mattock.stats import ScanStats
+from mattock.tests.generated import GeneratedFile, generated_formats
+
+@pytest.mark.parametrize("generated", generated_formats(), indirect=True)
+def test_query_pushdown(generated:GeneratedFile):
+    data = dict([(f"K{i:03}".encode(), f"NAME{i % 10}\xfe{i}\xfdX\xfcY{i}\xfe\xfeEND".encode("latin-1")) for i in range(100)])
+    generated.write(data)
+
+    def query(**kwargs) -> dict[bytes, bytes]:
+        with generated.open() as f:
+            return dict([(r.key, bytes(r.raw)) for r in f.records(**kwargs)])
+
+    assert query() == data
+    assert query(where=Equals(0, b"NAME3")) == dict([(k, v) for (k, v) in data.items() if v.startswith(b"NAME3\xfe")])
+    assert set(query(where=[StartsWith(None, b"K0"), Equals((1, 1, 1), b"Y7")])) == {b"K007"}
+    assert set(query(where=Between((1, 0), b"97", b"99"))) == {b"K097", b"K098"}
+    assert set(query(where=Equals(2, b""))) == set(data)
+    assert query(where=Equals(7, b"X")) == {}
+    assert query(where=StartsWith(None, b"K01"), select=[3, (1, 1, 1), 0, 9]) == dict([(f"K01{i}".encode(), f"END\xfeY1{i}\xfeNAME{i}\xfe".encode("latin-1")) for i in range(10)])
+    assert parse_condition("1.1.1=Y7") == Equals((1, 1, 1), b"Y7")
+    assert parse_condition("@ID^=K0") == StartsWith(None, b"K0")
+    assert parse_condition("0<NAME=<5") == Between((0,), high=b"NAME=<5")
+    with pytest.raises(TypeError):
+        Condition(0)
+
+@pytest.mark.parametrize("generated,sweep", [(("static", "32le"), False), (("dynamic", "32le"), False), (("dynamic", "32le"), True)], indirect=["generated"])
+def test_query_skips_oversized_chains(generated:GeneratedFile, sweep:bool):
+    data = dict([(f"K{i:03}".encode(), f"NAME{i % 10}\xfe".encode("latin-1") + b"X" * (9000 if i % 4 == 0 else 10)) for i in range(100)])
+    generated.write(data)
+    expected = dict([(k, v) for (k, v) in data.items() if k < b"K05" and v.startswith(b"NAME0\xfe")])
+
+    where = [Between(None, high=b"K05"), Equals(0, b"NAME0")]
+    stats = ScanStats()
+    with generated.open(use_mmap=True, stats=stats) as f:
+        records = f.records(where=where, sweep=True) if sweep else f.records(where=where)
+        assert dict([(r.key, bytes(r.raw)) for r in records]) == expected
+
+    if not sweep:
+        # oversized items are ruled out by key before their chain is read,
+        # or by field 0 after its first oversized buffer
+        oversized = [k for (k, v) in data.items() if len(v) > 9000]
+        full = ScanStats()
+        with generated.open(stats=full) as f:
+            assert len(list(f.records())) == len(data)
+        chain_length = full.oversized_buffers // len(oversized)
+        by_field = [k for k in oversized if k < b"K05" and k not in expected]
+        assert stats.oversized_buffers == len(by_field) + len([k for k in oversized if k in expected]) * chain_length
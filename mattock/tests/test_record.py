@@ -0,0 +1,21 @@
+import pytest
+
+from mattock.record import Record
+
+@pytest.mark.parametrize(
+    "raw,position,expected",
+    [
+        pytest.param(b"", (0,0,0), b"", id="empty_record"),
+        pytest.param(b"A\xfeB", (1,0,0), b"B", id="second_field"),
+        pytest.param(b"A\xfeB", (2,0,0), None, id="missing_field"),
+        pytest.param(b"A\xfeB\xfdC\xfcD", (1,1,1), b"D", id="subvalue"),
+        pytest.param(b"A\xfeB\xfdC\xfcD", (1,2,0), None, id="missing_value"),
+        pytest.param(b"A\xfeB\xfdC\xfcD", (1,1,2), None, id="missing_subvalue"),
+        pytest.param(b"\xfe\xfe", (2,0,0), b"", id="trailing_empty_field"),
+    ],
+)
+def test_record_get(raw:bytes, position:tuple[int,int,int], expected:bytes|None):
+    for r in [Record(b"KEY", raw), Record(b"KEY", memoryview(raw))]:
+        assert r.get(*position) == expected
+        (f,v,s) = position
+        assert (r.fields[f].get(v,s) if f < len(r.fields) else None) == expected
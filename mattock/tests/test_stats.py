@@ -0,0 +1,42 @@
+import pytest
+
+from mattock.account import Account
+from mattock.files import open_uv_file
+from mattock.stats import ScanStats
+from mattock.tests.test_data import AccountFile, BtreeFileSpec, DynFileSpec, HashFileSpec
+
+@pytest.mark.parametrize("use_mmap", [False, True], ids=["read", "mmap"])
+def test_scan_stats(file:AccountFile, use_mmap:bool):
+    account = Account(file.account)
+    file_path = account.get_filepath(str(file))
+    assert file_path != None
+
+    with open_uv_file(file_path) as uv_file:
+        expected = [(r.key, r.raw) for r in uv_file.records()]
+
+    stats = ScanStats()
+    started: list[int] = []
+    ended: list[int] = []
+    pages: list[int] = []
+    stats.on_group_start = started.append
+    stats.on_group_end = ended.append
+    stats.on_page_read = lambda offset, page_type: pages.append(offset)
+
+    with open_uv_file(file_path, use_mmap=use_mmap, stats=stats) as uv_file:
+        records = [(r.key, r.raw) for r in uv_file.records()]
+
+    assert records == expected
+    assert stats.bytes_read > 0
+    assert "open" in stats.seconds
+    if isinstance(file.spec, HashFileSpec|DynFileSpec):
+        assert stats.groups > 0
+        assert started == ended
+        assert len(started) == stats.groups
+        assert stats.items - stats.free_items >= len(records)
+        assert stats.reads > 0
+    elif isinstance(file.spec, BtreeFileSpec):
+        assert stats.leaf_pages > 0
+        assert len(pages) >= stats.pages
+    else:
+        assert stats.directories > 0
+        assert stats.record_files == len(records)
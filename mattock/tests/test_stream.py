@@ -0,0 +1,14 @@
+import pytest
+
+from mattock.stream import crlf_to_field_marks, strip_padding
+
+@pytest.mark.parametrize("chunks", [[b"a\r\nb"], [b"a\r", b"\nb"], [b"a", b"\r", b"\n", b"b"]])
+def test_crlf_across_chunks(chunks:list[bytes]):
+    assert b"".join(crlf_to_field_marks(chunks)) == b"a\xfeb"
+
+@pytest.mark.parametrize("hold", [14, 16, 64])
+def test_strip_padding_across_chunks(hold:int):
+    padded = [b"abc", b"de\x00", b"\x00\x03"]
+    assert b"".join(strip_padding(padded, "little", hold)) == b"abcde"
+    padded = [b"abcd", b"ef", b"\x00" * 6, b"\x0e\x00\x00\x00\x00\x00\x00\x00"]
+    assert b"".join(strip_padding(padded, "little", hold)) == b"abcdef"
@@ -0,0 +1,30 @@
+from pathlib import Path
+
+import pytest
+
+from mattock.files import DynamicHashedFile, open_uv_file
+from mattock.query import StartsWith
+from mattock.stats import ScanStats
+from mattock.tests.generate import synthetic_data, write_dynamic_hashed_file
+
+@pytest.mark.parametrize("arch,byteorder", [("32", "little"), ("32", "big"), ("64", "little"), ("64", "big")])
+@pytest.mark.parametrize("read_size,memory_bytes", [(1024 * 1024, 64 * 1024 * 1024), (1, 0), (8192, 30000)])
+def test_swept_records(tmp_path:Path, arch:str, byteorder:str, read_size:int, memory_bytes:int):
+    data = synthetic_data(1500, seed=5, keys="random", record_size=(0, 400), oversized_ratio=0.03, oversized_size=9000)
+    path = tmp_path.joinpath("FILE")
+    # a small modulus for long overflow chains
+    write_dynamic_hashed_file(path, data, 7, 1, 1, arch, byteorder)
+
+    stats = ScanStats()
+    with open_uv_file(path, stats=stats) as f:
+        assert isinstance(f, DynamicHashedFile)
+        swept = [(r.key, bytes(r.raw)) for r in f.swept_records(read_size, memory_bytes)]
+        assert len(swept) == len(data)
+        assert dict(swept) == data
+        assert set(r.key for r in f.records(where=StartsWith(None, b"A"), sweep=True)) == set([k for k in data if k.startswith(b"A")])
+    if read_size > 1:
+        # two sweeps against one scan following each chain
+        sweep_reads = stats.reads
+        with open_uv_file(path, stats=stats) as f:
+            list(f.records())
+        assert sweep_reads * 2 < stats.reads - sweep_reads
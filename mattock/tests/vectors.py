@@ -0,0 +1,52 @@
+import argparse
+import json
+from pathlib import Path
+
+from mattock.account import Account
+from mattock.files import DynamicHashedFile, StaticHashedFile, open_uv_file
+from mattock.tests.test_data import UNIVERSE_ACCOUNT, DynFileSpec, HashFileSpec, test_files
+
+# Known-answer vectors for mattock.hashing: the group UniVerse stored each key
+# of the hashed test files in, read from the account setup.sh creates. They
+# are kept in hash_vectors.json, so test_hash_vectors can check the hash
+# functions against files UniVerse wrote without a UniVerse install.
+
+VECTORS_PATH = Path(__file__).parent.joinpath("hash_vectors.json")
+
+def file_vectors(f:StaticHashedFile | DynamicHashedFile, keys_per_file:int) -> dict:
+    """
+    The header fields the hash depends on and up to keys_per_file keys with
+    the group each is stored in, keys as hex
+    """
+    keys = []
+    for group in f.groups():
+        for key in group.keys():
+            keys.append([key.hex(), group.groupIndex])
+    step = max(1, len(keys) // keys_per_file)
+    return {
+        "file_type": f.info.file_type,
+        "modulus": f.info.modulus,
+        "dyn_hash_alg": f.info.dyn_hash_alg if f.info.file_type == 30 else None,
+        "keys": keys[::step][:keys_per_file],
+    }
+
+def account_vectors(account_path:Path, keys_per_file:int) -> dict[str, dict]:
+    account = Account(account_path)
+    vectors = {}
+    for spec in test_files:
+        if not isinstance(spec, HashFileSpec | DynFileSpec):
+            continue
+        path = account.get_filepath(str(spec))
+        if path == None:
+            continue
+        with open_uv_file(path, use_key_index=False) as f:
+            vectors[str(spec)] = file_vectors(f, keys_per_file)
+    return vectors
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m mattock.tests.vectors", description="Write hash vectors from the test account created by setup.sh")
+    parser.add_argument("path", type=Path, nargs="?", default=UNIVERSE_ACCOUNT)
+    parser.add_argument("--keys", type=int, default=200, help="Keys kept per file")
+    args = parser.parse_args()
+
+    VECTORS_PATH.write_text(json.dumps(account_vectors(args.path, args.keys), indent=1) + "\n")